@@ -7,58 +7,55 @@ from flask_jwt_extended import JWTManager
 from flask_marshmallow import Marshmallow
 from flask_cors import CORS
 from config import Config
+from app.db_routing import RoutingSession, init_replica_routing, PIN_HEADER
+from app.compression import init_compression
+from app.logs import init_logging
 
-# --- НОВЫЕ ИМПОРТЫ (если используем Gemini) ---
-import google.generativeai as genai
-import logging # Для более явного логирования, если стандартный логгер Flask не используется здесь
+import logging
 
-# ----------------------------------------------
-
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession}) # Чтения GET-запросов - в реплики (если заданы)
 migrate = Migrate()
 jwt = JWTManager()
 ma = Marshmallow()
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+logger = logging.getLogger(__name__) # Обработчики настраивает init_logging: JSON через очередь
 
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    # Первым: журнал запросов регистрируется раньше остальных after_request и поэтому учитывает их время
+    init_logging(app)
+
+    # Параметры размера пула не применимы к SQLite (для in-memory используется StaticPool)
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {}
 
-    CORS(app)
+    app.json.ensure_ascii = app.config['JSON_ENSURE_ASCII']
+
+    CORS(app, expose_headers=[PIN_HEADER, 'Idempotent-Replayed'])
     
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
     ma.init_app(app)
+    init_replica_routing(app)
+    init_compression(app)
 
-    # --- ИНИЦИАЛИЗАЦИЯ GEMINI API ---
-    gemini_api_key = app.config.get('GEMINI_API_KEY')
-    if gemini_api_key:
-        try:
-            genai.configure(api_key=gemini_api_key)
-            logger.info("Successfully configured Google Gemini API.")
-            # Можно даже сделать тестовый небольшой вызов, чтобы проверить ключ, но это замедлит старт
-            # Например:
-            # model = genai.GenerativeModel('gemini-pro') # или flash
-            # model.generate_content("test") 
-            # logger.info("Gemini API test call successful.")
-        except Exception as e:
-            logger.error(f"Failed to configure Google Gemini API: {e}")
-            # В этом случае приложение запустится, но роут Gemini вернет ошибку 503
-            # Можно сделать более строгую проверку и не запускать приложение, если Gemini критичен
-            # raise RuntimeError(f"Could not configure Gemini API: {e}") from e
-    else:
+    # --- GEMINI API ---
+    # Сам модуль google.generativeai загружается лениво при первом запросе к чат-боту (app/chatbot.py)
+    if not app.config.get('GEMINI_API_KEY'):
         logger.warning("GEMINI_API_KEY not set in environment variables. "
                        "Chatbot AI functionality using Gemini will be unavailable.")
-    # ----------------------------------
+    # -------------------
 
     from app import routes # Импортируем после инициализации, чтобы избежать циклических импортов
     app.register_blueprint(routes.bp)
-
-    # Используем логгер Flask для последующих сообщений внутри приложения
-    # app.logger.info("Flask app created and configured.") # Это если хочешь логировать через Flask логгер
+    from app import chatbot # Опциональная подсистема: отдельный blueprint с ленивым импортом Gemini
+    app.register_blueprint(chatbot.bp)
+    from app.jobs import init_jobs # Фоновые задачи: выполнение сразу после запроса в режиме JOBS_INLINE
+    init_jobs(app)
+    from app.cli import init_cli
+    init_cli(app)
 
     return app
\ No newline at end of file
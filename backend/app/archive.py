@@ -0,0 +1,82 @@
+# backend/app/archive.py
+# Архивация результатов тестов прошлых семестров в холодную таблицу test_user_archive.
+#
+# Запросы результатов (списки преподавателя, админа, студента) читают только test_user, где остается
+# текущий семестр (ARCHIVE_KEEP_TERMS). История подмешивается по флагу ?include_archived=1.
+# Перенос - пачками, каждая в своей транзакции (INSERT ... SELECT + DELETE), поэтому команду
+# можно прервать и запустить снова:
+#   flask --app run results archive [--max-batches N]
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, literal, select
+
+from app import db
+from app.models import AnswerSignature, TestUser, TestUserArchive
+from app.fast_serializers import test_users_serializer, test_users_archive_serializer
+
+# Столбцы, переносимые из test_user как есть (id сохраняется)
+_COLUMNS = ('id', 'user_id', 'test_id', 'score', 'max_score', 'taken_at', 'answers_submitted', 'attempt_id')
+
+
+def term_start(moment, start_months):
+    """Начало семестра, в который попадает moment; семестры начинаются 1-го числа месяцев start_months."""
+    months = sorted(start_months)
+    started = [datetime(moment.year, month, 1) for month in months if datetime(moment.year, month, 1) <= moment]
+    return started[-1] if started else datetime(moment.year - 1, months[-1], 1)
+
+
+def archive_cutoff(keep_terms=None, now=None):
+    """Граница архивации: начало самого старого из keep_terms последних семестров (включая текущий)."""
+    config = current_app.config
+    keep_terms = keep_terms or config['ARCHIVE_KEEP_TERMS']
+    start = term_start(now or datetime.utcnow(), config['ARCHIVE_TERM_START_MONTHS'])
+    for _ in range(keep_terms - 1):
+        start = term_start(start - timedelta(days=1), config['ARCHIVE_TERM_START_MONTHS'])
+    return start
+
+
+def archive_results(cutoff, batch_size=None, max_batches=None):
+    """Переносит результаты, сданные до cutoff, в архив; возвращает число перенесенных строк."""
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    moved = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = db.session.execute(
+            select(TestUser.id).where(TestUser.taken_at < cutoff).order_by(TestUser.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            break
+        now = datetime.utcnow()
+        db.session.execute(insert(TestUserArchive).from_select(
+            list(_COLUMNS) + ['archived_at'],
+            select(*(getattr(TestUser, column) for column in _COLUMNS), literal(now)).where(TestUser.id.in_(ids))
+        ))
+        # Подписи ответов нужны только для отчета о похожих ответах текущего семестра
+        db.session.execute(delete(AnswerSignature).where(AnswerSignature.test_user_id.in_(ids)))
+        db.session.execute(delete(TestUser).where(TestUser.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+        batches += 1
+    return moved
+
+
+def archive_stats():
+    """Сколько результатов в горячей и архивной таблицах и самые старые из них."""
+    hot_count, hot_oldest = db.session.execute(select(func.count(TestUser.id), func.min(TestUser.taken_at))).one()
+    cold_count, cold_oldest = db.session.execute(
+        select(func.count(TestUserArchive.id), func.min(TestUserArchive.taken_at))).one()
+    return {'hot': hot_count, 'hot_oldest': hot_oldest, 'archived': cold_count, 'archived_oldest': cold_oldest}
+
+
+def dump_results(criteria, include_archived=False):
+    """Результаты тестов по условиям criteria(модель) -> [условия]; с include_archived - и из архива.
+
+    Условия строятся для каждой таблицы отдельно, так как столбцы у test_user и test_user_archive одинаковые.
+    """
+    results = []
+    if include_archived:
+        query = test_users_archive_serializer.select().where(*criteria(TestUserArchive))
+        results = test_users_archive_serializer.dump(query.order_by(TestUserArchive.id))
+    query = test_users_serializer.select().where(*criteria(TestUser))
+    return results + test_users_serializer.dump(query)
@@ -0,0 +1,133 @@
+# backend/app/auth.py
+
+from flask import jsonify, current_app, g
+from flask_jwt_extended import (
+    create_access_token, create_refresh_token, get_jwt, get_jwt_identity
+)
+from functools import wraps
+import threading
+import time
+
+from app import db, jwt
+from app.models import User
+
+# --- Кэш версий токенов ---
+# user_id -> (token_version, момент истечения записи в кэше).
+# Версия увеличивается при смене роли или выходе пользователя, после чего все
+# ранее выданные токены (access и refresh) перестают приниматься.
+# Кэш живет в памяти процесса, поэтому у записи есть TTL: другие воркеры
+# увидят новую версию не позже чем через JWT_TOKEN_VERSION_CACHE_SECONDS.
+_token_versions = {}
+_token_versions_lock = threading.Lock()
+
+
+def get_token_version(user_id):
+    """Возвращает актуальную версию токенов пользователя (из кэша или БД) или None, если пользователя нет."""
+    now = time.monotonic()
+    cached = _token_versions.get(user_id)
+    if cached and cached[1] > now:
+        return cached[0]
+
+    row = db.session.query(User.token_version).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    version = row[0] or 0
+    ttl = current_app.config.get('JWT_TOKEN_VERSION_CACHE_SECONDS', 30)
+    with _token_versions_lock:
+        _token_versions[user_id] = (version, now + ttl)
+    return version
+
+
+def bump_token_version(user):
+    """Отзывает все токены пользователя. Коммит остается за вызывающим кодом."""
+    user.token_version = (user.token_version or 0) + 1
+    with _token_versions_lock:
+        _token_versions.pop(user.id, None)
+
+
+def user_claims(user):
+    """Дополнительные claims токена: версия всегда, роль и имя - если включено в конфиге."""
+    claims = {'tv': user.token_version or 0}
+    if current_app.config.get('JWT_EMBED_USER_CLAIMS'):
+        claims['role'] = user.role.name
+        claims['username'] = user.username
+    return claims
+
+
+def issue_tokens(user, with_refresh=True):
+    """Создает access (и опционально refresh) токен для пользователя."""
+    claims = user_claims(user)
+    tokens = {'access_token': create_access_token(identity=str(user.id), additional_claims=claims)}
+    if with_refresh:
+        tokens['refresh_token'] = create_refresh_token(identity=str(user.id), additional_claims={'tv': claims['tv']})
+    return tokens
+
+
+@jwt.token_in_blocklist_loader
+def check_token_version(jwt_header, jwt_payload):
+    """Токен отозван, если его версия не совпадает с текущей версией пользователя."""
+    try:
+        user_id = int(jwt_payload.get('sub'))
+    except (ValueError, TypeError):
+        return True
+    current_version = get_token_version(user_id)
+    if current_version is None:
+        return True
+    return jwt_payload.get('tv', 0) != current_version
+
+
+# --- Текущий пользователь ---
+
+def get_current_user_id():
+    """Возвращает id текущего пользователя из токена без обращения к БД."""
+    current_user_id_str = get_jwt_identity()
+    if not current_user_id_str:
+        return None
+    try:
+        return int(current_user_id_str)
+    except (ValueError, TypeError):
+        return None
+
+
+def get_current_user():
+    """Возвращает текущего аутентифицированного пользователя или None."""
+    user_id = get_current_user_id()
+    if user_id is None:
+        return None
+    cached = g.get('_current_user')
+    if cached is not None and cached.id == user_id:
+        return cached
+    user = db.session.get(User, user_id)
+    g._current_user = user
+    return user
+
+
+def get_current_role():
+    """Возвращает имя роли текущего пользователя: из claims, если они есть, иначе из БД."""
+    role = get_jwt().get('role')
+    if role:
+        return role
+    user = get_current_user()
+    return user.role.name if user else None
+
+
+def role_required(roles):
+    """Декоратор для проверки ролей пользователя."""
+    if not isinstance(roles, list):
+        roles = [roles]
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            role = get_current_role()
+            if not role:
+                return jsonify({"msg": "Authentication required or user not found"}), 401
+            if role not in roles:
+                return jsonify({"msg": "Permission denied. Required roles: " + ", ".join(roles)}), 403
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+def is_owner_or_admin(created_by_id):
+    """Проверка владения объектом по claims: админ или создатель."""
+    return get_current_role() == 'admin' or created_by_id == get_current_user_id()
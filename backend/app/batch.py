@@ -0,0 +1,85 @@
+# backend/app/batch.py
+# Несколько запросов API одним HTTP-запросом (POST /api/batch).
+#
+# Страница SPA часто делает подряд несколько запросов (тест, затем его вопросы), и каждый платит
+# за сетевой круг, разбор JWT, загрузку пользователя и открытие сессии БД. Подзапросы пакета
+# выполняются обычными маршрутами blueprint в контексте внешнего запроса:
+#   - общий контекст приложения: g (текущий пользователь, выбранная реплика, задачи JOBS_INLINE)
+#     и одна сессия SQLAlchemy - пользователь и роль загружаются один раз, а чтение после записи
+#     в том же пакете идет из primary;
+#   - каждый маршрут по-прежнему сам проверяет токен и права (токен - заголовок внешнего запроса);
+#   - хуки before/after_request (журнал, сжатие, метка read-your-writes) отрабатывают один раз
+#     для всего пакета, а не для каждого подзапроса.
+# Подзапросы выполняются по порядку; ошибка одного не прерывает остальные.
+
+from flask import current_app, jsonify, request
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+from app import db
+
+METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+# Заголовки внешнего запроса, которые получает каждый подзапрос
+_INHERITED_HEADERS = ('Authorization', 'X-Read-Primary-Until', 'Accept-Language', 'User-Agent')
+# Заголовки, которые можно задать отдельному подзапросу
+_ITEM_HEADERS = {'idempotency-key': 'Idempotency-Key'}
+_SKIPPED_RESPONSE_HEADERS = ('Content-Length', 'Content-Type')
+
+
+def _error(status, msg):
+    response = jsonify({"msg": msg})
+    response.status_code = status
+    return response
+
+
+def _run_view():
+    try:
+        return current_app.make_response(current_app.dispatch_request()) # Без хуков: они у внешнего запроса
+    except HTTPException as e:
+        # 404 из get_or_404, 405 и т.п. - в JSON, как остальные ошибки API
+        result = current_app.handle_http_exception(e)
+        return _error(e.code, e.description) if isinstance(result, HTTPException) else current_app.make_response(result)
+    except Exception as e:
+        db.session.rollback()
+        try:
+            return current_app.make_response(current_app.handle_user_exception(e)) # Ошибки JWT -> 401/422
+        except Exception:
+            current_app.logger.exception("Unhandled error in batch sub-request %s %s", request.method, request.path)
+            return _error(500, "Internal server error")
+
+
+def dispatch(method, path, body=None, headers=None, prefix='/api'):
+    """Выполняет подзапрос к маршруту API: {"status", "headers", "body"}.
+
+    path - как у apiClient: относительно prefix ('/tests/5?compact=1') или полный ('/api/tests/5').
+    """
+    outer_endpoint = request.endpoint
+    if not path.startswith(prefix + '/'):
+        path = prefix + path
+    sub_headers = {name: request.headers[name] for name in _INHERITED_HEADERS if name in request.headers}
+    for name, value in (headers or {}).items():
+        if str(name).lower() in _ITEM_HEADERS:
+            sub_headers[_ITEM_HEADERS[str(name).lower()]] = str(value)
+
+    builder = EnvironBuilder(path=path, method=method, json=body, headers=sub_headers, base_url=request.host_url,
+                             environ_base={'REMOTE_ADDR': request.remote_addr})
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+
+    # Контекст приложения (g, сессия БД) уже есть - новый контекст запроса его переиспользует
+    with current_app.request_context(environ):
+        if request.endpoint == outer_endpoint:
+            response = _error(400, "A batch cannot contain another batch")
+        else:
+            response = _run_view()
+        if response.is_streamed or response.direct_passthrough:
+            response.close()
+            response = _error(400, "This route returns a file and cannot be used in a batch")
+
+    return {
+        'status': response.status_code,
+        'headers': {name: value for name, value in response.headers.items() if name not in _SKIPPED_RESPONSE_HEADERS},
+        'body': response.get_json(silent=True) if response.is_json else response.get_data(as_text=True),
+    }
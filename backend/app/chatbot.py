@@ -0,0 +1,203 @@
+# backend/app/chatbot.py
+# Чат-бот на Google Gemini - отдельный blueprint.
+# google.generativeai импортируется только при первом обращении к чат-боту: это тяжелый модуль
+# (секунды на импорт), который не нужен воркерам, командам `flask db` и тестам, пока чат-бот не вызван.
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from datetime import datetime
+import threading
+
+from app import db
+from app.models import Task, User
+from app.scoping import task_visibility
+from app.search import retrieve_context # Импорт регистрирует и обновление поискового индекса при изменениях
+from app.auth import get_current_user
+from app.jobs import JobFailed, enqueue, job_handler
+
+bp = Blueprint('chatbot', __name__, url_prefix='/api')
+
+_genai = None
+# Метки найденных документов в промпте
+_CONTEXT_LABELS = {'books': 'Book', 'news': 'News', 'tasks': 'Task', 'tests': 'Test'}
+_genai_lock = threading.Lock()
+
+
+def get_genai():
+    """Лениво импортирует и конфигурирует google.generativeai; None, если недоступен."""
+    global _genai
+    if _genai is not None:
+        return _genai
+    with _genai_lock:
+        if _genai is None:
+            try:
+                import google.generativeai as genai
+                genai.configure(api_key=current_app.config['GEMINI_API_KEY'])
+                current_app.logger.info("Successfully configured Google Gemini API.")
+            except Exception as e:
+                current_app.logger.error(f"Failed to configure Google Gemini API: {e}")
+                return None
+            _genai = genai
+    return _genai
+
+
+@bp.route('/chatbot/ask', methods=['POST'])
+@jwt_required()
+def chatbot_ask_gemini():
+    current_user = get_current_user() # Используем current_user, чтобы не пересекалось с моделью User
+    if not current_user:
+         # Эта проверка дублируется @jwt_required и get_current_user, но для явности можно оставить
+         return jsonify({"msg": "Authentication token is invalid or user not found."}), 401
+    
+    data = request.get_json()
+    if not data or not data.get('message'):
+        return jsonify({"msg": "Missing 'message' field in request body"}), 400
+
+    user_message = data.get('message')
+
+    # ?async=1: ответ генерирует воркер (app/jobs.py), клиент опрашивает GET /api/jobs/<id>.
+    # Запрос не держит поток веб-сервера на секунды ожидания Gemini
+    if request.args.get('async') == '1':
+        job = enqueue('chatbot.reply', {'user_id': current_user.id, 'message': user_message}, user_id=current_user.id)
+        db.session.commit()
+        return jsonify({"job_id": job.id, "status": job.status}), 202
+
+    reply, status = generate_reply(current_user, user_message)
+    return jsonify({"reply": reply}), status
+
+
+@job_handler('chatbot.reply', max_attempts=3)
+def reply_in_background(user_id, message):
+    """Задача chatbot.reply: результат {"reply": ..., "status": HTTP-статус синхронного ответа}."""
+    user = db.session.get(User, user_id)
+    if user is None:
+        raise JobFailed(f'User {user_id} not found')
+    reply, status = generate_reply(user, message)
+    if status >= 500 and current_app.config.get('GEMINI_API_KEY'):
+        raise RuntimeError(reply) # Сбой сервиса Gemini - повторить позже с задержкой
+    return {"reply": reply, "status": status}
+
+
+def generate_reply(current_user, user_message):
+    """Ответ чат-бота пользователю: (текст, HTTP-статус)."""
+    # Проверяем, был ли API ключ загружен и сконфигурирован при старте приложения
+    if not current_app.config.get('GEMINI_API_KEY'):
+        current_app.logger.error("GEMINI_API_KEY is not configured for the application.")
+        # Можно вернуть улучшенную заглушку, если Gemini недоступен
+        # Например, используя логику из предыдущих примеров
+        fallback_reply = (
+            f"I'm currently running in a limited mode as the AI service (Gemini) is not available. "
+            f"You said: '{user_message}'"
+        )
+        return fallback_reply, 503 # Service Unavailable
+
+    genai = get_genai()
+    if genai is None:
+        return "The AI service (Gemini) is temporarily unavailable. Please try again later.", 503
+
+    try:
+        # Модель сконфигурирована с API ключом в get_genai() при первом обращении
+        # Достаточно просто создать экземпляр модели
+        # Для более сложных чатов с историей, используйте model.start_chat()
+        # model = genai.GenerativeModel('gemini-pro') # или 'gemini-1.5-flash-latest'
+        # Использование 'gemini-1.5-flash-latest' часто является хорошим балансом скорости и качества для чатов.
+        model_name = 'gemini-1.5-flash-latest' 
+        model = genai.GenerativeModel(model_name)
+
+        # Создаем промпт для Gemini
+        # Важно дать модели контекст о ее роли и о пользователе
+        # Можно добавить предыдущие сообщения из истории чата для лучшего контекста
+        
+        # Получаем информацию о задачах пользователя для контекста (пример)
+        tasks_info = ""
+        # Убедимся, что модель Task импортирована
+        # Ближайшие предстоящие задания (личные и групповые): EXISTS по назначениям и диапазон по индексу due_date
+        user_tasks = Task.query \
+            .filter(task_visibility(current_user.id, 'student'), Task.due_date >= datetime.utcnow()) \
+            .order_by(Task.due_date.asc()).limit(2).all()
+        if user_tasks:
+            tasks_list_str = []
+            for task_item in user_tasks:
+                due_date_str = f" (due: {task_item.due_date.strftime('%b %d, %Y')})" if task_item.due_date else ""
+                tasks_list_str.append(f"- {task_item.title}{due_date_str}")
+            if tasks_list_str:
+                tasks_info = "\nHere are some of their current tasks:\n" + "\n".join(tasks_list_str) + "\n"
+
+        # Фрагменты книг, новостей, заданий и тестов по теме вопроса - в пределах CHATBOT_CONTEXT_TOKENS
+        snippets = retrieve_context(user_message, current_user.id, current_user.role.name)
+        platform_info = ""
+        if snippets:
+            platform_info = "\nRelevant platform content (use it when answering):\n" + "\n".join(
+                f"- [{_CONTEXT_LABELS[item['entity']]} #{item['id']}] {item['title']}"
+                + (f": {item['text']}" if item['text'] else "") for item in snippets) + "\n"
+
+
+        # Пример структурированного промпта (можно улучшать)
+        # Gemini хорошо реагирует на четко определенные роли и инструкции
+        # Использование `parts` позволяет передавать более структурированный контент, но для простого текста достаточно строки.
+        prompt_parts = [
+            "You are 'CollegeHelper', an AI assistant integrated into a college learning platform.",
+            f"You are currently assisting: {current_user.username} (Role: {current_user.role.name}).",
+            "The platform features sections for Books, Tasks, News, and Tests.",
+            "Your goal is to be helpful, concise, and friendly. Provide information relevant to the platform if possible.",
+            "If a request is outside your capabilities or knowledge about this platform, clearly state that.",
+            f"{tasks_info if tasks_info else 'The user currently has no pressing tasks visible to you.'}", # Контекст о задачах
+            platform_info, # Найденные по вопросу материалы платформы (может быть пусто)
+            "\nUser's message:",
+            f"\"{user_message}\"",
+            "\nYour response:"
+        ]
+        full_prompt = "\n".join(prompt_parts)
+        
+        current_app.logger.debug(f"Sending prompt to Gemini ({model_name}):\n{full_prompt}")
+
+        # Конфигурация генерации (можно настроить)
+        generation_config = genai.types.GenerationConfig(
+            candidate_count=1, # Обычно достаточно одного кандидата
+            # stop_sequences=['...'], # Если есть специфичные последовательности для остановки
+            max_output_tokens=300, # Ограничение длины ответа
+            temperature=0.7, # Креативность/случайность (0.0 - более детерминированно, 1.0 - более случайно)
+            # top_p=0.9, # Nucleus sampling
+            # top_k=40,  # Top-k sampling
+        )
+
+        # Отправляем запрос к Gemini
+        response = model.generate_content(
+            contents=[full_prompt], # `contents` ожидает итерируемый объект (например, список строк)
+            generation_config=generation_config,
+            # safety_settings=... # Можно настроить уровни безопасности, если нужно
+        )
+        
+        # Обработка ответа
+        ai_reply = ""
+        if response.parts:
+            ai_reply = "".join(part.text for part in response.parts if hasattr(part, 'text')) # Убедимся, что у part есть text
+        elif hasattr(response, 'text') and response.text: # Для некоторых старых/простых ответов
+             ai_reply = response.text
+        
+        if not ai_reply: # Если ответ пустой (например, из-за safety filters)
+            current_app.logger.warning(f"Gemini response was empty or blocked.")
+            if response.candidates:
+                 current_app.logger.warning(f"Candidate finish reason: {response.candidates[0].finish_reason}")
+                 current_app.logger.warning(f"Candidate safety ratings: {response.candidates[0].safety_ratings}")
+            ai_reply = "I'm sorry, I couldn't generate a response for that. This might be due to content restrictions or an issue with the request."
+        
+        current_app.logger.debug(f"Received reply from Gemini: {ai_reply}")
+        
+        return ai_reply.strip(), 200
+
+    except genai.types.BlockedPromptException as bpe:
+        current_app.logger.error(f"Gemini API: Prompt was blocked. {bpe}")
+        return "I'm sorry, your message could not be processed due to content restrictions. Please rephrase your request.", 400 # Bad Request
+    except genai.types.StopCandidateException as sce:
+        current_app.logger.error(f"Gemini API: Candidate generation stopped unexpectedly. {sce}")
+        return "I'm sorry, I was unable to complete the response. Please try again.", 500
+    except Exception as e:
+        # Логируем полную ошибку для отладки
+        current_app.logger.error(f"Unexpected error interacting with Google Gemini API: {e}", exc_info=True)
+        # Можно проверить тип ошибки, если это специфичная ошибка Gemini, например, связанная с аутентификацией
+        # import google.auth.exceptions
+        # if isinstance(e, google.auth.exceptions.RefreshError) or isinstance(e, google.auth.exceptions.DefaultCredentialsError):
+        #     return "There's an authentication issue with the AI service. Please contact support.", 500
+        
+        return "An unexpected error occurred while trying to reach the AI assistant (Gemini). Please try again later.", 500
@@ -0,0 +1,175 @@
+# backend/app/cli.py
+# Служебные команды Flask CLI (запуск: flask --app run <группа> <команда>).
+
+import click
+from datetime import datetime
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import update
+
+from app import db
+from app.models import News, make_excerpt
+
+news_cli = AppGroup('news', help='Обслуживание новостей.')
+
+
+@news_cli.command('backfill-excerpts')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_news_excerpts(batch_size):
+    """Заполняет excerpt у новостей, созданных до появления этого столбца."""
+    total = 0
+    while True:
+        rows = db.session.execute(
+            db.select(News.id, News.content).where(News.excerpt.is_(None)).limit(batch_size)
+        ).all()
+        if not rows:
+            break
+        db.session.execute(update(News), [{'id': news_id, 'excerpt': make_excerpt(content)} for news_id, content in rows])
+        db.session.commit()
+        total += len(rows)
+    click.echo(f'Updated {total} news items.')
+
+
+sync_cli = AppGroup('sync', help='Обслуживание синхронизации клиентов (/api/sync).')
+
+
+@sync_cli.command('purge-tombstones')
+@click.option('--days', type=int, default=None, help='По умолчанию SYNC_TOMBSTONE_RETENTION_DAYS')
+def purge_sync_tombstones(days):
+    """Удаляет старые записи об удалениях."""
+    from app.sync import purge_tombstones
+    days = days if days is not None else current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS']
+    click.echo(f'Purged {purge_tombstones(days)} tombstones older than {days} days.')
+
+
+books_cli = AppGroup('books', help='Обслуживание файлов книг.')
+
+
+@books_cli.command('gc')
+@click.option('--grace-seconds', type=int, default=None, help='По умолчанию BOOK_FILE_GC_GRACE_SECONDS')
+def collect_book_files(grace_seconds):
+    """Удаляет файлы, на которые не ссылается ни одна книга."""
+    from app.storage import collect_garbage
+    if grace_seconds is None:
+        grace_seconds = current_app.config['BOOK_FILE_GC_GRACE_SECONDS']
+    click.echo(f'Removed {collect_garbage(grace_seconds)} unreferenced files.')
+
+
+jobs_cli = AppGroup('jobs', help='Фоновые задачи.')
+
+
+@jobs_cli.command('worker')
+@click.option('--processes', type=int, default=None, help='По умолчанию JOBS_WORKER_PROCESSES')
+@click.option('--poll-interval', type=float, default=None, help='По умолчанию JOBS_POLL_INTERVAL')
+@click.option('--burst', is_flag=True, help='Выйти, когда очередь опустеет')
+def run_job_workers(processes, poll_interval, burst):
+    """Запускает пул воркеров (каждый - отдельный процесс со своим соединением с БД)."""
+    import multiprocessing
+    from app.jobs import run_worker, _worker_process
+    processes = processes or current_app.config['JOBS_WORKER_PROCESSES']
+    if processes == 1:
+        click.echo(f'Processed {run_worker(poll_interval=poll_interval, burst=burst)} jobs.')
+        return
+    # spawn, а не fork: дочерний процесс не наследует открытые соединения пула родителя
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_worker_process, args=(i, poll_interval, burst)) for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join() # SIGINT/SIGTERM группе процессов: каждый воркер доделывает текущую задачу
+
+
+@jobs_cli.command('purge')
+@click.option('--days', type=int, default=None, help='По умолчанию JOBS_RETENTION_DAYS')
+def purge_finished_jobs(days):
+    """Удаляет старые выполненные задачи."""
+    from app.jobs import purge_jobs
+    days = days if days is not None else current_app.config['JOBS_RETENTION_DAYS']
+    click.echo(f'Purged {purge_jobs(days)} finished jobs older than {days} days.')
+
+
+reminders_cli = AppGroup('reminders', help='Напоминания о сроках заданий.')
+
+
+@reminders_cli.command('send')
+@click.option('--loop', is_flag=True, help='Повторять каждые REMINDER_INTERVAL_SECONDS (вместо cron)')
+def send_reminders(loop):
+    """Отправляет напоминания о заданиях, срок которых попал в окна REMINDER_WINDOWS_HOURS."""
+    import time
+    from app.reminders import send_due_reminders
+    while True:
+        stats = send_due_reminders()
+        click.echo(f"{datetime.utcnow():%Y-%m-%d %H:%M:%S} sent: "
+                   + ', '.join(f'{label}={count}' for label, count in stats.items()))
+        if not loop:
+            break
+        db.session.remove()
+        time.sleep(current_app.config['REMINDER_INTERVAL_SECONDS'])
+
+
+results_cli = AppGroup('results', help='Результаты тестов.')
+
+
+@results_cli.command('archive')
+@click.option('--keep-terms', type=int, default=None, help='По умолчанию ARCHIVE_KEEP_TERMS')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Явная граница вместо расчета по семестрам')
+@click.option('--batch-size', type=int, default=None, help='По умолчанию ARCHIVE_BATCH_SIZE')
+@click.option('--max-batches', type=int, default=None, help='Перенести не больше N пачек за запуск')
+@click.option('--dry-run', is_flag=True, help='Только показать, сколько строк будет перенесено')
+def archive_test_results(keep_terms, before, batch_size, max_batches, dry_run):
+    """Переносит результаты прошлых семестров в test_user_archive."""
+    from app.archive import archive_cutoff, archive_results
+    from app.models import TestUser
+    cutoff = before or archive_cutoff(keep_terms)
+    if dry_run:
+        count = db.session.scalar(db.select(db.func.count(TestUser.id)).where(TestUser.taken_at < cutoff))
+        click.echo(f'{count} results taken before {cutoff:%Y-%m-%d} would be archived.')
+        return
+    click.echo(f'Archived {archive_results(cutoff, batch_size, max_batches)} results taken before {cutoff:%Y-%m-%d}.')
+
+
+@results_cli.command('stats')
+def test_results_stats():
+    """Размер горячей и архивной таблиц результатов."""
+    from app.archive import archive_stats
+    for key, value in archive_stats().items():
+        click.echo(f'{key}: {value}')
+
+
+@results_cli.command('leaderboard-rebuild')
+@click.option('--test-id', type=int, default=None, help='Только этот тест (по умолчанию все)')
+def rebuild_leaderboard(test_id):
+    """Пересчитывает таблицы лидеров из результатов (включая архив)."""
+    from app.leaderboard import rebuild_leaderboards
+    click.echo(f'Rebuilt leaderboards: {rebuild_leaderboards(test_id)} entries.')
+
+
+@results_cli.command('similarity-backfill')
+@click.option('--test-id', type=int, default=None, help='Только этот тест (по умолчанию все)')
+@click.option('--batch-size', default=500, show_default=True)
+def backfill_similarity(test_id, batch_size):
+    """Считает подписи свободных ответов для результатов, сданных без них."""
+    from app.similarity import backfill_signatures
+    click.echo(f'Saved {backfill_signatures(test_id, batch_size)} answer signatures.')
+
+
+idempotency_cli = AppGroup('idempotency', help='Ключи идемпотентных запросов (Idempotency-Key).')
+
+
+@idempotency_cli.command('purge')
+def purge_idempotency_records():
+    """Удаляет сохраненные ответы с истекшим сроком (IDEMPOTENCY_TTL_SECONDS)."""
+    from app.idempotency import purge_expired
+    click.echo(f'Purged {purge_expired()} expired idempotency records.')
+
+
+def init_cli(app):
+    """Регистрирует группы команд."""
+    app.cli.add_command(news_cli)
+    app.cli.add_command(sync_cli)
+    app.cli.add_command(books_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(reminders_cli)
+    app.cli.add_command(results_cli)
+    app.cli.add_command(idempotency_cli)
@@ -0,0 +1,164 @@
+# backend/app/compression.py
+# Сжатие ответов (gzip, brotli - если установлен) и учет размера ответов по эндпоинтам.
+#
+# JSON списков (новости, тесты, результаты) хорошо сжимается: в 5-10 раз, что важно для
+# студентов с мобильным интернетом. Маленькие ответы не сжимаются - выигрыш меньше накладных расходов.
+# Одинаковые тела ответов (например, общий список новостей) сжимаются один раз и берутся из LRU-кэша.
+
+from collections import OrderedDict
+from flask import current_app, request
+import gzip
+import hashlib
+import logging
+import threading
+
+try:
+    import brotli # Необязательная зависимость: сжимает JSON на 15-20% лучше gzip
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'image/svg+xml')
+
+# Границы корзин гистограммы размеров ответов, байт
+SIZE_BUCKETS = (1024, 4 * 1024, 16 * 1024, 64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024)
+
+_payload_stats = {}
+_payload_stats_lock = threading.Lock()
+
+# (хэш тела, кодировка) -> сжатое тело
+_compressed_cache = OrderedDict()
+_compressed_cache_lock = threading.Lock()
+
+
+def _accepted_encodings(header):
+    """Разбирает Accept-Encoding: {кодировка: q}."""
+    accepted = {}
+    for part in header.split(','):
+        name, _, params = part.strip().partition(';')
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def choose_encoding(header):
+    """Лучшая поддерживаемая кодировка из Accept-Encoding или None."""
+    accepted = _accepted_encodings(header or '')
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best = None
+    for name in candidates:
+        q = accepted.get(name, accepted.get('*', 0.0))
+        if q > 0 and (best is None or q > best[1]):
+            best = (name, q)
+    return best[0] if best else None
+
+
+def _compress(body, encoding):
+    config = current_app.config
+    if encoding == 'br':
+        return brotli.compress(body, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(body, compresslevel=config['COMPRESS_LEVEL'], mtime=0) # mtime=0: одинаковый вход - одинаковый выход
+
+
+def compress_body(body, encoding):
+    """Сжимает тело ответа, используя кэш уже сжатых одинаковых тел."""
+    cache_size = current_app.config['COMPRESS_CACHE_SIZE']
+    if not cache_size:
+        return _compress(body, encoding)
+
+    key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+    with _compressed_cache_lock:
+        cached = _compressed_cache.get(key)
+        if cached is not None:
+            _compressed_cache.move_to_end(key)
+            return cached
+    compressed = _compress(body, encoding)
+    with _compressed_cache_lock:
+        _compressed_cache[key] = compressed
+        while len(_compressed_cache) > cache_size:
+            _compressed_cache.popitem(last=False)
+    return compressed
+
+
+def _record_payload(endpoint, raw_size, sent_size):
+    """Гистограмма размеров ответа эндпоинта и проверка бюджета (по переданным байтам)."""
+    config = current_app.config
+    budget = config['PAYLOAD_BUDGETS'].get(endpoint, config['PAYLOAD_BUDGET_BYTES'])
+    bucket = next((i for i, bound in enumerate(SIZE_BUCKETS) if sent_size <= bound), len(SIZE_BUCKETS))
+    over_budget = bool(budget) and sent_size > budget
+    with _payload_stats_lock:
+        stats = _payload_stats.setdefault(endpoint, {
+            'count': 0, 'raw_bytes': 0, 'sent_bytes': 0, 'max_sent_bytes': 0,
+            'over_budget': 0, 'budget_bytes': budget, 'histogram': [0] * (len(SIZE_BUCKETS) + 1),
+        })
+        stats['count'] += 1
+        stats['raw_bytes'] += raw_size
+        stats['sent_bytes'] += sent_size
+        stats['max_sent_bytes'] = max(stats['max_sent_bytes'], sent_size)
+        stats['histogram'][bucket] += 1
+        stats['budget_bytes'] = budget
+        if over_budget:
+            stats['over_budget'] += 1
+            first_time = stats['over_budget'] == 1
+    if over_budget and first_time:
+        logger.warning(f"Payload budget exceeded: {endpoint} sent {sent_size} bytes (budget {budget})")
+
+
+def get_payload_stats():
+    """Снимок статистики размеров ответов по эндпоинтам, самые "тяжелые" первыми."""
+    with _payload_stats_lock:
+        snapshot = {endpoint: dict(stats, histogram=list(stats['histogram']))
+                    for endpoint, stats in _payload_stats.items()}
+    result = []
+    for endpoint, stats in sorted(snapshot.items(), key=lambda item: item[1]['max_sent_bytes'], reverse=True):
+        stats['endpoint'] = endpoint
+        stats['avg_raw_bytes'] = stats['raw_bytes'] // stats['count']
+        stats['avg_sent_bytes'] = stats['sent_bytes'] // stats['count']
+        # Корзины по возрастанию: le - верхняя граница в байтах (None - больше последней границы)
+        stats['histogram'] = [{'le': bound, 'count': count}
+                              for bound, count in zip(SIZE_BUCKETS + (None,), stats['histogram'])]
+        result.append(stats)
+    return result
+
+
+def compress_response(response):
+    """after_request: сжимает подходящий ответ и учитывает его размер."""
+    if response.direct_passthrough or response.is_streamed:
+        return response # Файлы (send_file) и потоковые ответы отдаются как есть
+    endpoint = request.endpoint or 'unknown'
+    body = response.get_data()
+    raw_size = len(body)
+
+    encoding = None
+    if (current_app.config['COMPRESS_ENABLED']
+            and 200 <= response.status_code < 300 and response.status_code != 204
+            and raw_size >= current_app.config['COMPRESS_MIN_SIZE']
+            and 'Content-Encoding' not in response.headers
+            and (response.mimetype in _COMPRESSIBLE_TYPES or response.mimetype.startswith('text/'))):
+        encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+
+    if encoding:
+        response.set_data(compress_body(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # Сжатое и несжатое представления различаются - ETag тоже должен различаться
+            response.headers['ETag'] = response.headers['ETag'].rstrip('"') + f'-{encoding}"'
+    if current_app.config['COMPRESS_ENABLED']:
+        response.vary.add('Accept-Encoding')
+
+    _record_payload(endpoint, raw_size, response.content_length or 0)
+    return response
+
+
+def init_compression(app):
+    """Регистрирует сжатие ответов и учет их размеров."""
+    app.after_request(compress_response)
@@ -0,0 +1,118 @@
+# backend/app/db_routing.py
+# Маршрутизация запросов к БД: запись - в основную БД (primary), чтение в GET-запросах - в реплики.
+#
+# Реплики задаются через SQLALCHEMY_BINDS с ключами 'replica_0', 'replica_1', ... (см. Config).
+# Read-your-writes: после успешного изменяющего запроса пользователь на READ_YOUR_WRITES_SECONDS
+# "прикрепляется" к primary, чтобы не увидеть устаревшие данные из отстающей реплики.
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+import itertools
+import threading
+import time
+import sqlalchemy as sa
+
+REPLICA_BIND_PREFIX = 'replica_'
+PIN_HEADER = 'X-Read-Primary-Until'
+
+# user_id -> момент (time.time()), до которого чтения пользователя идут в primary
+_pinned_users = {}
+_pinned_users_lock = threading.Lock()
+_replica_counter = itertools.count()
+
+
+def _request_user_id():
+    """id пользователя из JWT запроса (если токен есть), без обращения к БД."""
+    if '_routing_user_id' in g:
+        return g._routing_user_id
+    user_id = None
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        from flask_jwt_extended import decode_token
+        try:
+            user_id = decode_token(auth_header[len('Bearer '):], allow_expired=True).get('sub')
+        except Exception:
+            user_id = None
+    g._routing_user_id = user_id
+    return user_id
+
+
+def _is_pinned_to_primary():
+    """Нужно ли читать из primary: недавно писал (этот воркер знает) или клиент прислал метку."""
+    now = time.time()
+    client_pin = request.headers.get(PIN_HEADER)
+    if client_pin:
+        try:
+            if float(client_pin) > now:
+                return True
+        except ValueError:
+            pass
+    user_id = _request_user_id()
+    return user_id is not None and _pinned_users.get(user_id, 0) > now
+
+
+def _choose_replica(engines):
+    """Выбирает реплику для чтения в текущем запросе (round-robin) или None."""
+    if not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return None
+    if 'db_read_engine' in g:
+        return g.db_read_engine
+
+    replica_keys = sorted(k for k in engines if k and k.startswith(REPLICA_BIND_PREFIX))
+    engine = None
+    if replica_keys and not _is_pinned_to_primary():
+        engine = engines[replica_keys[next(_replica_counter) % len(replica_keys)]]
+    # Весь запрос читает из одного источника, чтобы данные были согласованы между собой
+    g.db_read_engine = engine
+    return engine
+
+
+def read_from_primary():
+    """Все дальнейшие чтения текущего запроса - из primary (например, когда ответ задает метку времени)."""
+    if has_request_context():
+        g.db_read_engine = None
+
+
+class RoutingSession(Session):
+    """Сессия, отправляющая чтения GET-запросов в реплики, а все остальное - в primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self.info.get('primary_only'):
+            if self._flushing or isinstance(clause, sa.sql.expression.UpdateBase):
+                # Сессия начала писать - дальнейшие чтения в ней тоже из primary
+                self.info['primary_only'] = True
+            else:
+                engine = _choose_replica(self._db.engines)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def pin_user_after_write(response):
+    """after_request: после успешной записи прикрепляет пользователя к primary."""
+    if request.method in ('GET', 'HEAD', 'OPTIONS') or response.status_code >= 400 or g.get('read_only_batch'):
+        return response
+    window = current_app.config.get('READ_YOUR_WRITES_SECONDS', 0)
+    if not window:
+        return response
+
+    until = time.time() + window
+    user_id = _request_user_id()
+    if user_id is not None:
+        with _pinned_users_lock:
+            _pinned_users[user_id] = until
+            # Ленивая очистка истекших записей
+            if len(_pinned_users) > 10000:
+                now = time.time()
+                for key in [k for k, v in _pinned_users.items() if v <= now]:
+                    del _pinned_users[key]
+    # Метка для клиента: запросы попадут на другой воркер, который не знает о записи
+    response.headers[PIN_HEADER] = f'{until:.3f}'
+    return response
+
+
+def init_replica_routing(app):
+    """Регистрирует хуки маршрутизации, если заданы реплики."""
+    binds = app.config.get('SQLALCHEMY_BINDS') or {}
+    if any(key.startswith(REPLICA_BIND_PREFIX) for key in binds):
+        app.after_request(pin_user_after_write)
@@ -0,0 +1,174 @@
+# backend/app/fast_serializers.py
+# Быстрая сериализация списков для "горячих" эндпоинтов (новости, тесты, задачи, результаты тестов).
+#
+# По схеме Marshmallow один раз строится плоский план: какие столбцы выбрать через select(...)
+# (вложенные объекты - через outer join) и как превратить кортеж строки в словарь.
+# Результат совпадает с schema.dump(...) поле в поле, а ORM-объекты и Marshmallow не участвуют.
+# Проверка совпадения: tests/test_fast_serializers.py; замер: python benchmarks/serializers_bench.py
+
+from flask import current_app
+from marshmallow import fields as ma_fields
+import sqlalchemy as sa
+from sqlalchemy.orm import aliased
+
+from app import db
+
+try:
+    import orjson # Необязательная зависимость: быстрый JSON-кодировщик
+except ImportError:
+    orjson = None
+
+# Сколько id родителей передавать в одном IN (...) при загрузке вложенных списков
+_IN_CHUNK_SIZE = 500
+
+
+def _converter(field):
+    """Функция преобразования значения столбца так же, как это делает поле Marshmallow."""
+    if type(field) in (ma_fields.Integer, ma_fields.String, ma_fields.Raw):
+        return None # Значение из БД уже нужного типа
+    if type(field) is ma_fields.DateTime and field.format in (None, 'iso'):
+        return lambda value: value.isoformat() if value is not None else None
+    # Остальные типы - через само поле, медленнее, но гарантированно так же
+    return lambda value: field._serialize(value, None, None)
+
+
+def _scalar_plan(schema, mapper, column_source, columns):
+    """План для полей-столбцов схемы: [(ключ JSON, индекс в строке, преобразование)]."""
+    plan = []
+    for name, field in schema.dump_fields.items():
+        if isinstance(field, (ma_fields.Nested, ma_fields.List)):
+            continue
+        attr = field.attribute or name
+        if attr not in mapper.column_attrs:
+            raise ValueError(f'{type(schema).__name__}.{name}: only column fields can be compiled')
+        plan.append((field.data_key or name, len(columns), _converter(field)))
+        columns.append(getattr(column_source, attr))
+    return plan
+
+
+def _nested_schema(field):
+    # List(Nested(...)) или Nested(..., many=True) -> (схема элемента, список ли это)
+    if isinstance(field, ma_fields.List):
+        return field.inner.schema, True
+    return field.schema, bool(field.many)
+
+
+def _build_dict(row, plan):
+    item = {}
+    for key, index, convert in plan:
+        value = row[index]
+        item[key] = value if convert is None else convert(value)
+    return item
+
+
+class CompiledSerializer:
+    """Сериализатор, скомпилированный из схемы Marshmallow: select(...) -> список словарей."""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.model = schema.opts.model
+        mapper = sa.inspect(self.model)
+        self.columns = []
+        self._joins = []
+        self._nested_one = [] # (ключ, индекс pk вложенного объекта, план)
+        self._nested_many = [] # (ключ, отношение, скомпилированный сериализатор элемента)
+
+        self._plan = _scalar_plan(schema, mapper, self.model, self.columns)
+        for name, field in schema.dump_fields.items():
+            if not isinstance(field, (ma_fields.Nested, ma_fields.List)):
+                continue
+            attr = field.attribute or name
+            relationship = mapper.relationships[attr]
+            nested, many = _nested_schema(field)
+            key = field.data_key or name
+            if many:
+                self._nested_many.append((key, relationship, CompiledSerializer(nested)))
+                continue
+            # Объект "многие к одному" - тем же запросом через outer join
+            target = aliased(relationship.mapper.class_)
+            self._joins.append((target, getattr(self.model, attr).of_type(target)))
+            pk_index = len(self.columns)
+            pk_key = relationship.mapper.get_property_by_column(relationship.mapper.primary_key[0]).key
+            self.columns.append(getattr(target, pk_key))
+            self._nested_one.append((key, pk_index, _scalar_plan(nested, relationship.mapper, target, self.columns)))
+
+        if self._nested_many:
+            self._pk_index = len(self.columns)
+            self.columns.append(mapper.primary_key[0])
+
+    def select(self):
+        """SELECT нужных схеме столбцов; фильтры и сортировку добавляет вызывающий код."""
+        query = sa.select(*self.columns).select_from(self.model)
+        for target, on_clause in self._joins:
+            query = query.outerjoin(target, on_clause)
+        return query
+
+    def dump_rows(self, rows):
+        """Превращает строки результата select() в словари, как schema.dump(many=True)."""
+        result = []
+        for row in rows:
+            item = _build_dict(row, self._plan)
+            for key, pk_index, plan in self._nested_one:
+                item[key] = _build_dict(row, plan) if row[pk_index] is not None else None
+            result.append(item)
+        if self._nested_many and result:
+            parent_ids = [row[self._pk_index] for row in rows]
+            for key, relationship, serializer in self._nested_many:
+                children = serializer._load_children(relationship, parent_ids)
+                for item, parent_id in zip(result, parent_ids):
+                    item[key] = children.get(parent_id, [])
+        return result
+
+    def dump(self, query):
+        """Выполняет select() с фильтрами и сериализует результат."""
+        return self.dump_rows(db.session.execute(query).all())
+
+    def _load_children(self, relationship, parent_ids):
+        # Вложенный список (one-to-many или many-to-many) одним запросом на пачку родителей:
+        # {id родителя: [словари элементов]}
+        (parent_column, link_column), = relationship.synchronize_pairs
+        query = self.select().add_columns(link_column)
+        if relationship.secondary is not None:
+            query = query.join(relationship.secondary, relationship.secondaryjoin)
+        if relationship.order_by:
+            query = query.order_by(*relationship.order_by)
+        link_index = len(self.columns)
+
+        children = {}
+        unique_ids = list(dict.fromkeys(parent_ids))
+        for start in range(0, len(unique_ids), _IN_CHUNK_SIZE):
+            chunk = unique_ids[start:start + _IN_CHUNK_SIZE]
+            rows = db.session.execute(query.where(link_column.in_(chunk))).all()
+            for row, item in zip(rows, self.dump_rows(rows)):
+                children.setdefault(row[link_index], []).append(item)
+        return children
+
+
+def json_response(data, status=200):
+    """Как jsonify(data), но с orjson, если он установлен и это не меняет байты ответа."""
+    provider = current_app.json
+    # orjson всегда пишет UTF-8 без \uXXXX и компактно, поэтому используется только при
+    # ensure_ascii=False (см. JSON_ENSURE_ASCII в Config) и вне debug-режима с отступами
+    if orjson is not None and not provider.ensure_ascii and provider.sort_keys \
+            and not (provider.compact is None and current_app.debug) and provider.compact is not False:
+        try:
+            body = orjson.dumps(data, option=orjson.OPT_SORT_KEYS) + b'\n' # jsonify тоже добавляет \n
+        except (TypeError, orjson.JSONEncodeError):
+            return provider.response(data), status
+        return current_app.response_class(body, mimetype=provider.mimetype), status
+    return provider.response(data), status
+
+
+# --- Скомпилированные сериализаторы для эндпоинтов со списками ---
+from app.schemas import ( # noqa: E402
+    books_schema, tasks_schema, news_summary_schema, test_headers_schema, questions_schema, test_users_schema,
+    test_users_archive_schema
+)
+
+books_serializer = CompiledSerializer(books_schema)
+tasks_serializer = CompiledSerializer(tasks_schema)
+news_list_serializer = CompiledSerializer(news_summary_schema)
+test_headers_serializer = CompiledSerializer(test_headers_schema)
+questions_serializer = CompiledSerializer(questions_schema)
+test_users_serializer = CompiledSerializer(test_users_schema)
+test_users_archive_serializer = CompiledSerializer(test_users_archive_schema)
@@ -0,0 +1,193 @@
+# backend/app/idempotency.py
+# Идемпотентные POST-запросы по заголовку Idempotency-Key.
+#
+# Клиент, не получивший ответ (таймаут, обрыв сети), повторяет запрос с тем же ключом и получает
+# сохраненный ответ первого выполнения, а не второй результат теста или вторую новость.
+# Ключ действует в рамках пользователя и маршрута: (user_id, endpoint, key) уникален в idempotency_record.
+#   - первый запрос вставляет запись in_progress (уникальный индекс не пропустит параллельный дубликат),
+#     выполняет маршрут и сохраняет ответ (статус < 500) на IDEMPOTENCY_TTL_SECONDS;
+#   - повтор с тем же телом получает сохраненный ответ с заголовком Idempotent-Replayed: true;
+#   - повтор с другим телом - 422, повтор во время выполнения первого - 409;
+#   - ответ 5xx или исключение удаляют запись: такой запрос можно повторить с тем же ключом.
+# Завершенные ответы дополнительно лежат в LRU-кэше процесса: частый повтор не читает БД.
+# Запрос без заголовка выполняется как обычно. Устаревшие записи удаляет
+#   flask --app run idempotency purge
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app, jsonify, request
+from functools import wraps
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import re
+import threading
+
+from app import db
+from app.auth import get_current_user_id
+from app.models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+_KEY_RE = re.compile(r'^[\x21-\x7e]{1,100}$') # Печатные ASCII без пробелов, как UUID или ulid
+
+
+class _ResponseCache:
+    """LRU завершенных ответов: (user_id, endpoint, key) -> (хэш запроса, статус, тело, mimetype, истекает)."""
+
+    def __init__(self):
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, scope):
+        with self._lock:
+            item = self._items.get(scope)
+            if item is None:
+                return None
+            if item[4] <= datetime.utcnow():
+                del self._items[scope]
+                return None
+            self._items.move_to_end(scope)
+            return item
+
+    def put(self, scope, item, max_size):
+        if max_size <= 0:
+            return
+        with self._lock:
+            self._items[scope] = item
+            self._items.move_to_end(scope)
+            while len(self._items) > max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+response_cache = _ResponseCache()
+
+
+def _fingerprint():
+    # Тот же ключ должен прийти с тем же запросом: метод, путь, параметры и тело
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.query_string.decode('latin-1')):
+        digest.update(part.encode() + b'\0')
+    digest.update(request.get_data(cache=True)) # Тело остается доступным для request.get_json()
+    return digest.hexdigest()
+
+
+def _replay(item):
+    response = current_app.response_class(item[2], status=item[1], mimetype=item[3])
+    response.headers[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _mismatch():
+    return jsonify({"msg": f"{HEADER} was already used with a different request"}), 422
+
+
+def _busy():
+    return jsonify({"msg": f"A request with this {HEADER} is still being processed"}), 409
+
+
+def _claim(scope, fingerprint):
+    """Занимает ключ: (id записи, None) или (None, ответ), если запрос выполнять не нужно."""
+    user_id, endpoint, key = scope
+    config = current_app.config
+    for _ in range(2):
+        now = datetime.utcnow()
+        record = IdempotencyRecord(user_id=user_id, endpoint=endpoint, key=key, request_hash=fingerprint,
+                                   created_at=now, expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL_SECONDS']))
+        db.session.add(record)
+        try:
+            db.session.commit()
+            return record.id, None
+        except IntegrityError:
+            db.session.rollback()
+
+        existing = db.session.execute(select(IdempotencyRecord).where(
+            IdempotencyRecord.user_id == user_id, IdempotencyRecord.endpoint == endpoint,
+            IdempotencyRecord.key == key)).scalar_one_or_none()
+        if existing is None:
+            continue # Запись успели удалить (ошибка первого запроса) - пробуем вставить снова
+        if existing.expires_at <= now:
+            db.session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.id == existing.id,
+                                                               IdempotencyRecord.expires_at <= now))
+            db.session.commit()
+            continue
+        if existing.request_hash != fingerprint:
+            return None, _mismatch()
+        if existing.status == 'completed':
+            item = (existing.request_hash, existing.response_status, existing.response_body,
+                    existing.response_mimetype, existing.expires_at)
+            response_cache.put(scope, item, config['IDEMPOTENCY_CACHE_SIZE'])
+            return None, _replay(item)
+        if existing.created_at > now - timedelta(seconds=config['IDEMPOTENCY_LOCK_SECONDS']):
+            return None, _busy()
+        # Первый запрос оборвался, не записав ответ (упал воркер) - выполняем заново.
+        # Условное обновление: из нескольких повторов ключ забирает только один
+        taken = db.session.execute(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.id == existing.id, IdempotencyRecord.status == 'in_progress',
+                   IdempotencyRecord.created_at == existing.created_at)
+            .values(created_at=now))
+        db.session.commit()
+        if taken.rowcount == 1:
+            return existing.id, None
+        return None, _busy()
+    return None, _busy()
+
+
+def _release(record_id):
+    db.session.rollback() # Маршрут мог оставить транзакцию после ошибки
+    db.session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.id == record_id))
+    db.session.commit()
+
+
+def idempotent(view):
+    """Декоратор маршрута: ставится под jwt_required и role_required (ключ привязан к пользователю)."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        user_id = get_current_user_id()
+        if key is None or user_id is None:
+            return view(*args, **kwargs)
+        if not _KEY_RE.match(key):
+            return jsonify({"msg": f"Invalid {HEADER}: expected 1-100 printable ASCII characters"}), 400
+
+        scope = (user_id, request.endpoint, key)
+        fingerprint = _fingerprint()
+        cached = response_cache.get(scope)
+        if cached is not None:
+            return _replay(cached) if cached[0] == fingerprint else _mismatch()
+
+        record_id, response = _claim(scope, fingerprint)
+        if response is not None:
+            return response
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            _release(record_id)
+            raise
+        if response.status_code >= 500 or response.is_streamed or response.direct_passthrough:
+            _release(record_id) # Ошибку сервера можно повторить; потоковый ответ не сохранить
+            return response
+
+        body = response.get_data(as_text=True)
+        db.session.execute(update(IdempotencyRecord).where(IdempotencyRecord.id == record_id).values(
+            status='completed', response_status=response.status_code, response_body=body,
+            response_mimetype=response.mimetype))
+        expires_at = db.session.scalar(select(IdempotencyRecord.expires_at).where(IdempotencyRecord.id == record_id))
+        db.session.commit()
+        if expires_at is not None:
+            response_cache.put(scope, (fingerprint, response.status_code, body, response.mimetype, expires_at),
+                               current_app.config['IDEMPOTENCY_CACHE_SIZE'])
+        return response
+    return wrapper
+
+
+def purge_expired():
+    """Удаляет записи с истекшим сроком; возвращает их число."""
+    result = db.session.execute(delete(IdempotencyRecord).where(IdempotencyRecord.expires_at <= datetime.utcnow()))
+    db.session.commit()
+    return result.rowcount
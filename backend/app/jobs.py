@@ -0,0 +1,184 @@
+# backend/app/jobs.py
+# Фоновые задачи в таблице job: обработчик запроса ставит задачу в очередь и сразу отвечает,
+# а медленную работу (рассылка уведомлений, запрос к Gemini) выполняют воркеры:
+#   flask --app run jobs worker --processes 4
+#
+# Задача ставится в той же транзакции, что и изменения обработчика (enqueue + commit): если запрос
+# откатился, задачи нет. Воркер забирает задачу условным UPDATE (status = 'queued' -> 'running'),
+# поэтому несколько процессов не выполнят одну задачу дважды. Ошибка - повтор с экспоненциальной
+# задержкой до max_attempts; задача упавшего воркера возвращается в очередь через JOBS_LOCK_TIMEOUT_SECONDS.
+# JOBS_INLINE=1 (тесты, разработка без воркера) - задачи выполняются в том же процессе сразу после запроса.
+
+from datetime import datetime, timedelta
+from flask import current_app, g, has_request_context
+import sqlalchemy as sa
+import logging
+import os
+import random
+import signal
+import socket
+import time
+
+from app import db
+from app.models import Job
+
+logger = logging.getLogger(__name__)
+
+# Имя задачи -> (функция, max_attempts или None - из конфигурации)
+_HANDLERS = {}
+
+# Сколько кандидатов читать за раз при захвате задачи (часть может перехватить другой воркер)
+_CLAIM_CANDIDATES = 10
+
+
+class JobFailed(Exception):
+    """Ошибка, которую бессмысленно повторять: задача сразу помечается failed."""
+
+
+def job_handler(kind, max_attempts=None):
+    """Регистрирует функцию как обработчик задач kind; аргументы берутся из payload."""
+    def decorator(func):
+        _HANDLERS[kind] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(kind, payload=None, user_id=None, delay_seconds=0):
+    """Добавляет задачу в сессию; вызывающий код коммитит ее вместе со своими изменениями."""
+    if kind not in _HANDLERS:
+        raise ValueError(f'Unknown job kind: {kind}')
+    _, max_attempts = _HANDLERS[kind]
+    job = Job(
+        kind=kind,
+        payload=payload or {},
+        max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds),
+        created_by_id=user_id,
+    )
+    db.session.add(job)
+    if current_app.config['JOBS_INLINE'] and has_request_context():
+        g.setdefault('inline_jobs', []).append(job)
+    return job
+
+
+def _backoff_seconds(attempts):
+    config = current_app.config
+    delay = min(config['JOBS_BACKOFF_MAX_SECONDS'], config['JOBS_BACKOFF_BASE_SECONDS'] * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0) # Разброс: повторы упавших вместе задач не приходят пачкой
+
+
+def _requeue_stale():
+    """Задачи воркеров, не отчитавшихся за JOBS_LOCK_TIMEOUT_SECONDS, - снова в очередь (или failed)."""
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOBS_LOCK_TIMEOUT_SECONDS'])
+    stale = sa.and_(Job.status == 'running', Job.locked_at < cutoff)
+    db.session.execute(sa.update(Job).where(stale, Job.attempts >= Job.max_attempts).values(
+        status='failed', locked_by=None, finished_at=datetime.utcnow(), last_error='Worker lost'))
+    db.session.execute(sa.update(Job).where(stale).values(status='queued', locked_by=None))
+
+
+def _claim(job_id, worker_id):
+    # Условный UPDATE: задачу получает только тот, кто первым перевел ее из queued
+    result = db.session.execute(
+        sa.update(Job).where(Job.id == job_id, Job.status == 'queued')
+        .values(status='running', locked_by=worker_id, locked_at=datetime.utcnow(), attempts=Job.attempts + 1)
+    )
+    return result.rowcount == 1
+
+
+def claim_next(worker_id):
+    """Захватывает ближайшую готовую задачу; возвращает ее id или None."""
+    _requeue_stale()
+    candidates = db.session.execute(
+        sa.select(Job.id).where(Job.status == 'queued', Job.run_at <= datetime.utcnow())
+        .order_by(Job.run_at, Job.id).limit(_CLAIM_CANDIDATES)
+    ).scalars().all()
+    claimed = next((job_id for job_id in candidates if _claim(job_id, worker_id)), None)
+    db.session.commit()
+    return claimed
+
+
+def execute_job(job_id):
+    """Выполняет захваченную задачу; True - успешно."""
+    job = db.session.get(Job, job_id)
+    kind, payload, attempts, max_attempts = job.kind, job.payload or {}, job.attempts, job.max_attempts
+    started = time.perf_counter()
+    try:
+        if kind not in _HANDLERS:
+            raise JobFailed(f'Unknown job kind: {kind}')
+        result = _HANDLERS[kind][0](**payload)
+        # Отметка об успехе - в одной транзакции с изменениями обработчика
+        db.session.execute(sa.update(Job).where(Job.id == job_id).values(
+            status='succeeded', result=result, last_error=None, locked_by=None, finished_at=datetime.utcnow()))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        final = isinstance(e, JobFailed) or attempts >= max_attempts
+        values = {'last_error': f'{type(e).__name__}: {e}'[:2000], 'locked_by': None}
+        if final:
+            values.update(status='failed', finished_at=datetime.utcnow())
+        else:
+            values.update(status='queued', run_at=datetime.utcnow() + timedelta(seconds=_backoff_seconds(attempts)))
+        db.session.execute(sa.update(Job).where(Job.id == job_id).values(**values))
+        db.session.commit()
+        logger.warning(f"Job {job_id} ({kind}) attempt {attempts}/{max_attempts} failed: {e}"
+                       + ('' if final else ' - will retry'))
+        return False
+    logger.info(f"Job {job_id} ({kind}) done in {(time.perf_counter() - started) * 1000:.0f} ms")
+    return True
+
+
+def run_worker(worker_id=None, poll_interval=None, burst=False):
+    """Цикл воркера до SIGTERM/SIGINT; burst=True - выйти, когда очередь опустеет. Возвращает число задач."""
+    worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+    poll_interval = poll_interval if poll_interval is not None else current_app.config['JOBS_POLL_INTERVAL']
+    stopping = []
+
+    def _stop(signum, frame):
+        stopping.append(signum) # Текущая задача дорабатывает, новые не берутся
+
+    signal.signal(signal.SIGTERM, _stop)
+    signal.signal(signal.SIGINT, _stop)
+
+    processed = 0
+    while not stopping:
+        job_id = claim_next(worker_id)
+        if job_id is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        execute_job(job_id)
+        db.session.remove() # Без накопления объектов в identity map долгоживущего процесса
+        processed += 1
+    return processed
+
+
+def _worker_process(index, poll_interval, burst):
+    # Точка входа дочернего процесса: свое приложение и свой пул соединений с БД
+    from app import create_app
+    app = create_app()
+    with app.app_context():
+        run_worker(f'{socket.gethostname()}:{os.getpid()}:{index}', poll_interval, burst)
+
+
+def _run_inline_jobs(response):
+    """after_request в режиме JOBS_INLINE: выполняет задачи, поставленные этим запросом."""
+    for job in g.pop('inline_jobs', []):
+        # Задача могла не сохраниться: обработчик откатил транзакцию
+        if sa.inspect(job).persistent and _claim(job.id, 'inline'):
+            db.session.commit()
+            execute_job(job.id)
+    return response
+
+
+def purge_jobs(days):
+    """Удаляет выполненные задачи старше days дней; возвращает их количество."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.session.execute(sa.delete(Job).where(Job.status == 'succeeded', Job.finished_at < cutoff))
+    db.session.commit()
+    return result.rowcount
+
+
+def init_jobs(app):
+    """Регистрирует выполнение задач в режиме JOBS_INLINE."""
+    app.after_request(_run_inline_jobs)
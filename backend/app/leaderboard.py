@@ -0,0 +1,152 @@
+# backend/app/leaderboard.py
+# Таблица лидеров тестов: место и процентиль без сортировки всех результатов на каждый запрос.
+#
+# leaderboard_entry хранит лучший результат студента по тесту, score_bucket - гистограмму этих
+# результатов (сколько студентов набрали столько-то баллов). Обе обновляются в транзакции сдачи теста.
+# Баллов не больше числа вопросов, поэтому место = 1 + сумма корзин выше своего балла: это чтение
+# нескольких строк по первичному ключу, сколько бы студентов ни сдавало тест. Страницы лидеров
+# читаются по индексу (test_id, best_score, achieved_at).
+# Таблицы восстанавливаются из test_user и test_user_archive:
+#   flask --app run results leaderboard-rebuild [--test-id N]
+
+from sqlalchemy import and_, delete, func, insert, select, union_all, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import LeaderboardEntry, ScoreBucket, TestUser, TestUserArchive, User
+
+
+def _bump_bucket(test_id, score, delta):
+    bucket = and_(ScoreBucket.test_id == test_id, ScoreBucket.score == score)
+    result = db.session.execute(update(ScoreBucket).where(bucket).values(count=ScoreBucket.count + delta))
+    if result.rowcount == 0:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(ScoreBucket).values(test_id=test_id, score=score, count=delta))
+        except IntegrityError:
+            # Корзину параллельно создал другой запрос
+            db.session.execute(update(ScoreBucket).where(bucket).values(count=ScoreBucket.count + delta))
+
+
+def _entry_for_update(test_id, user_id):
+    return db.session.execute(
+        select(LeaderboardEntry).where(LeaderboardEntry.test_id == test_id, LeaderboardEntry.user_id == user_id)
+        .with_for_update()
+    ).scalar_one_or_none()
+
+
+def record_result(test_id, user_id, score, taken_at):
+    """Учитывает сданный результат; вызывается в транзакции сдачи, коммитит вызывающий код."""
+    if score is None:
+        return
+    entry = _entry_for_update(test_id, user_id)
+    if entry is None:
+        try:
+            with db.session.begin_nested():
+                db.session.add(LeaderboardEntry(test_id=test_id, user_id=user_id, best_score=score,
+                                                achieved_at=taken_at))
+            _bump_bucket(test_id, score, 1)
+            return
+        except IntegrityError:
+            # Параллельная сдача того же студента уже создала строку - дальше как обычное обновление
+            entry = _entry_for_update(test_id, user_id)
+    if score > entry.best_score:
+        _bump_bucket(test_id, entry.best_score, -1)
+        _bump_bucket(test_id, score, 1)
+        entry.best_score = score
+        entry.achieved_at = taken_at
+
+
+def _histogram(test_id):
+    """[(балл, число студентов)] по убыванию балла."""
+    return db.session.execute(
+        select(ScoreBucket.score, ScoreBucket.count)
+        .where(ScoreBucket.test_id == test_id, ScoreBucket.count > 0).order_by(ScoreBucket.score.desc())
+    ).all()
+
+
+def _ranks(histogram):
+    """Балл -> место (1 + число студентов с большим баллом); всего участников."""
+    ranks = {}
+    above = 0
+    for score, count in histogram:
+        ranks[score] = above + 1
+        above += count
+    return ranks, above
+
+
+def standing(test_id, user_id):
+    """Место студента по тесту: {"rank", "score", "percentile", "participants"} или None, если он не сдавал.
+
+    percentile - доля участников (в процентах), набравших не больше, чем этот студент.
+    """
+    best = db.session.execute(
+        select(LeaderboardEntry.best_score)
+        .where(LeaderboardEntry.test_id == test_id, LeaderboardEntry.user_id == user_id)
+    ).scalar_one_or_none()
+    if best is None:
+        return None
+    ranks, total = _ranks(_histogram(test_id))
+    rank = ranks.get(best, 1)
+    return {
+        'rank': rank,
+        'score': best,
+        'percentile': round(100 * (total - rank + 1) / total, 1) if total else 100.0,
+        'participants': total,
+    }
+
+
+def leaderboard_page(test_id, limit, offset=0):
+    """Страница лидеров: {"participants", "entries": [{"rank", "user_id", "username", "score", "achieved_at"}]}."""
+    ranks, total = _ranks(_histogram(test_id))
+    rows = db.session.execute(
+        select(LeaderboardEntry.user_id, User.username, LeaderboardEntry.best_score, LeaderboardEntry.achieved_at)
+        .join(User, User.id == LeaderboardEntry.user_id)
+        .where(LeaderboardEntry.test_id == test_id)
+        .order_by(LeaderboardEntry.best_score.desc(), LeaderboardEntry.achieved_at, LeaderboardEntry.id)
+        .limit(limit).offset(offset)
+    ).all()
+    return {
+        'participants': total,
+        'entries': [{
+            'rank': ranks.get(score, 1),
+            'user_id': user_id,
+            'username': username,
+            'score': score,
+            'achieved_at': achieved_at.isoformat() if achieved_at else None,
+        } for user_id, username, score, achieved_at in rows],
+    }
+
+
+def rebuild_leaderboards(test_id=None):
+    """Пересчитывает лучшие результаты и гистограммы из test_user и архива; возвращает число строк лидеров."""
+    results = union_all(*(
+        select(model.test_id, model.user_id, model.score, model.taken_at).where(model.score.isnot(None))
+        for model in (TestUser, TestUserArchive)
+    )).subquery()
+    best = select(results.c.test_id, results.c.user_id, func.max(results.c.score).label('best_score')) \
+        .group_by(results.c.test_id, results.c.user_id)
+    if test_id is not None:
+        best = best.where(results.c.test_id == test_id)
+    best = best.subquery()
+    # Когда лучший результат был получен впервые - порядок при равенстве баллов
+    entries = select(best.c.test_id, best.c.user_id, best.c.best_score, func.min(results.c.taken_at)) \
+        .join(results, and_(results.c.test_id == best.c.test_id, results.c.user_id == best.c.user_id,
+                            results.c.score == best.c.best_score)) \
+        .group_by(best.c.test_id, best.c.user_id, best.c.best_score)
+    buckets = select(LeaderboardEntry.test_id, LeaderboardEntry.best_score, func.count()) \
+        .group_by(LeaderboardEntry.test_id, LeaderboardEntry.best_score)
+
+    clear_entries, clear_buckets = delete(LeaderboardEntry), delete(ScoreBucket)
+    if test_id is not None:
+        clear_entries = clear_entries.where(LeaderboardEntry.test_id == test_id)
+        clear_buckets = clear_buckets.where(ScoreBucket.test_id == test_id)
+        buckets = buckets.where(LeaderboardEntry.test_id == test_id)
+
+    db.session.execute(clear_entries)
+    db.session.execute(clear_buckets)
+    result = db.session.execute(insert(LeaderboardEntry).from_select(
+        ['test_id', 'user_id', 'best_score', 'achieved_at'], entries))
+    db.session.execute(insert(ScoreBucket).from_select(['test_id', 'score', 'count'], buckets))
+    db.session.commit()
+    return result.rowcount
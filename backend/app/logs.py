@@ -0,0 +1,242 @@
+# backend/app/logs.py
+# Логирование: JSON-строки через очередь и фоновый поток записи.
+#
+# Обработчик запроса только кладет запись в очередь (QueueHandler); форматирование в JSON
+# и запись в поток/файл делает отдельный поток (QueueListener), поэтому медленный диск или
+# stdout не задерживают ответ. Переполненная очередь отбрасывает записи, а не блокирует запрос.
+# Каждая запись несет контекст запроса: request_id (заголовок X-Request-ID), route (endpoint Flask),
+# user_id. После каждого запроса пишется строка доступа с длительностью, с выборкой по маршрутам
+# (LOG_SAMPLE_RATES); ошибки и медленные запросы пишутся всегда. Токены и пароли вырезаются
+# из сообщений и полей до записи.
+
+from flask import current_app, g, has_request_context, request
+from flask.logging import default_handler
+from flask_jwt_extended import get_jwt_identity
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+access_logger = logging.getLogger('app.access')
+
+# Атрибуты LogRecord, которые не относятся к полям, переданным через extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_REDACTED = '[REDACTED]'
+_SECRET_PATTERNS = (
+    re.compile(r'(?i)\b(bearer|basic)\s+[A-Za-z0-9._~+/=-]+'), # Заголовок Authorization
+    re.compile(r'\beyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]*'), # JWT в любом месте текста
+    # "password": "...", access_token=..., api_key: ...
+    re.compile(r'(?i)(["\']?(?:password|passwd|secret|token|access_token|refresh_token|api_key|apikey)["\']?'
+               r'\s*[:=]\s*)("[^"]*"|\'[^\']*\'|[^\s,;&}]+)'),
+)
+_SECRET_KEYS = re.compile(r'(?i)password|secret|token|authorization|api_key|apikey|cookie')
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+def redact(text):
+    """Заменяет токены, ключи и пароли в тексте на [REDACTED]."""
+    if not isinstance(text, str):
+        return text
+    text = _SECRET_PATTERNS[0].sub(lambda m: f'{m.group(1)} {_REDACTED}', text)
+    text = _SECRET_PATTERNS[1].sub(_REDACTED, text)
+    return _SECRET_PATTERNS[2].sub(lambda m: m.group(1) + _REDACTED, text)
+
+
+def _redact_value(key, value):
+    if _SECRET_KEYS.search(key):
+        return _REDACTED
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return {k: _redact_value(str(k), v) for k, v in value.items()}
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON: время, уровень, логгер, сообщение, контекст запроса и поля extra=."""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_') and value is not None:
+                entry[key] = _redact_value(key, value)
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = redact(record.exc_text)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Строка для чтения глазами (LOG_FORMAT=text); секреты вырезаются так же, как в JSON."""
+
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class RequestContextFilter(logging.Filter):
+    """Добавляет к записи request_id, route и user_id текущего запроса."""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(record, 'request_id', None) or g.get('request_id')
+            record.route = getattr(record, 'route', None) or request.endpoint
+            if getattr(record, 'user_id', None) is None:
+                record.user_id = _current_user_id()
+        return True
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не ждет места в очереди и переживает fork (gunicorn с preload_app)."""
+
+    def __init__(self, log_queue, pipeline):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Контекст запроса доступен только в потоке запроса - снимаем его до передачи в очередь
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.ensure_running()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1 # Запись теряется, запрос не ждет
+
+
+class LogPipeline:
+    """Очередь + поток записи; один на процесс."""
+
+    def __init__(self):
+        self.queue = None
+        self.queue_size = 0
+        self.handler = None
+        self.targets = []
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def configure(self, targets, queue_size):
+        self.stop()
+        self.queue_size = queue_size
+        self.targets = targets
+        if self.handler is None:
+            self.handler = _NonBlockingQueueHandler(None, self)
+            self.handler.addFilter(RequestContextFilter())
+        self.ensure_running()
+
+    def ensure_running(self):
+        # После fork поток записи остался в родительском процессе - запускаем свой
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # Новая очередь: записи, скопированные из очереди родителя при fork, запишет сам родитель
+                self.queue = self.handler.queue = queue.Queue(maxsize=self.queue_size)
+                self._listener = logging.handlers.QueueListener(self.queue, *self.targets, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток (при выходе процесса)."""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                while self.queue.full():
+                    time.sleep(0.01) # Места для метки остановки нет - ждем, пока поток разберет очередь
+                self._listener.stop()
+            self._listener, self._pid = None, None
+
+
+pipeline = LogPipeline()
+atexit.register(pipeline.stop)
+
+
+def _current_user_id():
+    try:
+        identity = get_jwt_identity() # Только если маршрут проверил JWT
+    except RuntimeError:
+        return None
+    try:
+        return int(identity) if identity is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _start_request():
+    g.request_started = time.perf_counter()
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+
+
+def _log_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    duration_ms = (time.perf_counter() - started) * 1000
+    response.headers['X-Request-ID'] = g.request_id
+
+    config = current_app.config
+    route = request.endpoint
+    slow = duration_ms >= config['LOG_SLOW_REQUEST_MS']
+    # Ошибки и медленные запросы - всегда, остальное - с долей LOG_SAMPLE_RATES[маршрут]
+    if response.status_code < 500 and not slow:
+        rate = config['LOG_SAMPLE_RATES'].get(route, config['LOG_SAMPLE_RATE'])
+        if rate < 1 and random.random() >= rate:
+            return response
+    level = logging.ERROR if response.status_code >= 500 else logging.WARNING if slow else logging.INFO
+    access_logger.log(level, f'{request.method} {request.path} {response.status_code}', extra={
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        'duration_ms': round(duration_ms, 1),
+        'bytes': response.calculate_content_length() if not response.is_streamed else None,
+    })
+    return response
+
+
+def init_logging(app):
+    """Настраивает корневой логгер на очередь и регистрирует журнал запросов; повторный вызов перенастраивает."""
+    config = app.config
+    if config['LOG_FILE']:
+        target = logging.handlers.WatchedFileHandler(config['LOG_FILE'], encoding='utf-8')
+    else:
+        target = logging.StreamHandler(sys.stderr)
+    target.setFormatter(JsonFormatter() if config['LOG_FORMAT'] == 'json' else
+                        TextFormatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s]: %(message)s',
+                                      defaults={'request_id': '-'}))
+    pipeline.configure([target], config['LOG_QUEUE_SIZE'])
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if handler is not pipeline.handler:
+            root.removeHandler(handler)
+    if pipeline.handler not in root.handlers:
+        root.addHandler(pipeline.handler)
+    app.logger.removeHandler(default_handler) # Записи app.logger идут через корневой логгер
+    root.setLevel(config['LOG_LEVEL'])
+    for name, level in config['LOG_LEVELS'].items():
+        logging.getLogger(name).setLevel(level)
+
+    app.before_request(_start_request)
+    app.after_request(_log_request)
@@ -1,6 +1,7 @@
 from app import db # Импортируем db из __init__.py
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from sqlalchemy.orm import validates
 
 # Таблица для связи многие-ко-многим между Task и User (студентами, которым назначено задание)
 task_assignments = db.Table('task_assignments',
@@ -9,6 +10,28 @@ task_assignments = db.Table('task_assignments',
     db.Column('assigned_at', db.DateTime, default=datetime.utcnow) # Опционально: когда назначено
 )
 
+# Состав учебных групп и назначение им заданий и тестов (см. app/scoping.py).
+# Первичный ключ (group_id, ...) обслуживает выборку по группе, дополнительный индекс - обратную:
+# "группы пользователя", "группы теста" - из них строятся подзапросы EXISTS видимости
+group_members = db.Table('group_members',
+    db.Column('group_id', db.Integer, db.ForeignKey('study_group.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('user_id', db.Integer, db.ForeignKey('user_account.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('added_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_group_members_user_group', 'user_id', 'group_id')
+)
+
+test_groups = db.Table('test_groups',
+    db.Column('test_id', db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('group_id', db.Integer, db.ForeignKey('study_group.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_test_groups_group_test', 'group_id', 'test_id')
+)
+
+task_groups = db.Table('task_groups',
+    db.Column('task_id', db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('group_id', db.Integer, db.ForeignKey('study_group.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_task_groups_group_task', 'group_id', 'task_id')
+)
+
 class Role(db.Model):
     __tablename__ = 'role'
     id = db.Column(db.Integer, primary_key=True)
@@ -26,6 +49,11 @@ class User(db.Model):
     email = db.Column(db.String(100), nullable=False, unique=True)
     password_hash = db.Column(db.Text, nullable=False)
     role_id = db.Column(db.Integer, db.ForeignKey('role.id'), nullable=False) 
+    # Версия токенов: увеличивается при смене роли/выходе, старые JWT становятся недействительными
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Когда пользователь последний раз потерял доступ к части объектов (исключен из группы, сменил роль):
+    # такие объекты не попадают ни в changes, ни в deleted /sync, поэтому клиент получает полный снимок
+    visibility_changed_at = db.Column(db.DateTime, nullable=True)
 
     # Задачи, созданные пользователем (обычно преподавателем)
     tasks_created = db.relationship('Task', backref='creator', lazy=True, foreign_keys='Task.created_by_id')
@@ -62,7 +90,12 @@ class Task(db.Model):
     description = db.Column(db.Text)
     created_by_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=False) 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    due_date = db.Column(db.DateTime, nullable=True)
+    due_date = db.Column(db.DateTime, nullable=True, index=True) # Индекс: диапазонный поиск напоминаний (app/reminders.py)
+    # Время последнего изменения (для /sync): ставится при создании и обновляется при каждом UPDATE
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now(), index=True)
+    # Группы, которым назначено задание (кроме прямых назначений студентам в task_assignments)
+    groups = db.relationship('Group', secondary=task_groups, lazy='select', order_by='Group.id')
 
     def __repr__(self):
         return f'<Task {self.title}>'
@@ -75,18 +108,58 @@ class Book(db.Model):
     file_url = db.Column(db.Text) 
     # ИЗМЕНЕНО: Добавлено created_by_id
     created_by_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=True) 
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now(), index=True)
+    # Загруженный файл книги (см. app/storage.py); file_url остается для внешних ссылок
+    file_id = db.Column(db.Integer, db.ForeignKey('stored_file.id'), nullable=True, index=True)
+    file = db.relationship('StoredFile')
     
     def __repr__(self):
         return f'<Book {self.title}>'
 
+class StoredFile(db.Model):
+    # Файл в хранилище с адресацией по содержимому: одна строка на уникальный sha256.
+    # refcount - число книг, ссылающихся на файл; файл без ссылок удаляет сборка мусора
+    __tablename__ = 'stored_file'
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, unique=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    original_name = db.Column(db.String(255))
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    released_at = db.Column(db.DateTime, index=True) # Когда файл остался без ссылок (NULL - используется)
+
+    def __repr__(self):
+        return f'<StoredFile {self.sha256[:12]} refs={self.refcount}>'
+
+NEWS_EXCERPT_LENGTH = 300
+
+def make_excerpt(text, length=NEWS_EXCERPT_LENGTH):
+    """Начало текста для списков: пробелы схлопываются, обрезка по границе слова."""
+    text = ' '.join((text or '').split())
+    if len(text) <= length:
+        return text
+    cut = text[:length].rsplit(' ', 1)[0] or text[:length]
+    return cut + '...'
+
 class News(db.Model):
     __tablename__ = 'news'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # Заранее посчитанное начало текста: список новостей не читает content целиком
+    excerpt = db.Column(db.String(NEWS_EXCERPT_LENGTH + 3), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     # ИЗМЕНЕНО: nullable=False, новость должна иметь автора
     created_by_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=False) 
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now(), index=True)
+
+    @validates('content')
+    def _update_excerpt(self, key, content):
+        self.excerpt = make_excerpt(content)
+        return content
 
     def __repr__(self):
         return f'<News {self.title}>'
@@ -98,13 +171,40 @@ class Test(db.Model):
     description = db.Column(db.Text, nullable=True)
     created_by_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=False) 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Версия содержимого теста: увеличивается при любом изменении теста или его вопросов,
+    # по ней инвалидируется кэш отрисовки теста для студентов (app/test_sessions.py)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now(), index=True)
 
-    questions = db.relationship('Question', backref='test', lazy='dynamic', cascade="all, delete-orphan")
+    questions = db.relationship('Question', backref='test', lazy='dynamic', cascade="all, delete-orphan",
+                                order_by='(Question.position, Question.id)')
     user_results = db.relationship('TestUser', backref='test', lazy='dynamic', cascade="all, delete-orphan")
+    attempts = db.relationship('TestAttempt', backref='test', lazy='dynamic', cascade="all, delete-orphan")
+    # Группы, которым назначен тест; тест без групп доступен всем студентам
+    groups = db.relationship('Group', secondary=test_groups, lazy='select', order_by='Group.id')
 
     def __repr__(self):
         return f'<Test {self.title}>'
 
+    def bump_version(self):
+        self.version = (self.version or 1) + 1
+
+class Group(db.Model):
+    # Учебная группа (класс, поток): студенты и преподаватели, которым назначаются задания и тесты
+    __tablename__ = 'study_group' # 'group' - зарезервированное слово SQL
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    description = db.Column(db.Text, nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    members = db.relationship('User', secondary=group_members, lazy='dynamic',
+                              backref=db.backref('study_groups', lazy='dynamic'))
+
+    def __repr__(self):
+        return f'<Group {self.name}>'
+
 class Question(db.Model):
     __tablename__ = 'question'
     id = db.Column(db.Integer, primary_key=True)
@@ -113,6 +213,12 @@ class Question(db.Model):
     options = db.Column(db.JSON, nullable=True) 
     correct_answer = db.Column(db.Text, nullable=False) 
     question_type = db.Column(db.String(50), default='single_choice') 
+    # Порядок вопроса в тесте (задается редактором, см. /tests/<id>/questions:batch)
+    position = db.Column(db.Integer, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow,
+                           server_default=db.func.now(), index=True)
+
+    __table_args__ = (db.Index('ix_question_test_position', 'test_id', 'position'),)
 
     def __repr__(self):
         return f'<Question {self.id} for Test {self.test_id}>'
@@ -124,12 +230,198 @@ class TestUser(db.Model):
     test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
     score = db.Column(db.Integer, nullable=True) 
     max_score = db.Column(db.Integer, nullable=True) 
-    taken_at = db.Column(db.DateTime, default=datetime.utcnow)
+    taken_at = db.Column(db.DateTime, default=datetime.utcnow, index=True) # Индекс: выборка для архивации
     answers_submitted = db.Column(db.JSON, nullable=True) 
+    # Попытка, в рамках которой сданы ответы (порядок вопросов/вариантов был перемешан по ее seed)
+    attempt_id = db.Column(db.Integer, db.ForeignKey('test_attempt.id', ondelete='SET NULL'), nullable=True)
+    # Связь задает порядок удаления при каскаде от теста: сначала результаты, потом их попытки
+    attempt = db.relationship('TestAttempt')
+
+    # Одна попытка - один результат: повторная отправка той же попытки не создает дубликат.
+    # submit_test_answers требует attempt_id; NULL остается только у результатов, сданных до появления попыток
+    __table_args__ = (db.UniqueConstraint('user_id', 'test_id', 'attempt_id', name='uq_test_user_attempt'),)
 
     def __repr__(self):
         return f'<TestUser User {self.user_id} Test {self.test_id} Score {self.score}>'
 
+class TestUserArchive(db.Model):
+    # Результаты прошлых семестров (см. app/archive.py): те же столбцы и id, что в test_user.
+    # Горячая таблица остается маленькой, история читается только по запросу (?include_archived=1)
+    __tablename__ = 'test_user_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id', ondelete='CASCADE'), nullable=False, index=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Integer, nullable=True)
+    max_score = db.Column(db.Integer, nullable=True)
+    taken_at = db.Column(db.DateTime)
+    answers_submitted = db.Column(db.JSON, nullable=True)
+    attempt_id = db.Column(db.Integer, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    user = db.relationship('User', viewonly=True)
+    test = db.relationship('Test', viewonly=True)
+
+    def __repr__(self):
+        return f'<TestUserArchive User {self.user_id} Test {self.test_id} Score {self.score}>'
+
+class TestAttempt(db.Model):
+    # Сеанс прохождения теста студентом: seed определяет перестановку вопросов и вариантов ответа
+    __tablename__ = 'test_attempt'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=False)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id'), nullable=False)
+    seed = db.Column(db.BigInteger, nullable=False)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    submitted_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (db.Index('ix_test_attempt_user_test', 'user_id', 'test_id'),)
+
+    def __repr__(self):
+        return f'<TestAttempt {self.id} User {self.user_id} Test {self.test_id}>'
+
+class LeaderboardEntry(db.Model):
+    # Лучший результат студента по тесту (см. app/leaderboard.py): одна строка на пару (тест, студент)
+    __tablename__ = 'leaderboard_entry'
+    id = db.Column(db.Integer, primary_key=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id', ondelete='CASCADE'), nullable=False)
+    best_score = db.Column(db.Integer, nullable=False)
+    achieved_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    user = db.relationship('User', viewonly=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('test_id', 'user_id', name='uq_leaderboard_entry_test_user'),
+        # Страницы таблицы лидеров: лучшие результаты теста, при равенстве - кто раньше набрал
+        db.Index('ix_leaderboard_entry_test_score', 'test_id', 'best_score', 'achieved_at'),
+    )
+
+    def __repr__(self):
+        return f'<LeaderboardEntry Test {self.test_id} User {self.user_id} Score {self.best_score}>'
+
+class ScoreBucket(db.Model):
+    # Гистограмма лучших результатов теста: сколько студентов набрали score баллов.
+    # Баллов не больше числа вопросов, поэтому место и процентиль - сумма по нескольким строкам
+    __tablename__ = 'score_bucket'
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<ScoreBucket Test {self.test_id} Score {self.score}: {self.count}>'
+
+class AnswerSignature(db.Model):
+    # MinHash-подпись свободного ответа (text_input) для поиска похожих ответов (см. app/similarity.py)
+    __tablename__ = 'answer_signature'
+    id = db.Column(db.Integer, primary_key=True)
+    test_user_id = db.Column(db.Integer, db.ForeignKey('test_user.id', ondelete='CASCADE'), nullable=False, index=True)
+    test_id = db.Column(db.Integer, db.ForeignKey('test.id', ondelete='CASCADE'), nullable=False)
+    question_id = db.Column(db.Integer, db.ForeignKey('question.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id', ondelete='CASCADE'), nullable=False)
+    signature = db.Column(db.LargeBinary(256), nullable=False) # 64 x uint32, little-endian
+
+    __table_args__ = (db.Index('ix_answer_signature_test_question', 'test_id', 'question_id'),)
+
+    def __repr__(self):
+        return f'<AnswerSignature Result {self.test_user_id} Question {self.question_id}>'
+
+class IdempotencyRecord(db.Model):
+    # Ответ на запрос с заголовком Idempotency-Key (см. app/idempotency.py): повтор запроса с тем же
+    # ключом получает сохраненный ответ, а не выполняется заново
+    __tablename__ = 'idempotency_record'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id', ondelete='CASCADE'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(100), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False) # Тот же ключ с другим запросом - ошибка клиента
+    status = db.Column(db.String(20), nullable=False, default='in_progress') # in_progress, completed
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_mimetype = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (db.UniqueConstraint('user_id', 'endpoint', 'key', name='uq_idempotency_user_endpoint_key'),)
+
+    def __repr__(self):
+        return f'<IdempotencyRecord {self.endpoint} {self.key} {self.status}>'
+
+class Tombstone(db.Model):
+    # Запись об удалении объекта: клиенты, синхронизирующиеся через /sync, удаляют его у себя
+    __tablename__ = 'tombstone'
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False) # 'books', 'news', 'tasks', 'tests', 'questions'
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    __table_args__ = (db.Index('ix_tombstone_entity_deleted', 'entity', 'deleted_at'),)
+
+    def __repr__(self):
+        return f'<Tombstone {self.entity} {self.entity_id}>'
+
+class Job(db.Model):
+    # Фоновая задача (см. app/jobs.py): обработчик по имени kind с аргументами payload
+    __tablename__ = 'job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.JSON, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued') # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow) # Не раньше (отложенный повтор)
+    locked_by = db.Column(db.String(100), nullable=True) # Воркер, выполняющий задачу
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)
+    created_by_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Выборка воркером: WHERE status = 'queued' AND run_at <= now ORDER BY run_at
+    __table_args__ = (db.Index('ix_job_status_run_at', 'status', 'run_at'),)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.kind} {self.status}>'
+
+class Notification(db.Model):
+    # Уведомление пользователю (например, о новой новости); создается фоновой задачей
+    __tablename__ = 'notification'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id'), nullable=False)
+    type = db.Column(db.String(30), nullable=False) # 'news', 'task', 'test_result', 'general'
+    ref_id = db.Column(db.Integer, nullable=True) # id источника: новости, записи reminder_log
+    message = db.Column(db.String(300), nullable=False)
+    link = db.Column(db.String(200), nullable=True) # Страница фронтенда, например /news/5
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    read_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Повтор задачи рассылки не создает дубликатов
+        db.UniqueConstraint('user_id', 'type', 'ref_id', name='uq_notification_user_type_ref'),
+        db.Index('ix_notification_user_read', 'user_id', 'read_at'),
+    )
+
+    def __repr__(self):
+        return f'<Notification {self.type} {self.ref_id} for User {self.user_id}>'
+
+class ReminderLog(db.Model):
+    # Отправленное напоминание о сроке задания: повторный запуск планировщика его не дублирует.
+    # due_date входит в ключ - если срок задания перенесли, напоминания придут заново
+    __tablename__ = 'reminder_log'
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, db.ForeignKey('task.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user_account.id', ondelete='CASCADE'), nullable=False)
+    window = db.Column(db.String(10), nullable=False) # Окно напоминания, например '24h'
+    due_date = db.Column(db.DateTime, nullable=False)
+    sent_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'user_id', 'window', 'due_date', name='uq_reminder_log'),
+    )
+
+    def __repr__(self):
+        return f'<ReminderLog Task {self.task_id} User {self.user_id} {self.window}>'
+
 # Важно: После изменения моделей не забудьте создать и применить миграции:
 # 1. flask db migrate -m "updated_models_for_book_news_role" (или другое осмысленное сообщение)
 # 2. flask db upgrade
@@ -0,0 +1,33 @@
+# backend/app/notifications.py
+# Уведомления пользователям. Рассылка о новости - фоновая задача (app/jobs.py): создание новости
+# не ждет вставки строки на каждого пользователя.
+
+from sqlalchemy import exists, insert, literal, select
+
+from app import db
+from app.jobs import JobFailed, job_handler
+from app.models import News, Notification, User
+
+
+@job_handler('news.notify')
+def notify_about_news(news_id):
+    """Уведомляет всех пользователей, кроме автора, о новости news_id.
+
+    Один INSERT ... SELECT; пользователи, уже получившие уведомление (повтор задачи), пропускаются.
+    """
+    news = db.session.get(News, news_id)
+    if news is None:
+        raise JobFailed(f'News {news_id} not found') # Удалена до рассылки - повторять незачем
+
+    already_notified = exists().where(
+        Notification.user_id == User.id, Notification.type == 'news', Notification.ref_id == news.id)
+    recipients = select(
+        User.id, literal('news'), literal(news.id), literal(f'News: {news.title}'[:300]),
+        literal(f'/news/{news.id}'), literal(news.created_at)
+    ).where(~already_notified)
+    if news.created_by_id is not None:
+        recipients = recipients.where(User.id != news.created_by_id)
+
+    result = db.session.execute(insert(Notification).from_select(
+        ['user_id', 'type', 'ref_id', 'message', 'link', 'created_at'], recipients))
+    return {'notified': result.rowcount}
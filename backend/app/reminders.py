@@ -0,0 +1,100 @@
+# backend/app/reminders.py
+# Напоминания о сроках заданий. Запуск по расписанию (cron) или циклом:
+#   flask --app run reminders send [--loop]
+#
+# Окна REMINDER_WINDOWS_HOURS (например, 72, 24, 1) делят будущее на полосы (24ч, 72ч], (1ч, 24ч], (0, 1ч]:
+# задание получает одно напоминание на полосу, в которую попал его срок. Задания ищутся диапазоном
+# по индексу task.due_date, получатели (назначенные лично и через группы) - одним SELECT на пачку
+# заданий, без запросов по каждому студенту. reminder_log хранит отправленное: повторный запуск ничего не дублирует.
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import exists, insert, select, union
+from sqlalchemy.exc import IntegrityError
+import logging
+
+from app import db
+from app.models import Notification, ReminderLog, Task, group_members, task_assignments, task_groups
+
+logger = logging.getLogger(__name__)
+
+
+def reminder_bands(hours):
+    """Окна в часах -> [(нижняя граница, верхняя граница, метка)] без пересечений."""
+    bands = []
+    lower = 0
+    for upper in sorted(set(hours)):
+        bands.append((lower, upper, f'{upper}h'))
+        lower = upper
+    return bands
+
+
+def _send_batch(tasks, label, now):
+    """Напоминания по пачке заданий [(id, title, due_date)] в окне label; возвращает их число."""
+    task_ids = [task_id for task_id, _, _ in tasks]
+    # Получатели: назначенные лично и участники групп задания (UNION убирает тех, кто попал дважды)
+    recipients = union(
+        select(task_assignments.c.task_id, task_assignments.c.user_id)
+        .where(task_assignments.c.task_id.in_(task_ids)),
+        select(task_groups.c.task_id, group_members.c.user_id)
+        .join(group_members, group_members.c.group_id == task_groups.c.group_id)
+        .where(task_groups.c.task_id.in_(task_ids)),
+    ).subquery()
+    already_sent = exists().where(
+        ReminderLog.task_id == recipients.c.task_id, ReminderLog.user_id == recipients.c.user_id,
+        ReminderLog.window == label, ReminderLog.due_date == Task.due_date)
+    pending = db.session.execute(
+        select(recipients.c.task_id, recipients.c.user_id, Task.due_date)
+        .join(Task, Task.id == recipients.c.task_id)
+        .where(~already_sent)
+    ).all()
+    if not pending:
+        return 0
+
+    # Записи журнала - объектами: после flush известны их id, без повторного поиска вставленного
+    logs = [ReminderLog(task_id=task_id, user_id=user_id, window=label, due_date=due_date, sent_at=now)
+            for task_id, user_id, due_date in pending]
+    db.session.add_all(logs)
+    db.session.flush()
+
+    titles = {task_id: title for task_id, title, _ in tasks}
+    db.session.execute(insert(Notification), [{
+        'user_id': log.user_id,
+        'type': 'task',
+        'ref_id': log.id,
+        'message': f'Reminder: "{titles[log.task_id]}" is due {log.due_date:%b %d, %H:%M} UTC'[:300],
+        'link': f'/tasks/{log.task_id}',
+        'created_at': now,
+    } for log in logs])
+    return len(logs)
+
+
+def send_due_reminders(now=None, batch_size=None):
+    """Отправляет напоминания по всем окнам; возвращает {метка окна: число напоминаний}."""
+    config = current_app.config
+    batch_size = batch_size or config['REMINDER_BATCH_SIZE']
+    now = now or datetime.utcnow()
+
+    stats = {}
+    for lower, upper, label in reminder_bands(config['REMINDER_WINDOWS_HOURS']):
+        start, end = now + timedelta(hours=lower), now + timedelta(hours=upper)
+        sent = 0
+        last_id = 0
+        while True:
+            tasks = db.session.execute(
+                select(Task.id, Task.title, Task.due_date)
+                .where(Task.due_date > start, Task.due_date <= end, Task.id > last_id)
+                .order_by(Task.id).limit(batch_size)
+            ).all()
+            if not tasks:
+                break
+            last_id = tasks[-1][0]
+            try:
+                sent += _send_batch(tasks, label, now)
+                db.session.commit() # Каждая пачка - своя транзакция: сбой не откатывает уже отправленное
+            except IntegrityError:
+                # Параллельный запуск уже вставил часть записей - эти задания доберет следующий запуск
+                db.session.rollback()
+                logger.warning(f"Reminder batch after task {last_id} ({label}) conflicted with another run")
+        stats[label] = sent
+    return stats
@@ -1,55 +1,49 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, send_file, g
 from app import db, jwt # Импортируем db и jwt из __init__.py
-from app.models import User, Role, Book, Task, News, Test, Question, TestUser # Убедимся, что все модели импортированы
+from app.models import User, Role, Book, Task, News, Test, Question, TestUser, TestAttempt, Job, Notification, Group, group_members, task_groups, test_groups # Убедимся, что все модели импортированы
 from app.schemas import (
     user_schema, users_schema, role_schema, roles_schema,
-    book_schema, books_schema, task_schema, tasks_schema,
-    news_item_schema, news_list_schema, test_schema, tests_schema,
-    question_schema, questions_schema, test_user_schema, test_users_schema
+    book_schema, task_schema,
+    news_item_schema, test_schema,
+    question_schema, questions_schema, test_user_schema, stored_file_schema,
+    job_schema, jobs_schema, notifications_schema, group_schema, groups_schema
 )
 from werkzeug.security import generate_password_hash, check_password_hash
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from functools import wraps
+from flask_jwt_extended import jwt_required
+from app.auth import (
+    get_current_user, get_current_user_id, get_current_role, role_required,
+    is_owner_or_admin, issue_tokens, bump_token_version
+)
+from app.archive import dump_results
+from app.batch import METHODS as BATCH_METHODS, dispatch
+from app.compression import get_payload_stats
+from app.db_routing import read_from_primary
+from app.fast_serializers import (
+    json_response, books_serializer, tasks_serializer, news_list_serializer, test_headers_serializer
+)
+from app.idempotency import idempotent
+from app.jobs import enqueue
+from app.leaderboard import leaderboard_page, record_result, standing
+from app.similarity import similarity_report # Также регистрирует обработчик задачи results.signatures
+from app.scoping import can_view_task, can_view_test, result_visibility, task_visibility, test_visibility
+from app import notifications # noqa: F401 - регистрирует обработчик задачи news.notify
+from app.storage import FileTooLarge, save_stream, acquire_file, release_file, file_path
+from app.sync import build_sync_payload, mark_visibility_changed, record_tombstones
+from app.test_sessions import (
+    get_student_view, start_or_resume_attempt, render_attempt, compact_questions, unshuffle_answers
+)
 import json
-from datetime import datetime
-import random
-import google.generativeai as genai
+from datetime import datetime, timezone
+from sqlalchemy import insert, update, delete, func, select
+from sqlalchemy.exc import IntegrityError
 
 bp = Blueprint('api', __name__, url_prefix='/api')
 
-# --- Вспомогательные функции и декораторы ---
-
-def get_current_user():
-    """Возвращает текущего аутентифицированного пользователя или None."""
-    current_user_id_str = get_jwt_identity()
-    if not current_user_id_str:
-        return None
-    try:
-        user_id = int(current_user_id_str)
-        return User.query.get(user_id)
-    except (ValueError, TypeError):
-        return None
-
-def role_required(roles):
-    """Декоратор для проверки ролей пользователя."""
-    if not isinstance(roles, list):
-        roles = [roles]
-    def decorator(f):
-        @wraps(f)
-        def decorated_function(*args, **kwargs):
-            user = get_current_user()
-            if not user:
-                return jsonify({"msg": "Authentication required or user not found"}), 401 # Уточнено сообщение
-            if user.role.name not in roles:
-                return jsonify({"msg": "Permission denied. Required roles: " + ", ".join(roles)}), 403
-            return f(*args, **kwargs)
-        return decorated_function
-    return decorator
-
 # --- Роли ---
 @bp.route('/roles', methods=['POST'])
 @jwt_required()
 @role_required('admin')
+@idempotent
 def create_role():
     data = request.get_json()
     if not data or not data.get('name'):
@@ -125,9 +119,8 @@ def login():
     user = User.query.filter_by(username=username).first()
 
     if user and user.check_password(password):
-        access_token = create_access_token(identity=str(user.id))
         user_data = user_schema.dump(user)
-        user_data['access_token'] = access_token
+        user_data.update(issue_tokens(user))
         user_data['id'] = user.id 
         return jsonify(user_data), 200
     else:
@@ -141,6 +134,25 @@ def protected():
          return jsonify({"msg": "User not found or token invalid"}), 401 # 401 более подходит для проблем с аутентификацией
     return jsonify(logged_in_as=user_schema.dump(user)), 200
 
+@bp.route('/refresh', methods=['POST'])
+@jwt_required(refresh=True)
+def refresh():
+    # Новый access токен по refresh токену: без проверки пароля, claims берем из БД (роль могла измениться)
+    user = get_current_user()
+    if not user:
+        return jsonify({"msg": "User not found or token invalid"}), 401
+    return jsonify(issue_tokens(user, with_refresh=False)), 200
+
+@bp.route('/logout', methods=['POST'])
+@jwt_required(verify_type=False) # Выйти можно как с access, так и с refresh токеном
+def logout():
+    user = get_current_user()
+    if not user:
+        return jsonify({"msg": "User not found or token invalid"}), 401
+    bump_token_version(user) # Отзываем все выданные токены пользователя
+    db.session.commit()
+    return jsonify({"msg": "Logged out"}), 200
+
 @bp.route('/users', methods=['GET'])
 @jwt_required()
 @role_required('admin')
@@ -155,23 +167,81 @@ def get_user_by_id(user_id):
     user = User.query.get_or_404(user_id)
     return jsonify(user_schema.dump(user)), 200
 
+@bp.route('/users/<int:user_id>/role', methods=['PUT'])
+@jwt_required()
+@role_required('admin')
+def update_user_role(user_id):
+    user = User.query.get_or_404(user_id)
+    data = request.get_json()
+    if not data or not data.get('role'):
+        return jsonify({"msg": "Missing role name"}), 400
+
+    role = Role.query.filter_by(name=data['role']).first()
+    if not role:
+        return jsonify({"msg": f"Role '{data['role']}' not found"}), 404
+
+    if user.role_id != role.id:
+        user.role = role
+        bump_token_version(user) # Роль зашита в токены - старые токены больше не действительны
+        user.visibility_changed_at = datetime.utcnow() # Видимость зависит от роли - /sync пришлет полный снимок
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not update user role", "error": str(e)}), 500
+    return jsonify(user_schema.dump(user)), 200
+
 # --- CRUD для Книг (Book) ---
+@bp.route('/books/files', methods=['POST'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def upload_book_file():
+    """Загрузка файла книги: multipart-поле 'file' или сырое тело (имя - в ?filename=).
+
+    Возвращает id файла для create_book/update_book; одинаковое содержимое хранится один раз.
+    """
+    max_bytes = current_app.config['BOOK_FILE_MAX_BYTES']
+    if max_bytes and (request.content_length or 0) > max_bytes:
+        return jsonify({"msg": "File is too large"}), 413
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({"msg": "Missing file"}), 400
+        stream, content_type, filename = upload.stream, upload.mimetype, upload.filename
+    else:
+        # Сырое тело читается из сокета кусками прямо в хранилище, без промежуточной копии
+        stream, content_type, filename = request.stream, request.mimetype, request.args.get('filename')
+
+    try:
+        stored, existed = save_stream(stream, content_type=content_type, original_name=filename)
+        db.session.commit()
+    except FileTooLarge:
+        return jsonify({"msg": "File is too large"}), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not store file", "error": str(e)}), 500
+    return jsonify(stored_file_schema.dump(stored)), 200 if existed else 201
+
 @bp.route('/books', methods=['POST'])
 @jwt_required()
 @role_required(['teacher', 'admin'])
+@idempotent
 def create_book():
     data = request.get_json()
-    user = get_current_user() # Получаем текущего пользователя
-    # if not user: # Эта проверка уже есть в role_required
-    #     return jsonify({"msg": "Authentication required or user not found"}), 401
+    user_id = get_current_user_id() # Получаем текущего пользователя
 
     try:
         new_book = Book(
             title=data['title'],
             author=data.get('author'),
             file_url=data.get('file_url'),
-            created_by_id=user.id # ИЗМЕНЕНО: устанавливаем создателя книги
+            file_id=data.get('file_id'),
+            created_by_id=user_id # ИЗМЕНЕНО: устанавливаем создателя книги
         )
+        if new_book.file_id is not None and not acquire_file(new_book.file_id):
+            db.session.rollback()
+            return jsonify({"msg": "File not found"}), 400
         db.session.add(new_book)
         db.session.commit()
         return jsonify(book_schema.dump(new_book)), 201
@@ -184,8 +254,8 @@ def create_book():
 @bp.route('/books', methods=['GET'])
 # @jwt_required() # Книги могут быть доступны и неавторизованным пользователям для просмотра
 def get_books():
-    all_books = Book.query.all()
-    return jsonify(books_schema.dump(all_books)), 200
+    # Один SELECT с outer join создателя и файла вместо ленивой загрузки на каждую книгу
+    return json_response(books_serializer.dump(books_serializer.select().order_by(Book.id)))
 
 @bp.route('/books/<int:book_id>', methods=['GET'])
 # @jwt_required() # Детали книги также могут быть доступны всем
@@ -193,17 +263,47 @@ def get_book(book_id):
     book = Book.query.get_or_404(book_id)
     return jsonify(book_schema.dump(book)), 200
 
+@bp.route('/books/<int:book_id>/file', methods=['GET'])
+# Как и сама книга, файл доступен без авторизации
+def download_book_file(book_id):
+    """Скачивание файла книги: Range/If-Range, ETag = sha256, кэширование на клиенте и в CDN."""
+    book = Book.query.get_or_404(book_id)
+    stored = book.file
+    if stored is None:
+        return jsonify({"msg": "Book has no uploaded file"}), 404
+
+    path = file_path(stored.sha256)
+    config = current_app.config
+    accel_prefix = config['BOOK_FILE_X_ACCEL_PREFIX']
+    if accel_prefix:
+        # Отдачу (sendfile, Range) берет на себя nginx: internal location смотрит в BOOK_STORAGE_DIR
+        response = current_app.response_class(mimetype=stored.content_type)
+        response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{stored.sha256[:2]}/{stored.sha256}"
+        response.set_etag(stored.sha256)
+    else:
+        try:
+            # conditional=True: 206 на Range, проверка If-Range/If-None-Match по ETag, 304 без тела.
+            # Файл отдается через wsgi.file_wrapper - gunicorn использует sendfile() без копирования в Python
+            response = send_file(path, mimetype=stored.content_type, conditional=True, etag=stored.sha256,
+                                 download_name=stored.original_name or f'book-{book.id}', max_age=0)
+        except FileNotFoundError:
+            return jsonify({"msg": "File is missing from storage"}), 404
+
+    # Содержимое по адресу ?v=<sha256> никогда не меняется; без него у книги может смениться файл
+    if request.args.get('v') == stored.sha256:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = f"public, max-age={config['BOOK_FILE_MAX_AGE']}, must-revalidate"
+    return response
+
 @bp.route('/books/<int:book_id>', methods=['PUT'])
 @jwt_required()
 @role_required(['teacher', 'admin'])
 def update_book(book_id):
     book = Book.query.get_or_404(book_id)
-    user = get_current_user()
-    # if not user: # Проверка уже в role_required
-    #     return jsonify({"msg": "Authentication required or user not found"}), 401
 
     # ИЗМЕНЕНО: Проверка прав - только создатель (если uploader есть) или админ
-    if user.role.name != 'admin' and (book.created_by_id is not None and book.created_by_id != user.id):
+    if book.created_by_id is not None and not is_owner_or_admin(book.created_by_id):
         return jsonify({"msg": "Permission denied. You are not the creator of this book or an admin."}), 403
     
     data = request.get_json()
@@ -212,6 +312,13 @@ def update_book(book_id):
     book.file_url = data.get('file_url', book.file_url)
     
     try:
+        # Замена или удаление файла (file_id: null): ссылка на старый файл освобождается
+        if 'file_id' in data and data['file_id'] != book.file_id:
+            if data['file_id'] is not None and not acquire_file(data['file_id']):
+                db.session.rollback()
+                return jsonify({"msg": "File not found"}), 400
+            release_file(book.file_id)
+            book.file_id = data['file_id']
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -223,32 +330,195 @@ def update_book(book_id):
 @role_required(['teacher', 'admin'])
 def delete_book(book_id):
     book = Book.query.get_or_404(book_id)
-    user = get_current_user()
-    # if not user: # Проверка уже в role_required
-    #     return jsonify({"msg": "Authentication required or user not found"}), 401
 
     # ИЗМЕНЕНО: Проверка прав
-    if user.role.name != 'admin' and (book.created_by_id is not None and book.created_by_id != user.id):
+    if book.created_by_id is not None and not is_owner_or_admin(book.created_by_id):
         return jsonify({"msg": "Permission denied. You are not the creator of this book or an admin."}), 403
         
+    release_file(book.file_id) # Сам файл удалит сборка мусора, если на него больше нет ссылок
     db.session.delete(book)
     db.session.commit()
     return jsonify({"msg": "Book deleted"}), 200
 
+# --- Учебные группы ---
+def _touch_group_content(group_id):
+    """Смена состава группы меняет видимость ее тестов и заданий - помечаем их измененными для /sync."""
+    now = datetime.utcnow()
+    db.session.execute(update(Test).where(
+        Test.id.in_(select(test_groups.c.test_id).where(test_groups.c.group_id == group_id))).values(updated_at=now))
+    db.session.execute(update(Task).where(
+        Task.id.in_(select(task_groups.c.task_id).where(task_groups.c.group_id == group_id))).values(updated_at=now))
+
+def _members_of(group_ids):
+    """Условие на User: состоит хотя бы в одной из групп."""
+    return User.id.in_(select(group_members.c.user_id).where(group_members.c.group_id.in_(group_ids)))
+
+def _member_ids(data):
+    user_ids = (data or {}).get('user_ids')
+    if not isinstance(user_ids, list) or not all(isinstance(i, int) for i in user_ids):
+        return None
+    return user_ids
+
+def _load_groups(group_ids):
+    """Группы по списку id одним запросом; None, если список некорректен или группы не найдены."""
+    if not isinstance(group_ids, list) or not all(isinstance(i, int) for i in group_ids):
+        return None
+    groups = Group.query.filter(Group.id.in_(group_ids)).order_by(Group.id).all() if group_ids else []
+    return groups if len(groups) == len(set(group_ids)) else None
+
+@bp.route('/groups', methods=['POST'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+@idempotent
+def create_group():
+    data = request.get_json()
+    if not data or not data.get('name'):
+        return jsonify({"msg": "Missing name for the group"}), 400
+    if Group.query.filter_by(name=data['name']).first():
+        return jsonify({"msg": "Group already exists"}), 409
+    try:
+        new_group = Group(name=data['name'], description=data.get('description'), created_by_id=get_current_user_id())
+        db.session.add(new_group)
+        db.session.commit()
+        return jsonify(group_schema.dump(new_group)), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not create group", "error": str(e)}), 500
+
+@bp.route('/groups', methods=['GET'])
+@jwt_required()
+def get_groups():
+    user = get_current_user()
+    if not user:
+        return jsonify({"msg": "User not found or token invalid"}), 401
+    query = Group.query.order_by(Group.name)
+    if user.role.name == 'student':
+        # Только свои группы: индекс ix_group_members_user_group
+        query = query.join(group_members, group_members.c.group_id == Group.id) \
+            .filter(group_members.c.user_id == user.id)
+    return jsonify(groups_schema.dump(query.all())), 200
+
+@bp.route('/groups/<int:group_id>', methods=['GET'])
+@jwt_required()
+def get_group(group_id):
+    group = Group.query.get_or_404(group_id)
+    user = get_current_user()
+    if not user:
+        return jsonify({"msg": "User not found or token invalid"}), 401
+    if user.role.name == 'student':
+        is_member = db.session.execute(select(group_members.c.user_id).where(
+            group_members.c.group_id == group.id, group_members.c.user_id == user.id)).first()
+        if not is_member:
+            return jsonify({"msg": "Permission denied"}), 403
+    return jsonify(group_schema.dump(group)), 200
+
+@bp.route('/groups/<int:group_id>', methods=['PUT'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def update_group(group_id):
+    group = Group.query.get_or_404(group_id)
+    if not is_owner_or_admin(group.created_by_id):
+        return jsonify({"msg": "Permission denied. You are not the creator of this group."}), 403
+
+    data = request.get_json()
+    name = data.get('name', group.name)
+    if name != group.name and Group.query.filter_by(name=name).first():
+        return jsonify({"msg": "Group already exists"}), 409
+    group.name = name
+    group.description = data.get('description', group.description)
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not update group", "error": str(e)}), 500
+    return jsonify(group_schema.dump(group)), 200
+
+@bp.route('/groups/<int:group_id>', methods=['DELETE'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def delete_group(group_id):
+    group = Group.query.get_or_404(group_id)
+    if not is_owner_or_admin(group.created_by_id):
+        return jsonify({"msg": "Permission denied. You are not the creator of this group."}), 403
+    # Тест без групп открыт всем: удаление последней группы теста незаметно открыло бы его
+    if db.session.execute(select(test_groups.c.test_id).where(test_groups.c.group_id == group.id)).first():
+        return jsonify({"msg": "Group has tests assigned. Reassign them before deleting the group."}), 409
+
+    _touch_group_content(group.id)
+    mark_visibility_changed(_members_of([group.id])) # Участники теряют задания группы
+    db.session.delete(group)
+    db.session.commit()
+    return jsonify({"msg": "Group deleted"}), 200
+
+@bp.route('/groups/<int:group_id>/members', methods=['POST'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def add_group_members(group_id):
+    group = Group.query.get_or_404(group_id)
+    if not is_owner_or_admin(group.created_by_id):
+        return jsonify({"msg": "Permission denied. You are not the creator of this group."}), 403
+    user_ids = _member_ids(request.get_json())
+    if user_ids is None:
+        return jsonify({"msg": "user_ids must be a list of user ids"}), 400
+
+    # Один INSERT ... SELECT: несуществующие пользователи и уже состоящие в группе пропускаются
+    already_member = select(group_members.c.user_id).where(
+        group_members.c.group_id == group.id, group_members.c.user_id == User.id).exists()
+    new_members = select(db.literal(group.id), User.id, db.literal(datetime.utcnow())) \
+        .where(User.id.in_(user_ids), ~already_member)
+    try:
+        result = db.session.execute(insert(group_members).from_select(['group_id', 'user_id', 'added_at'], new_members))
+        if result.rowcount:
+            _touch_group_content(group.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not add group members", "error": str(e)}), 500
+    return jsonify({"msg": "Members added", "added": result.rowcount}), 200
+
+@bp.route('/groups/<int:group_id>/members', methods=['DELETE'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def remove_group_members(group_id):
+    group = Group.query.get_or_404(group_id)
+    if not is_owner_or_admin(group.created_by_id):
+        return jsonify({"msg": "Permission denied. You are not the creator of this group."}), 403
+    user_ids = _member_ids(request.get_json())
+    if user_ids is None:
+        return jsonify({"msg": "user_ids must be a list of user ids"}), 400
+
+    try:
+        # Исключенные теряют тесты и задания группы - их /sync не узнает об этом из tombstone
+        mark_visibility_changed(_members_of([group.id]) & User.id.in_(user_ids))
+        result = db.session.execute(delete(group_members).where(
+            group_members.c.group_id == group.id, group_members.c.user_id.in_(user_ids)))
+        if result.rowcount:
+            _touch_group_content(group.id)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not remove group members", "error": str(e)}), 500
+    return jsonify({"msg": "Members removed", "removed": result.rowcount}), 200
+
 # --- CRUD для Заданий (Task) ---
 @bp.route('/tasks', methods=['POST'])
 @jwt_required()
 @role_required(['teacher', 'admin']) # Админ тоже может создавать задачи? Если да, то ['teacher', 'admin']
+@idempotent
 def create_task():
     data = request.get_json()
-    user = get_current_user()
+    user_id = get_current_user_id()
+    groups = _load_groups(data.get('group_ids', []))
+    if groups is None:
+        return jsonify({"msg": "group_ids must be a list of existing group ids"}), 400
     try:
         new_task = Task(
             title=data['title'],
             description=data.get('description'),
-            created_by_id=user.id,
+            created_by_id=user_id,
             due_date=data.get('due_date') 
         )
+        new_task.groups = groups
         db.session.add(new_task)
         db.session.commit()
         return jsonify(task_schema.dump(new_task)), 201
@@ -265,15 +535,12 @@ def get_tasks():
     if not user:
          return jsonify({"msg": "User not found or token invalid"}), 401
 
-    if user.role.name == 'teacher':
-        tasks = Task.query.filter_by(created_by_id=user.id).all()
-    elif user.role.name == 'student':
-        tasks = user.assigned_tasks.all() 
-    elif user.role.name == 'admin':
-        tasks = Task.query.all()
-    else:
-        tasks = [] # На всякий случай
-    return jsonify(tasks_schema.dump(tasks)), 200
+    # Список отдается скомпилированным сериализатором: столбцы через select(), без ORM-объектов.
+    # Студенту - задания, назначенные лично или его группам (EXISTS, см. app/scoping.py)
+    if user.role.name not in ('admin', 'teacher', 'student'):
+        return jsonify([]), 200 # На всякий случай
+    query = tasks_serializer.select().where(task_visibility(user.id, user.role.name))
+    return json_response(tasks_serializer.dump(query))
 
 @bp.route('/tasks/<int:task_id>', methods=['GET'])
 @jwt_required()
@@ -286,8 +553,8 @@ def get_task(task_id):
     # Админ или создатель видят задачу
     if user.role.name == 'admin' or task.created_by_id == user.id:
         return jsonify(task_schema.dump(task)), 200
-    # Студент видит задачу, если она ему назначена
-    if user.role.name == 'student' and task in user.assigned_tasks:
+    # Студент видит задачу, если она назначена ему или его группе
+    if user.role.name == 'student' and can_view_task(task.id, user.id, 'student'):
          return jsonify(task_schema.dump(task)), 200
     
     return jsonify({"msg": "Permission denied"}), 403
@@ -298,15 +565,23 @@ def get_task(task_id):
 @role_required(['teacher', 'admin']) 
 def update_task(task_id):
     task = Task.query.get_or_404(task_id)
-    user = get_current_user()
 
-    if user.role.name != 'admin' and task.created_by_id != user.id: 
+    if not is_owner_or_admin(task.created_by_id): 
         return jsonify({"msg": "Permission denied. You are not the creator of this task."}), 403
 
     data = request.get_json()
     task.title = data.get('title', task.title)
     task.description = data.get('description', task.description)
     task.due_date = data.get('due_date', task.due_date)
+    if 'group_ids' in data:
+        groups = _load_groups(data['group_ids'])
+        if groups is None:
+            return jsonify({"msg": "group_ids must be a list of existing group ids"}), 400
+        removed = {g.id for g in task.groups} - {g.id for g in groups}
+        if removed:
+            mark_visibility_changed(_members_of(sorted(removed)))
+        task.groups = groups
+        task.updated_at = datetime.utcnow() # Смена групп меняет видимость - клиенты получат задачу в /sync
     
     try:
         db.session.commit()
@@ -320,9 +595,8 @@ def update_task(task_id):
 @role_required(['teacher', 'admin']) 
 def delete_task(task_id):
     task = Task.query.get_or_404(task_id)
-    user = get_current_user()
 
-    if user.role.name != 'admin' and task.created_by_id != user.id: 
+    if not is_owner_or_admin(task.created_by_id): 
         return jsonify({"msg": "Permission denied. You are not the creator of this task."}), 403
         
     db.session.delete(task)
@@ -333,16 +607,20 @@ def delete_task(task_id):
 @bp.route('/news', methods=['POST'])
 @jwt_required()
 @role_required(['teacher', 'admin'])
+@idempotent
 def create_news_item():
     data = request.get_json()
-    user = get_current_user()
+    user_id = get_current_user_id()
     try:
         new_item = News(
             title=data['title'],
             content=data['content'],
-            created_by_id=user.id 
+            created_by_id=user_id 
         )
         db.session.add(new_item)
+        db.session.flush()
+        # Уведомления пользователям создает воркер (app/notifications.py), ответ их не ждет
+        enqueue('news.notify', {'news_id': new_item.id}, user_id=user_id)
         db.session.commit()
         return jsonify(news_item_schema.dump(new_item)), 201
     except KeyError:
@@ -354,8 +632,9 @@ def create_news_item():
 @bp.route('/news', methods=['GET'])
 # @jwt_required() # Новости могут быть доступны всем
 def get_news_list():
-    all_news = News.query.order_by(News.created_at.desc()).all()
-    return jsonify(news_list_schema.dump(all_news)), 200
+    # Краткая форма: заголовок, excerpt и автор; полный текст - в GET /news/<id>
+    query = news_list_serializer.select().order_by(News.created_at.desc())
+    return json_response(news_list_serializer.dump(query))
 
 @bp.route('/news/<int:news_id>', methods=['GET'])
 # @jwt_required() # Детали новости также могут быть доступны всем
@@ -368,9 +647,8 @@ def get_news_item(news_id):
 @role_required(['teacher', 'admin'])
 def update_news_item(news_id):
     news_item = News.query.get_or_404(news_id)
-    user = get_current_user()
 
-    if user.role.name != 'admin' and news_item.created_by_id != user.id: 
+    if not is_owner_or_admin(news_item.created_by_id): 
         return jsonify({"msg": "Permission denied. You are not the author or an admin."}), 403
     
     data = request.get_json()
@@ -388,9 +666,8 @@ def update_news_item(news_id):
 @role_required(['teacher', 'admin'])
 def delete_news_item(news_id):
     news_item = News.query.get_or_404(news_id)
-    user = get_current_user()
 
-    if user.role.name != 'admin' and news_item.created_by_id != user.id: 
+    if not is_owner_or_admin(news_item.created_by_id): 
         return jsonify({"msg": "Permission denied. You are not the author or an admin."}), 403
 
     db.session.delete(news_item)
@@ -403,15 +680,20 @@ def delete_news_item(news_id):
 @bp.route('/tests', methods=['POST'])
 @jwt_required()
 @role_required(['teacher', 'admin']) # Админ тоже может создавать тесты?
+@idempotent
 def create_test():
     data = request.get_json()
-    user = get_current_user() 
+    user_id = get_current_user_id() 
+    groups = _load_groups(data.get('group_ids', []))
+    if groups is None:
+        return jsonify({"msg": "group_ids must be a list of existing group ids"}), 400
     try:
         new_test = Test(
             title=data['title'],
             description=data.get('description'),
-            created_by_id=user.id
+            created_by_id=user_id
         )
+        new_test.groups = groups # Без групп тест открыт всем студентам
         db.session.add(new_test)
         db.session.commit()
         return jsonify(test_schema.dump(new_test)), 201
@@ -424,23 +706,17 @@ def create_test():
 @bp.route('/tests', methods=['GET'])
 @jwt_required()
 def get_tests():
-    current_user_identity = get_jwt_identity() # Получаем identity из токена
-    user = get_current_user() # Пытаемся получить пользователя по этому identity
-
-    current_app.logger.info(f"Accessing /api/tests. Token Identity: {current_user_identity}")
-    if request.headers.get('Authorization'):
-        current_app.logger.info(f"Authorization Header: {request.headers.get('Authorization')}")
-    else:
-        current_app.logger.warning("Authorization Header MISSING for /api/tests")
-
+    # Маршрут, пользователь и длительность запроса попадают в журнал доступа (app/logs.py)
+    user = get_current_user()
     if not user:
-        current_app.logger.warning(f"No user found for identity {current_user_identity} on /api/tests. Returning 401.")
-        # @jwt_required уже должен вернуть 401, но это для дополнительного логирования
+        current_app.logger.warning("No user found for token identity on /api/tests")
         return jsonify({"msg": "User not found or token invalid based on identity"}), 401 
-    
-    current_app.logger.info(f"User {user.username} (Role: {user.role.name}) granted access to /api/tests.")
-    all_tests = Test.query.all()
-    return jsonify(tests_schema.dump(all_tests)), 200
+
+    # Только заголовки тестов: вопросы (с ответами) отдаются в GET /tests/<id> и /tests/<id>/questions
+    query = test_headers_serializer.select()
+    if user.role.name == 'student':
+        query = query.where(test_visibility(user.id, 'student')) # Тесты своих групп и открытые
+    return json_response(test_headers_serializer.dump(query))
 
 @bp.route('/tests/<int:test_id>', methods=['GET'])
 @jwt_required()
@@ -450,31 +726,40 @@ def get_test(test_id):
     if not user:
          return jsonify({"msg": "User not found or token invalid"}), 401
          
-    test_data = test_schema.dump(test)
-    
-    # Студенты видят информацию о тесте, но не видят ответы на вопросы
+    # Студенты видят информацию о тесте, но не видят ответы на вопросы -
+    # берем готовую закэшированную отрисовку вместо сериализации и чистки вопросов на каждый запрос
     if user.role.name == 'student':
-        if 'questions' in test_data and isinstance(test_data.get('questions'), list):
-            for q_data in test_data['questions']:
-                q_data.pop('correct_answer', None)
-                # Если студент просто смотрит информацию о тесте, а не сдает его,
-                # то варианты ответов тоже можно скрыть.
-                # Для эндпоинта сдачи теста (например, /tests/<id>/start) варианты должны быть видны.
-                # q_data.pop('options', None) # Раскомментировать, если нужно скрыть и варианты
-    return jsonify(test_data), 200
+        if not can_view_test(test.id, user.id, 'student'):
+            return jsonify({"msg": "This test is not assigned to your groups"}), 403
+        view = get_student_view(test)
+        return jsonify(dict(view['test'], questions=view['questions'])), 200
+
+    return jsonify(test_schema.dump(test)), 200
 
 @bp.route('/tests/<int:test_id>', methods=['PUT'])
 @jwt_required()
 @role_required(['teacher', 'admin'])
 def update_test(test_id):
     test = Test.query.get_or_404(test_id)
-    user = get_current_user()
-    if user.role.name != 'admin' and test.created_by_id != user.id:
+    if not is_owner_or_admin(test.created_by_id):
          return jsonify({"msg": "Permission denied. You are not the creator of this test or an admin."}), 403
     
     data = request.get_json()
     test.title = data.get('title', test.title)
     test.description = data.get('description', test.description)
+    if 'group_ids' in data:
+        groups = _load_groups(data['group_ids'])
+        if groups is None:
+            return jsonify({"msg": "group_ids must be a list of existing group ids"}), 400
+        if not test.groups and groups:
+            # Открытый тест становится тестом групп: его теряют все остальные студенты
+            mark_visibility_changed(User.role_id.in_(select(Role.id).where(Role.name == 'student')))
+        else:
+            removed = {g.id for g in test.groups} - {g.id for g in groups}
+            if removed:
+                mark_visibility_changed(_members_of(sorted(removed)))
+        test.groups = groups
+    test.bump_version()
     try:
         db.session.commit()
     except Exception as e:
@@ -487,8 +772,7 @@ def update_test(test_id):
 @role_required(['teacher', 'admin'])
 def delete_test(test_id):
     test = Test.query.get_or_404(test_id)
-    user = get_current_user()
-    if user.role.name != 'admin' and test.created_by_id != user.id: 
+    if not is_owner_or_admin(test.created_by_id): 
          return jsonify({"msg": "Permission denied. You are not the creator of this test or an admin."}), 403
 
     db.session.delete(test)
@@ -499,22 +783,25 @@ def delete_test(test_id):
 @bp.route('/tests/<int:test_id>/questions', methods=['POST'])
 @jwt_required()
 @role_required(['teacher', 'admin'])
+@idempotent
 def create_question(test_id):
     test = Test.query.get_or_404(test_id)
-    user = get_current_user()
-    if user.role.name != 'admin' and test.created_by_id != user.id: 
+    if not is_owner_or_admin(test.created_by_id): 
         return jsonify({"msg": "Permission denied. You cannot add questions to this test."}), 403
     
     data = request.get_json()
+    last_position = db.session.query(func.max(Question.position)).filter(Question.test_id == test.id).scalar()
     try:
         new_question = Question(
             test_id=test.id,
+            position=(last_position or 0) + 1,
             content=data['content'],
             options=data.get('options'), 
             correct_answer=data['correct_answer'],
             question_type=data.get('question_type', 'single_choice')
         )
         db.session.add(new_question)
+        test.bump_version()
         db.session.commit()
         return jsonify(question_schema.dump(new_question)), 201
     except KeyError:
@@ -534,19 +821,15 @@ def get_questions_for_test(test_id):
     
     # Учитель-создатель или админ видят все данные вопроса, включая ответы
     if user.role.name == 'admin' or (user.role.name == 'teacher' and test.created_by_id == user.id):
-        questions = Question.query.filter_by(test_id=test.id).all()
+        questions = Question.query.filter_by(test_id=test.id).order_by(Question.position, Question.id).all()
         return jsonify(questions_schema.dump(questions)), 200
     
     # Студенты видят вопросы (например, при прохождении теста), но без правильных ответов
     # Этот эндпоинт может быть использован для загрузки вопросов перед сдачей теста
     elif user.role.name == 'student':
-        questions_data = []
-        for q in Question.query.filter_by(test_id=test.id).all():
-            q_dump = question_schema.dump(q)
-            q_dump.pop('correct_answer', None) # Удаляем правильный ответ
-            # Варианты (options) оставляем, они нужны для ответа студента
-            questions_data.append(q_dump)
-        return jsonify(questions_data), 200
+        if not can_view_test(test.id, user.id, 'student'):
+            return jsonify({"msg": "This test is not assigned to your groups"}), 403
+        return jsonify(get_student_view(test)['questions']), 200
     
     return jsonify({"msg": "Permission denied"}), 403
 
@@ -557,8 +840,7 @@ def get_questions_for_test(test_id):
 def update_question(test_id, question_id):
     question = Question.query.filter_by(id=question_id, test_id=test_id).first_or_404()
     test = Test.query.get_or_404(test_id) 
-    user = get_current_user()
-    if user.role.name != 'admin' and test.created_by_id != user.id: 
+    if not is_owner_or_admin(test.created_by_id): 
          return jsonify({"msg": "Permission denied. You cannot update questions for this test."}), 403
 
     data = request.get_json()
@@ -566,6 +848,7 @@ def update_question(test_id, question_id):
     question.options = data.get('options', question.options)
     question.correct_answer = data.get('correct_answer', question.correct_answer)
     question.question_type = data.get('question_type', question.question_type)
+    test.bump_version()
     try:
         db.session.commit()
     except Exception as e:
@@ -579,27 +862,198 @@ def update_question(test_id, question_id):
 def delete_question(test_id, question_id):
    question = Question.query.filter_by(id=question_id, test_id=test_id).first_or_404()
    test = Test.query.get_or_404(test_id) 
-   user = get_current_user()
-   if user.role.name != 'admin' and test.created_by_id != user.id: 
+   if not is_owner_or_admin(test.created_by_id): 
          return jsonify({"msg": "Permission denied. You cannot delete questions for this test."}), 403
          
    db.session.delete(question)
+   test.bump_version()
    db.session.commit()
    return jsonify({"msg": "Question deleted"}), 200
 
+
+_QUESTION_FIELDS = ('content', 'options', 'correct_answer', 'question_type')
+
+def _question_values(item):
+    """Поля вопроса из элемента пакета; список правильных ответов хранится JSON-строкой."""
+    values = {field: item[field] for field in _QUESTION_FIELDS if field in item}
+    if isinstance(values.get('correct_answer'), list):
+        values['correct_answer'] = json.dumps(values['correct_answer'])
+    return values
+
+def _question_error(item, partial=False):
+    """Сообщение об ошибке в элементе пакета или None. partial - изменение: проверяются только переданные поля."""
+    if not isinstance(item, dict):
+        return "Each question in the batch must be an object"
+    if (not partial or 'content' in item) and not item.get('content'):
+        return "Missing content or correct_answer for the question"
+    if (not partial or 'correct_answer' in item) and item.get('correct_answer') in (None, ''):
+        return "Missing content or correct_answer for the question"
+    return None
+
+# Пакетное сохранение вопросов из редактора: создание, изменение, удаление и порядок за одну транзакцию
+@bp.route('/tests/<int:test_id>/questions:batch', methods=['POST'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def batch_update_questions(test_id):
+    test = Test.query.get_or_404(test_id)
+    if not is_owner_or_admin(test.created_by_id):
+        return jsonify({"msg": "Permission denied. You cannot change questions for this test."}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"msg": "Invalid batch format. Expected a JSON object."}), 400
+    lists = {}
+    for name in ('creates', 'updates', 'deletes', 'order'):
+        value = data.get(name)
+        if value is not None and not isinstance(value, list):
+            return jsonify({"msg": f"'{name}' must be a list"}), 400
+        lists[name] = value or []
+    creates, updates, deletes, order = lists['creates'], lists['updates'], lists['deletes'], lists['order']
+    for item in creates:
+        error = _question_error(item)
+        if error:
+            return jsonify({"msg": error}), 400
+    for item in updates:
+        error = _question_error(item, partial=True)
+        if error:
+            return jsonify({"msg": error}), 400
+
+    # Один запрос за текущим состоянием теста: id и позиции всех вопросов
+    existing = dict(db.session.execute(
+        db.select(Question.id, Question.position)
+        .where(Question.test_id == test.id)
+        .order_by(Question.position, Question.id)
+    ).all())
+
+    try:
+        delete_ids = {int(q_id) for q_id in deletes}
+        update_ids = [int(item['id']) for item in updates]
+    except (TypeError, ValueError, KeyError):
+        return jsonify({"msg": "Question ids must be integers"}), 400
+    unknown = (delete_ids | set(update_ids)) - existing.keys()
+    if unknown:
+        return jsonify({"msg": "Questions not found in this test", "ids": sorted(unknown)}), 404
+    if delete_ids & set(update_ids):
+        return jsonify({"msg": "A question cannot be updated and deleted in one batch"}), 400
+
+    # client_id новых вопросов - строки; числовой client_id не должен совпадать с id сохраненного вопроса,
+    # иначе ссылка на него в order неоднозначна
+    client_ids = [str(item.get('client_id', index)) for index, item in enumerate(creates)]
+    if len(set(client_ids)) != len(client_ids):
+        return jsonify({"msg": "client_id of new questions must be unique"}), 400
+    if any(isinstance(item.get('client_id'), int) and item['client_id'] in existing for item in creates):
+        return jsonify({"msg": "client_id of a new question must not match an existing question id"}), 400
+
+    # Итоговый порядок: сначала явно перечисленные в order (id существующих или client_id новых),
+    # затем остальные сохраненные вопросы в прежнем порядке, затем оставшиеся новые.
+    # Ссылка-число - id сохраненного вопроса, иначе (и для строк) - client_id нового
+    final_order = []
+    seen = set()
+    for ref in order:
+        if isinstance(ref, int) and not isinstance(ref, bool) and ref in existing and ref not in delete_ids:
+            key = ref
+        elif isinstance(ref, (int, str)) and not isinstance(ref, bool) and str(ref) in client_ids:
+            key = str(ref)
+        else:
+            return jsonify({"msg": "Unknown question in order", "ref": ref}), 400
+        if key not in seen:
+            final_order.append(key)
+            seen.add(key)
+    final_order += [q_id for q_id in existing if q_id not in delete_ids and q_id not in seen]
+    final_order += [c_id for c_id in client_ids if c_id not in seen]
+    positions = {key: index for index, key in enumerate(final_order, start=1)}
+
+    # Изменения полей и позиций собираются в один executemany по первичному ключу
+    update_rows = {}
+    for item in updates:
+        q_id = int(item['id'])
+        update_rows.setdefault(q_id, {'id': q_id}).update(_question_values(item))
+    for q_id, position in positions.items():
+        if isinstance(q_id, int) and existing[q_id] != position:
+            update_rows.setdefault(q_id, {'id': q_id})['position'] = position
+    update_rows = [row for row in update_rows.values() if len(row) > 1]
+
+    insert_rows = []
+    for client_id, item in zip(client_ids, creates):
+        row = {'test_id': test.id, 'question_type': 'single_choice', 'options': None}
+        row.update(_question_values(item))
+        row['position'] = positions[client_id]
+        insert_rows.append(row)
+
+    try:
+        if delete_ids:
+            db.session.execute(
+                delete(Question)
+                .where(Question.test_id == test.id, Question.id.in_(delete_ids))
+                .execution_options(synchronize_session=False)
+            )
+            record_tombstones('questions', delete_ids)
+        if update_rows:
+            db.session.execute(update(Question), update_rows)
+        if insert_rows:
+            db.session.execute(insert(Question), insert_rows)
+        if delete_ids or update_rows or insert_rows:
+            test.bump_version()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not save questions", "error": str(e)}), 500
+
+    questions = Question.query.filter_by(test_id=test.id).order_by(Question.position, Question.id).all()
+    return jsonify({"version": test.version, "questions": questions_schema.dump(questions)}), 200
+
+# Сеанс прохождения теста
+@bp.route('/tests/<int:test_id>/attempts', methods=['POST'])
+@jwt_required()
+@role_required('student')
+def start_test_attempt(test_id):
+    test = Test.query.get_or_404(test_id)
+    if not can_view_test(test.id, get_current_user_id(), 'student'):
+        return jsonify({"msg": "This test is not assigned to your groups"}), 403
+    attempt = start_or_resume_attempt(get_current_user_id(), test)
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": "Could not start test attempt", "error": str(e)}), 500
+
+    # Общая закэшированная отрисовка теста + перестановка этой попытки.
+    # Это единственный запрос страницы прохождения теста: заголовок и вопросы без ответов
+    rendered = render_attempt(get_student_view(test), attempt.seed)
+    if request.args.get('compact', '').lower() in ('1', 'true'):
+        rendered['questions'] = compact_questions(rendered['questions'])
+    rendered['attempt_id'] = attempt.id
+    rendered['started_at'] = attempt.started_at.isoformat()
+    return jsonify(rendered), 200
+
    # --- Результаты тестов (TestUser) ---
 @bp.route('/tests/<int:test_id>/submit', methods=['POST'])
 @jwt_required()
 @role_required('student') 
+@idempotent
 def submit_test_answers(test_id):
     test = Test.query.get_or_404(test_id)
-    user = get_current_user()
+    user_id = get_current_user_id()
+    if not can_view_test(test.id, user_id, 'student'):
+        return jsonify({"msg": "This test is not assigned to your groups"}), 403
     data = request.get_json()
        
     submitted_answers = data.get('answers') 
     if not isinstance(submitted_answers, dict):
         return jsonify({"msg": "Invalid answers format. Expected a dictionary."}), 400
 
+    # Сдача всегда относится к попытке: uq_test_user_attempt не дает сохранить одну попытку дважды,
+    # даже если повторы пришли с разными Idempotency-Key
+    if data.get('attempt_id') is None:
+        return jsonify({"msg": "Missing attempt_id. Start the test with POST /tests/<id>/attempts first."}), 400
+    attempt = TestAttempt.query.filter_by(id=data['attempt_id'], test_id=test.id, user_id=user_id).first()
+    if not attempt:
+        return jsonify({"msg": "Test attempt not found"}), 404
+    if attempt.submitted_at is not None:
+        return jsonify({"msg": "This test attempt has already been submitted"}), 409
+    # Ответы из попытки с перемешанными вариантами переводим обратно в исходные ключи
+    submitted_answers = unshuffle_answers(get_student_view(test), attempt.seed, submitted_answers)
+
     score = 0
     processed_answers = {} 
 
@@ -636,22 +1090,35 @@ def submit_test_answers(test_id):
                 score += 1
             processed_answers[q_id_str] = user_answer
         else:
-            print(f"Warning: Submitted answer for question ID {q_id_str} which is not in test {test_id}")
+            current_app.logger.warning("Submitted answer for question %s which is not in test %s", q_id_str, test_id)
        
     new_test_result = TestUser(
-        user_id=user.id,
+        user_id=user_id,
         test_id=test.id,
         score=score,
         max_score=total_questions_in_test, # ИЗМЕНЕНО
-        answers_submitted=processed_answers
+        answers_submitted=processed_answers,
+        attempt_id=attempt.id,
+        taken_at=datetime.utcnow()
     )
+    attempt.submitted_at = datetime.utcnow()
     try:
         db.session.add(new_test_result)
+        record_result(test.id, user_id, score, new_test_result.taken_at) # Лучший результат и гистограмма теста
+        # MinHash-подписи неверных свободных ответов (для отчета о похожих ответах) - в фоновой задаче.
+        # Оценка и таблица лидеров остаются в запросе: ответ сразу показывает студенту балл и место
+        db.session.flush()
+        enqueue('results.signatures', {'test_user_id': new_test_result.id}, user_id=user_id)
         db.session.commit()
-        return jsonify(test_user_schema.dump(new_test_result)), 201
+        # Место среди сдавших: сумма нескольких корзин гистограммы, без сортировки всех результатов
+        return jsonify(dict(test_user_schema.dump(new_test_result), leaderboard=standing(test.id, user_id))), 201
+    except IntegrityError:
+        # Параллельная отправка той же попытки уже сохранила результат (uq_test_user_attempt)
+        db.session.rollback()
+        return jsonify({"msg": "This test attempt has already been submitted"}), 409
     except Exception as e:
         db.session.rollback()
-        print(f"Error submitting test results: {str(e)}") 
+        current_app.logger.exception("Error submitting test results")
         return jsonify({"msg": "Could not submit test results", "error": str(e)}), 500
 
 @bp.route('/test_results', methods=['GET']) 
@@ -660,20 +1127,14 @@ def get_test_results():
     user = get_current_user()
     if not user:
         return jsonify({"msg": "User not found or token invalid"}), 401
+    # Результаты прошлых семестров лежат в архиве (app/archive.py) и добавляются только по запросу
+    include_archived = request.args.get('include_archived') == '1'
         
-    if user.role.name == 'admin':
-        results = TestUser.query.all()
-    elif user.role.name == 'teacher':
-        teacher_test_ids = [t.id for t in Test.query.filter_by(created_by_id=user.id).all()]
-        if not teacher_test_ids:
-            results = []
-        else:
-            results = TestUser.query.filter(TestUser.test_id.in_(teacher_test_ids)).all()
-    elif user.role.name == 'student':
-        results = TestUser.query.filter_by(user_id=user.id).all()
-    else:
-        results = []
-    return jsonify(test_users_schema.dump(results)), 200
+    if user.role.name not in ('admin', 'teacher', 'student'):
+        return jsonify([]), 200
+    # Преподавателю - результаты по его тестам: EXISTS по test.created_by_id вместо списка id в IN (...)
+    criteria = lambda model: [result_visibility(model, user.id, user.role.name)]
+    return json_response(dump_results(criteria, include_archived))
 
 
 @bp.route('/tests/<int:test_id>/results', methods=['GET']) 
@@ -684,12 +1145,62 @@ def get_results_for_test(test_id):
     user = get_current_user()
 
     if user.role.name == 'admin' or (user.role.name == 'teacher' and test_obj.created_by_id == user.id):
-        results = TestUser.query.filter_by(test_id=test_obj.id).all()
-        return jsonify(test_users_schema.dump(results)), 200
+        criteria = lambda model: [model.test_id == test_obj.id]
+        return json_response(dump_results(criteria, request.args.get('include_archived') == '1'))
        
     return jsonify({"msg": "Permission denied to view results for this test."}), 403
 
 
+@bp.route('/tests/<int:test_id>/leaderboard', methods=['GET'])
+@jwt_required()
+def get_test_leaderboard(test_id):
+    test = Test.query.get_or_404(test_id)
+    user = get_current_user()
+    if not user:
+        return jsonify({"msg": "User not found or token invalid"}), 401
+    role = user.role.name
+    # Студент - если тест ему доступен; преподаватель - по своему тесту, как и результаты
+    if role == 'student':
+        allowed = can_view_test(test.id, user.id, role)
+    else:
+        allowed = role == 'admin' or (role == 'teacher' and test.created_by_id == user.id)
+    if not allowed:
+        return jsonify({"msg": "Permission denied"}), 403
+
+    try:
+        limit = min(int(request.args.get('limit', 20)), 100)
+        offset = int(request.args.get('offset', 0))
+    except ValueError:
+        return jsonify({"msg": "limit and offset must be integers"}), 400
+    if limit < 1 or offset < 0:
+        return jsonify({"msg": "limit must be positive and offset non-negative"}), 400
+
+    page = leaderboard_page(test.id, limit, offset)
+    page.update(limit=limit, offset=offset, me=standing(test.id, user.id) if role == 'student' else None)
+    return jsonify(page), 200
+
+
+@bp.route('/tests/<int:test_id>/similarity', methods=['GET'])
+@jwt_required()
+@role_required(['teacher', 'admin'])
+def get_test_similarity(test_id):
+    test = Test.query.get_or_404(test_id)
+    if not is_owner_or_admin(test.created_by_id):
+        return jsonify({"msg": "Permission denied"}), 403
+    try:
+        threshold = float(request.args.get('threshold', current_app.config['SIMILARITY_THRESHOLD']))
+        question_id = int(request.args['question_id']) if 'question_id' in request.args else None
+    except ValueError:
+        return jsonify({"msg": "threshold must be a number and question_id an integer"}), 400
+    if not 0 < threshold <= 1:
+        return jsonify({"msg": "threshold must be in (0, 1]"}), 400
+
+    # Группы похожих неверных ответов на вопросы text_input: LSH по подписям, без попарного сравнения всех
+    report = similarity_report(test.id, threshold, question_id)
+    report['test_id'] = test.id
+    return jsonify(report), 200
+
+
 @bp.route('/users/<int:user_id>/results', methods=['GET']) 
 @jwt_required()
 def get_results_for_user(user_id):
@@ -697,157 +1208,161 @@ def get_results_for_user(user_id):
     current_user = get_current_user()
     if not current_user:
          return jsonify({"msg": "User not found or token invalid"}), 401
+    include_archived = request.args.get('include_archived') == '1'
 
     if current_user.role.name == 'admin' or current_user.id == target_user_obj.id:
-        results = TestUser.query.filter_by(user_id=target_user_obj.id).all()
-        return jsonify(test_users_schema.dump(results)), 200
+        criteria = lambda model: [model.user_id == target_user_obj.id]
+        return json_response(dump_results(criteria, include_archived))
        
     if current_user.role.name == 'teacher':
-        teacher_test_ids = [t.id for t in Test.query.filter_by(created_by_id=current_user.id).all()]
-        if not teacher_test_ids:
-            return jsonify(test_users_schema.dump([])), 200 
-           
-        results = TestUser.query.filter(
-            TestUser.user_id == target_user_obj.id,
-            TestUser.test_id.in_(teacher_test_ids)
-        ).all()
-        return jsonify(test_users_schema.dump(results)), 200
+        criteria = lambda model: [
+            model.user_id == target_user_obj.id, result_visibility(model, current_user.id, 'teacher')
+        ]
+        return json_response(dump_results(criteria, include_archived))
        
     return jsonify({"msg": "Permission denied"}), 403
 
-# --- Чат-бот с Gemini ---
-@bp.route('/chatbot/ask', methods=['POST'])
+# --- Инкрементальная синхронизация ---
+@bp.route('/sync', methods=['GET'])
 @jwt_required()
-def chatbot_ask_gemini():
-    current_user = get_current_user() # Используем current_user, чтобы не пересекалось с моделью User
-    if not current_user:
-         # Эта проверка дублируется @jwt_required и get_current_user, но для явности можно оставить
-         return jsonify({"msg": "Authentication token is invalid or user not found."}), 401
-    
-    data = request.get_json()
-    if not data or not data.get('message'):
-        return jsonify({"msg": "Missing 'message' field in request body"}), 400
-
-    user_message = data.get('message')
-
-    # Проверяем, был ли API ключ загружен и сконфигурирован при старте приложения
-    if not current_app.config.get('GEMINI_API_KEY'):
-        current_app.logger.error("GEMINI_API_KEY is not configured for the application.")
-        # Можно вернуть улучшенную заглушку, если Gemini недоступен
-        # Например, используя логику из предыдущих примеров
-        fallback_reply = (
-            f"I'm currently running in a limited mode as the AI service (Gemini) is not available. "
-            f"You said: '{user_message}'"
-        )
-        return jsonify({"reply": fallback_reply}), 503 # Service Unavailable
+def sync_changes():
+    # Что изменилось и что удалено после метки since (из предыдущего ответа); без since - полный снимок.
+    # Только из primary: метка берется по часам приложения, и изменения, которые отстающая реплика
+    # еще не получила, клиент пропустил бы навсегда
+    read_from_primary()
+    user = get_current_user()
+    if not user:
+        return jsonify({"msg": "User not found or token invalid"}), 401
 
-    try:
-        # Модель уже должна быть сконфигурирована с API ключом в app/__init__.py
-        # Достаточно просто создать экземпляр модели
-        # Для более сложных чатов с историей, используйте model.start_chat()
-        # model = genai.GenerativeModel('gemini-pro') # или 'gemini-1.5-flash-latest'
-        # Использование 'gemini-1.5-flash-latest' часто является хорошим балансом скорости и качества для чатов.
-        model_name = 'gemini-1.5-flash-latest' 
-        model = genai.GenerativeModel(model_name)
-
-        # Создаем промпт для Gemini
-        # Важно дать модели контекст о ее роли и о пользователе
-        # Можно добавить предыдущие сообщения из истории чата для лучшего контекста
-        
-        # Получаем информацию о задачах пользователя для контекста (пример)
-        tasks_info = ""
-        # Убедимся, что модель Task импортирована
-        user_tasks = Task.query.filter(Task.assigned_to_users.any(id=current_user.id)).order_by(Task.due_date.asc()).limit(2).all()
-        if user_tasks:
-            tasks_list_str = []
-            for task_item in user_tasks:
-                due_date_str = f" (due: {task_item.due_date.strftime('%b %d, %Y')})" if task_item.due_date else ""
-                tasks_list_str.append(f"- {task_item.title}{due_date_str}")
-            if tasks_list_str:
-                tasks_info = "\nHere are some of their current tasks:\n" + "\n".join(tasks_list_str) + "\n"
-
-
-        # Пример структурированного промпта (можно улучшать)
-        # Gemini хорошо реагирует на четко определенные роли и инструкции
-        # Использование `parts` позволяет передавать более структурированный контент, но для простого текста достаточно строки.
-        prompt_parts = [
-            "You are 'CollegeHelper', an AI assistant integrated into a college learning platform.",
-            f"You are currently assisting: {current_user.username} (Role: {current_user.role.name}).",
-            "The platform features sections for Books, Tasks, News, and Tests.",
-            "Your goal is to be helpful, concise, and friendly. Provide information relevant to the platform if possible.",
-            "If a request is outside your capabilities or knowledge about this platform, clearly state that.",
-            f"{tasks_info if tasks_info else 'The user currently has no pressing tasks visible to you.'}", # Контекст о задачах
-            "\nUser's message:",
-            f"\"{user_message}\"",
-            "\nYour response:"
-        ]
-        full_prompt = "\n".join(prompt_parts)
-        
-        current_app.logger.debug(f"Sending prompt to Gemini ({model_name}):\n{full_prompt}")
-
-        # Конфигурация генерации (можно настроить)
-        generation_config = genai.types.GenerationConfig(
-            candidate_count=1, # Обычно достаточно одного кандидата
-            # stop_sequences=['...'], # Если есть специфичные последовательности для остановки
-            max_output_tokens=300, # Ограничение длины ответа
-            temperature=0.7, # Креативность/случайность (0.0 - более детерминированно, 1.0 - более случайно)
-            # top_p=0.9, # Nucleus sampling
-            # top_k=40,  # Top-k sampling
-        )
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({"msg": "Invalid 'since' watermark, expected ISO 8601 datetime"}), 400
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None) # updated_at хранится в UTC без пояса
+    return json_response(build_sync_payload(user, get_current_role(), since or None))
 
-        # Отправляем запрос к Gemini
-        response = model.generate_content(
-            contents=[full_prompt], # `contents` ожидает итерируемый объект (например, список строк)
-            generation_config=generation_config,
-            # safety_settings=... # Можно настроить уровни безопасности, если нужно
-        )
-        
-        # Обработка ответа
-        ai_reply = ""
-        if response.parts:
-            ai_reply = "".join(part.text for part in response.parts if hasattr(part, 'text')) # Убедимся, что у part есть text
-        elif hasattr(response, 'text') and response.text: # Для некоторых старых/простых ответов
-             ai_reply = response.text
-        
-        if not ai_reply: # Если ответ пустой (например, из-за safety filters)
-            current_app.logger.warning(f"Gemini response was empty or blocked.")
-            if response.candidates:
-                 current_app.logger.warning(f"Candidate finish reason: {response.candidates[0].finish_reason}")
-                 current_app.logger.warning(f"Candidate safety ratings: {response.candidates[0].safety_ratings}")
-            ai_reply = "I'm sorry, I couldn't generate a response for that. This might be due to content restrictions or an issue with the request."
-        
-        current_app.logger.debug(f"Received reply from Gemini: {ai_reply}")
-        
-        return jsonify({"reply": ai_reply.strip()}), 200
-
-    except genai.types.BlockedPromptException as bpe:
-        current_app.logger.error(f"Gemini API: Prompt was blocked. {bpe}")
-        return jsonify({"reply": "I'm sorry, your message could not be processed due to content restrictions. Please rephrase your request."}), 400 # Bad Request
-    except genai.types.StopCandidateException as sce:
-        current_app.logger.error(f"Gemini API: Candidate generation stopped unexpectedly. {sce}")
-        return jsonify({"reply": "I'm sorry, I was unable to complete the response. Please try again."}), 500
+# --- Пакет запросов ---
+@bp.route('/batch', methods=['POST'])
+@jwt_required()
+def batch_requests():
+    # {"requests": [{"id"?, "method", "path", "body"?, "headers"?}]} -> {"responses": [{"id"?, "status", "headers", "body"}]}
+    data = request.get_json(silent=True)
+    items = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"msg": "'requests' must be a non-empty list"}), 400
+    limit = current_app.config['BATCH_MAX_REQUESTS']
+    if len(items) > limit:
+        return jsonify({"msg": f"A batch may contain at most {limit} requests"}), 400
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or item.get('method', 'GET') not in BATCH_METHODS \
+                or not isinstance(item.get('path'), str) or not item['path'].startswith('/') \
+                or not isinstance(item.get('headers') or {}, dict):
+            return jsonify({"msg": f"Invalid request at index {index}: expected method "
+                                   f"({', '.join(BATCH_METHODS)}), path starting with '/', optional body and headers"}), 400
+
+    responses = []
+    wrote = False
+    for item in items:
+        method = item.get('method', 'GET')
+        result = dispatch(method, item['path'], item.get('body'), item.get('headers'), prefix=bp.url_prefix)
+        if 'id' in item:
+            result = dict(id=item['id'], **result)
+        responses.append(result)
+        wrote = wrote or (method != 'GET' and result['status'] < 400)
+    # Пакет из одних чтений не прикрепляет пользователя к primary, хотя сам он POST (см. app/db_routing.py)
+    g.read_only_batch = not wrote
+    return jsonify({"responses": responses}), 200
+
+# --- Health checks (для балансировщика / оркестратора) ---
+@bp.route('/health/live', methods=['GET'])
+def health_live():
+    # Процесс жив и обрабатывает запросы; БД не трогаем
+    return jsonify({"status": "ok"}), 200
+
+@bp.route('/health/ready', methods=['GET'])
+def health_ready():
+    # Готовность принимать трафик: соединение из пула рабочее и пул не исчерпан
+    pool = db.engine.pool
+    pool_info = {"status": pool.status()}
+    if hasattr(pool, 'checkedout'):
+        pool_info.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    try:
+        db.session.execute(db.text('SELECT 1'))
     except Exception as e:
-        # Логируем полную ошибку для отладки
-        current_app.logger.error(f"Unexpected error interacting with Google Gemini API: {e}", exc_info=True)
-        # Можно проверить тип ошибки, если это специфичная ошибка Gemini, например, связанная с аутентификацией
-        # import google.auth.exceptions
-        # if isinstance(e, google.auth.exceptions.RefreshError) or isinstance(e, google.auth.exceptions.DefaultCredentialsError):
-        #     return jsonify({"reply": "There's an authentication issue with the AI service. Please contact support."}), 500
-        
-        return jsonify({"reply": "An unexpected error occurred while trying to reach the AI assistant (Gemini). Please try again later."}), 500
+        current_app.logger.error(f"Readiness check failed: {e}")
+        return jsonify({"status": "unavailable", "database": "error", "pool": pool_info}), 503
+    finally:
+        db.session.remove()
+
+    max_overflow = current_app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}).get('max_overflow')
+    if max_overflow is not None and 'size' in pool_info and \
+            pool_info['checked_out'] >= pool_info['size'] + max_overflow:
+        return jsonify({"status": "saturated", "database": "ok", "pool": pool_info}), 503
+    return jsonify({"status": "ok", "database": "ok", "pool": pool_info}), 200
+
+@bp.route('/health/payloads', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def health_payloads():
+    # Размеры ответов по эндпоинтам: гистограмма и превышения бюджета (PAYLOAD_BUDGET_BYTES)
+    return jsonify(get_payload_stats()), 200
 
+# --- Фоновые задачи и уведомления ---
+@bp.route('/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_job(job_id):
+    # Статус задачи для опроса клиентом (например, асинхронный ответ чат-бота)
+    job = Job.query.get_or_404(job_id)
+    if not is_owner_or_admin(job.created_by_id):
+        return jsonify({"msg": "Permission denied"}), 403
+    return jsonify(job_schema.dump(job)), 200
+
+@bp.route('/jobs', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def get_jobs():
+    # Счетчики по статусам и последние задачи (?status=failed - только упавшие)
+    counts = dict(db.session.execute(db.select(Job.status, func.count(Job.id)).group_by(Job.status)).all())
+    query = Job.query
+    if request.args.get('status'):
+        query = query.filter_by(status=request.args['status'])
+    jobs = query.order_by(Job.id.desc()).limit(min(request.args.get('limit', 100, type=int), 500)).all()
+    return jsonify({"counts": counts, "jobs": jobs_schema.dump(jobs)}), 200
+
+@bp.route('/jobs/<int:job_id>/retry', methods=['POST'])
+@jwt_required()
+@role_required('admin')
+def retry_job(job_id):
+    job = Job.query.get_or_404(job_id)
+    if job.status != 'failed':
+        return jsonify({"msg": "Only failed jobs can be retried"}), 409
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    db.session.commit()
+    return jsonify(job_schema.dump(job)), 200
 
 @bp.route('/notifications', methods=['GET'])
 @jwt_required()
 def get_notifications():
-    user = get_current_user()
-    if not user:
-         return jsonify({"msg": "User not found or token invalid"}), 401
-    # ... (логика заглушки)
-    # Пример данных (лучше, чтобы `id` был числом, если это PK из БД)
-    example_notifications = [
-        {"id": 1, "message": f"New task assigned to {user.username}.", "read": False, "type": "task", "link": "/tasks/1", "created_at": "2024-07-15T10:00:00Z"},
-        {"id": 2, "message": "Your test 'Python Basics' has been graded.", "read": True, "type": "test_result", "link": f"/tests/1/results/my", "created_at": "2024-07-14T15:30:00Z"}
-    ]
-    # return jsonify(example_notifications), 200
-    return jsonify([{"id": "0", "message": "Notification system is under development.", "read": False, "type": "general", "created_at": datetime.utcnow().isoformat() + "Z"}]), 501
\ No newline at end of file
+    query = Notification.query.filter_by(user_id=get_current_user_id())
+    if request.args.get('unread') == '1':
+        query = query.filter(Notification.read_at.is_(None))
+    items = query.order_by(Notification.id.desc()).limit(50).all()
+    return jsonify(notifications_schema.dump(items)), 200
+
+@bp.route('/notifications/read', methods=['POST'])
+@jwt_required()
+def mark_notifications_read():
+    # {"ids": [...]} - отметить выбранные, без ids - все непрочитанные
+    data = request.get_json(silent=True) or {}
+    query = update(Notification).where(Notification.user_id == get_current_user_id(), Notification.read_at.is_(None))
+    if data.get('ids') is not None:
+        query = query.where(Notification.id.in_(data['ids']))
+    result = db.session.execute(query.values(read_at=datetime.utcnow()))
+    db.session.commit()
+    return jsonify({"updated": result.rowcount}), 200
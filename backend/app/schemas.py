@@ -1,5 +1,7 @@
 from app import ma # Импортируем ma из __init__.py
-from app.models import User, Role, Task, Book, News, Test, Question, TestUser
+from app.models import (
+    User, Role, Task, Book, News, Test, Question, TestUser, TestUserArchive, StoredFile, Job, Notification, Group
+)
 
 # --- Базовые схемы для вложенности ---
 class RoleSchemaMinimal(ma.SQLAlchemyAutoSchema):
@@ -14,6 +16,12 @@ class UserSchemaMinimal(ma.SQLAlchemyAutoSchema):
         fields = ("id", "username", "email") # Без роли, чтобы избежать цикла при глубокой вложенности
         load_instance = True
 
+class GroupSchemaMinimal(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Group
+        fields = ("id", "name")
+        load_instance = True
+
 # --- Основные схемы ---
 
 class RoleSchema(ma.SQLAlchemyAutoSchema):
@@ -27,7 +35,8 @@ class UserSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = User
         load_instance = True
-        exclude = ("password_hash",) # Никогда не возвращаем хэш пароля
+        # Никогда не возвращаем хэш пароля и служебные счетчики (отзыв токенов, видимость для /sync)
+        exclude = ("password_hash", "token_version", "visibility_changed_at")
         include_fk = True # Показывает role_id
     role = ma.Nested(RoleSchemaMinimal) # Показываем минимальную информацию о роли
 
@@ -39,6 +48,13 @@ class TaskSchema(ma.SQLAlchemyAutoSchema):
     creator = ma.Nested(UserSchemaMinimal) # Кто создал задачу
     # Если нужно показывать, кому назначена задача:
     assigned_to_users = ma.List(ma.Nested(UserSchemaMinimal, only=("id", "username")))
+    groups = ma.List(ma.Nested(GroupSchemaMinimal)) # Группы, которым назначена задача
+
+class StoredFileSchemaMinimal(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = StoredFile
+        fields = ("id", "sha256", "size", "content_type", "original_name") # Без служебного refcount
+        load_instance = True
 
 class BookSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -49,6 +65,7 @@ class BookSchema(ma.SQLAlchemyAutoSchema):
     uploader = ma.Nested(UserSchemaMinimal, attribute="uploader", data_key="created_by") 
     # 'attribute="uploader"' указывает на имя отношения в модели Book
     # 'data_key="created_by"' сделает так, что в JSON поле будет называться 'created_by'
+    file = ma.Nested(StoredFileSchemaMinimal) # Загруженный файл (скачивание: GET /books/<id>/file)
 
 class NewsSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -60,6 +77,15 @@ class NewsSchema(ma.SQLAlchemyAutoSchema):
     # creator = ma.Nested(UserSchemaMinimal, attribute="author")
     author = ma.Nested(UserSchemaMinimal) # Используем имя отношения из модели
 
+class NewsSummarySchema(ma.SQLAlchemyAutoSchema):
+    # Для списка новостей: вместо полного текста - заранее посчитанный excerpt
+    class Meta:
+        model = News
+        load_instance = True
+        include_fk = True
+        exclude = ("content",)
+    author = ma.Nested(UserSchemaMinimal)
+
 class QuestionSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
         model = Question
@@ -79,6 +105,7 @@ class TestSchema(ma.SQLAlchemyAutoSchema):
         include_fk = True
     creator = ma.Nested(UserSchemaMinimal, data_key="created_by") # data_key для соответствия модели
     questions = ma.List(ma.Nested("QuestionSchema")) 
+    groups = ma.List(ma.Nested(GroupSchemaMinimal)) # Пустой список - тест открыт всем студентам
 
 class TestUserSchema(ma.SQLAlchemyAutoSchema):
     class Meta:
@@ -89,6 +116,32 @@ class TestUserSchema(ma.SQLAlchemyAutoSchema):
     test = ma.Nested(TestSchema, only=("id", "title", "description")) # Показываем основную информацию о тесте
     # answers_submitted = ma.String() # Если храните как JSON-строку и хотите чтобы так и отдавалось
 
+class GroupSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Group
+        load_instance = True
+        include_fk = True
+    members = ma.List(ma.Nested(UserSchemaMinimal))
+
+class JobSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Job
+        load_instance = True
+        include_fk = True
+        exclude = ("payload", "locked_by") # Аргументы задачи могут содержать чужие данные
+
+class NotificationSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Notification
+        load_instance = True
+        exclude = ("user_id", "ref_id", "read_at")
+    read = ma.Function(lambda obj: obj.read_at is not None) # Фронтенд ждет флаг, а не время прочтения
+
+class TestUserArchiveSchema(TestUserSchema):
+    # Архивный результат в той же форме, что и обычный (плюс archived_at)
+    class Meta(TestUserSchema.Meta):
+        model = TestUserArchive
+
 # --- Инициализация схем для использования ---
 
 # Роли
@@ -106,14 +159,17 @@ tasks_schema = TaskSchema(many=True)
 # Книги
 book_schema = BookSchema()
 books_schema = BookSchema(many=True)
+stored_file_schema = StoredFileSchemaMinimal()
 
 # Новости
 news_item_schema = NewsSchema() # Отдельное имя для избежания конфликта с news_list_schema
 news_list_schema = NewsSchema(many=True)
+news_summary_schema = NewsSummarySchema(many=True) # Список новостей (GET /news)
 
 # Тесты
 test_schema = TestSchema()
 tests_schema = TestSchema(many=True)
+test_headers_schema = TestSchema(many=True, exclude=("questions",)) # Список тестов без вопросов (GET /tests)
 
 # Вопросы
 question_schema = QuestionSchema()
@@ -121,4 +177,14 @@ questions_schema = QuestionSchema(many=True)
 
 # Результаты тестов
 test_user_schema = TestUserSchema()
-test_users_schema = TestUserSchema(many=True)
\ No newline at end of file
+test_users_schema = TestUserSchema(many=True)
+test_users_archive_schema = TestUserArchiveSchema(many=True)
+
+# Группы
+group_schema = GroupSchema()
+groups_schema = GroupSchema(many=True, exclude=("members",)) # Список групп без состава
+
+# Фоновые задачи и уведомления
+job_schema = JobSchema()
+jobs_schema = JobSchema(many=True)
+notifications_schema = NotificationSchema(many=True)
\ No newline at end of file
@@ -0,0 +1,80 @@
+# backend/app/scoping.py
+# Что видит пользователь: условия WHERE для тестов, заданий и результатов по роли.
+#
+# Каждое условие - одно выражение SQL (сравнение или EXISTS-подзапрос по индексированным таблицам
+# связей), которое добавляется к любому запросу: спискам, /sync, проверке доступа к одному объекту.
+# Вместо "загрузить id всех тестов преподавателя и передать их в IN (...)" база сама проверяет
+# владение через индекс, сколько бы тестов у преподавателя ни было.
+#
+#   admin   - все;
+#   teacher - созданные им тесты и задания, результаты по своим тестам;
+#   student - тесты своих групп и тесты без групп (открытые), задания, назначенные ему лично
+#             или его группе, свои результаты.
+
+from sqlalchemy import exists, false, or_, select, true
+from sqlalchemy.orm import aliased
+
+from app import db
+from app.models import Task, Test, group_members, task_assignments, task_groups, test_groups
+
+
+def _in_user_group(link_table, object_column, object_id, user_id):
+    # EXISTS: объект назначен группе, в которой состоит пользователь
+    return exists().where(
+        link_table.c[object_column] == object_id,
+        group_members.c.group_id == link_table.c.group_id,
+        group_members.c.user_id == user_id,
+    )
+
+
+def test_visibility(user_id, role, test_id=None):
+    """Условие "тест виден пользователю". test_id - столбец с id теста (по умолчанию Test.id)."""
+    if role == 'admin':
+        return true()
+    if role == 'teacher':
+        if test_id is None:
+            return Test.created_by_id == user_id
+        owned = aliased(Test)
+        return exists().where(owned.id == test_id, owned.created_by_id == user_id)
+    if role == 'student':
+        test_id = Test.id if test_id is None else test_id
+        unrestricted = ~exists().where(test_groups.c.test_id == test_id)
+        return or_(_in_user_group(test_groups, 'test_id', test_id, user_id), unrestricted)
+    return false()
+
+
+def task_visibility(user_id, role):
+    """Условие "задание видно пользователю" для запросов по Task."""
+    if role == 'admin':
+        return true()
+    if role == 'teacher':
+        return Task.created_by_id == user_id
+    if role == 'student':
+        assigned = exists().where(task_assignments.c.task_id == Task.id, task_assignments.c.user_id == user_id)
+        return or_(assigned, _in_user_group(task_groups, 'task_id', Task.id, user_id))
+    return false()
+
+
+def result_visibility(model, user_id, role):
+    """Условие "результат виден пользователю" для TestUser или TestUserArchive."""
+    if role == 'admin':
+        return true()
+    if role == 'teacher':
+        return test_visibility(user_id, role, test_id=model.test_id) # Результаты по своим тестам
+    if role == 'student':
+        return model.user_id == user_id
+    return false()
+
+
+def can_view_test(test_id, user_id, role):
+    """Доступ к одному тесту - одним запросом."""
+    return db.session.execute(
+        select(Test.id).where(Test.id == test_id, test_visibility(user_id, role))
+    ).first() is not None
+
+
+def can_view_task(task_id, user_id, role):
+    """Доступ к одному заданию - одним запросом."""
+    return db.session.execute(
+        select(Task.id).where(Task.id == task_id, task_visibility(user_id, role))
+    ).first() is not None
@@ -0,0 +1,279 @@
+# backend/app/search.py
+# Локальный поиск BM25 по книгам, новостям, заданиям и тестам - контекст для чат-бота.
+#
+# Индекс строится в памяти процесса при первом поиске одним проходом по таблицам.
+# Дальше он обновляется инкрементально:
+#   - изменения этого процесса (CRUD-маршруты) - обработчики событий ORM: текст документа снимается
+#     при flush, а в индекс попадает после commit (откат транзакции индекс не трогает);
+#   - изменения других процессов (воркеры gunicorn, CLI) - раз в SEARCH_REFRESH_SECONDS дочитываются
+#     по индексу updated_at и таблице tombstone, как в /sync.
+# Поиск идет только по спискам документов для слов запроса, без обращения к БД; затем проверка
+# видимости заданий и тестов (app/scoping.py) и отбор фрагментов в бюджет токенов промпта.
+
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+import math
+import re
+import threading
+
+from app import db
+from app.models import Book, News, Task, Test, Tombstone
+from app.scoping import task_visibility, test_visibility
+
+# Коллекция -> (модель, функция (заголовок, текст) по объекту или строке с теми же полями)
+_SOURCES = {
+    'books': (Book, lambda row: (row.title, row.author or '')),
+    'news': (News, lambda row: (row.title, row.content or '')),
+    'tasks': (Task, lambda row: (row.title, row.description or '')),
+    'tests': (Test, lambda row: (row.title, row.description or '')),
+}
+_COLUMNS = {
+    'books': (Book.id, Book.title, Book.author),
+    'news': (News.id, News.title, News.content),
+    'tasks': (Task.id, Task.title, Task.description),
+    'tests': (Test.id, Test.title, Test.description),
+}
+
+_TOKEN_RE = re.compile(r'\w+')
+_STOPWORDS = frozenset(
+    'a an and are as at be by for from how in is it of on or that the this to was what when where which who why '
+    'with you your i me my do does can about'
+    ' и в во на не что как по с со к ко о об от до за из у же ли или а но для это то мне мой где когда какой'.split()
+)
+
+# Параметры BM25
+_K1 = 1.2
+_B = 0.75
+# Слова из большей доли документов почти не влияют на ранжирование, но дороже всего обходятся - пропускаем
+_MAX_DF_RATIO = 0.5
+
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in _STOPWORDS]
+
+
+def estimate_tokens(text):
+    """Грубая оценка числа токенов модели: ~4 символа на токен."""
+    return len(text) // 4 + 1
+
+
+class SearchIndex:
+    """Инвертированный индекс BM25: слово -> {(коллекция, id): частота}."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._docs = {} # (коллекция, id) -> (заголовок, текст, длина, слова)
+        self._total_length = 0
+        self.built = False
+        self.refreshed_at = None # Начало последнего чтения БД: с него дочитываются изменения
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _remove(self, key):
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        self._total_length -= doc[2]
+        for term in doc[3]:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(key, None)
+                if not postings:
+                    del self._postings[term]
+
+    def _add(self, key, title, body):
+        self._remove(key)
+        # Заголовок учитывается дважды: совпадение в нем важнее совпадения в тексте
+        counts = Counter(tokenize(title) * 2 + tokenize(body))
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[key] = tf
+        self._docs[key] = (title, body, length, tuple(counts))
+        self._total_length += length
+
+    def apply(self, updates=(), deletions=()):
+        """Добавляет или заменяет документы [(ключ, заголовок, текст)] и удаляет документы [ключ]."""
+        with self._lock:
+            for key in deletions:
+                self._remove(key)
+            for key, title, body in updates:
+                self._add(key, title, body)
+
+    def reset(self):
+        with self._lock:
+            self._postings, self._docs, self._total_length = {}, {}, 0
+            self.built, self.refreshed_at = False, None
+
+    def search(self, query, limit=10):
+        """[(оценка, (коллекция, id))] по убыванию оценки."""
+        terms = set(tokenize(query))
+        with self._lock:
+            total = len(self._docs)
+            if not total or not terms:
+                return []
+            avg_length = self._total_length / total
+            docs = self._docs
+            scores = {}
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings or len(postings) > total * _MAX_DF_RATIO and total > 20:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                for key, tf in postings.items():
+                    norm = _K1 * (1 - _B + _B * docs[key][2] / avg_length)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (_K1 + 1) / (tf + norm)
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(score, key) for key, score in best]
+
+    def document(self, key):
+        doc = self._docs.get(key)
+        return (doc[0], doc[1]) if doc else None
+
+
+search_index = SearchIndex()
+_refresh_lock = threading.Lock()
+
+
+def _read_rows(entity, since=None):
+    model, extract = _SOURCES[entity]
+    query = select(*_COLUMNS[entity])
+    if since is not None:
+        query = query.where(model.updated_at > since)
+    return [((entity, row[0]),) + extract(row) for row in db.session.execute(query)]
+
+
+def ensure_index():
+    """Строит индекс при первом вызове и дочитывает чужие изменения не чаще SEARCH_REFRESH_SECONDS."""
+    interval = timedelta(seconds=current_app.config['SEARCH_REFRESH_SECONDS'])
+    if search_index.built and datetime.utcnow() - search_index.refreshed_at < interval:
+        return
+    with _refresh_lock: # Параллельные запросы не строят индекс дважды
+        now = datetime.utcnow()
+        if not search_index.built:
+            search_index.reset()
+            search_index.apply([row for entity in _SOURCES for row in _read_rows(entity)])
+            search_index.built = True
+        elif now - search_index.refreshed_at >= interval:
+            # Запас на часы и незавершенные транзакции: повторно прочитанный документ просто заменяется
+            since = search_index.refreshed_at - timedelta(seconds=5)
+            updates = [row for entity in _SOURCES for row in _read_rows(entity, since)]
+            deletions = [tuple(row) for row in db.session.execute(
+                select(Tombstone.entity, Tombstone.entity_id)
+                .where(Tombstone.deleted_at > since, Tombstone.entity.in_(list(_SOURCES))))]
+            search_index.apply(updates, deletions)
+        else:
+            return
+        search_index.refreshed_at = now
+
+
+def _visible_keys(keys, user_id, role):
+    """Оставляет из кандидатов те, что пользователь видит: задания и тесты - одним запросом на коллекцию."""
+    visible = {key for key in keys if key[0] in ('books', 'news')}
+    ids = {entity: [i for e, i in keys if e == entity] for entity in ('tasks', 'tests')}
+    if ids['tasks']:
+        visible.update(('tasks', i) for i in db.session.execute(
+            select(Task.id).where(Task.id.in_(ids['tasks']), task_visibility(user_id, role))).scalars())
+    if ids['tests']:
+        query = select(Test.id).where(Test.id.in_(ids['tests']))
+        if role == 'student':
+            query = query.where(test_visibility(user_id, role)) # Как в GET /tests
+        visible.update(('tests', i) for i in db.session.execute(query).scalars())
+    return visible
+
+
+def _snippet(body, terms, max_chars):
+    # Окно текста вокруг первого найденного слова запроса
+    if len(body) <= max_chars:
+        return body
+    lowered = body.lower()
+    positions = [match.start() for match in (re.search(r'\b' + re.escape(term), lowered) for term in terms) if match]
+    start = max(0, min(positions) - max_chars // 4) if positions else 0
+    if start:
+        start = body.find(' ', start) + 1 or start
+    fragment = body[start:start + max_chars].rsplit(' ', 1)[0]
+    return ('...' if start else '') + fragment + '...'
+
+
+def retrieve_context(query, user_id, role, token_budget=None, top_k=None):
+    """Фрагменты самых релевантных документов, суммарно не больше token_budget токенов.
+
+    Возвращает [{"entity", "id", "title", "text", "score"}] по убыванию релевантности.
+    """
+    config = current_app.config
+    token_budget = token_budget or config['CHATBOT_CONTEXT_TOKENS']
+    top_k = top_k or config['SEARCH_TOP_K']
+    ensure_index()
+
+    # Кандидатов берем с запасом: часть может отсеять проверка видимости
+    hits = search_index.search(query, limit=top_k * 3)
+    visible = _visible_keys([key for _, key in hits], user_id, role)
+    terms = tokenize(query)
+
+    results = []
+    used = 0
+    for score, key in hits:
+        if key not in visible:
+            continue
+        doc = search_index.document(key)
+        if doc is None:
+            continue
+        title, body = doc
+        text = _snippet(body, terms, config['SEARCH_SNIPPET_CHARS'])
+        cost = estimate_tokens(title) + estimate_tokens(text) + 4 # + разметка строки в промпте
+        if used + cost > token_budget:
+            continue # Длинный фрагмент не влез - возможно, влезет следующий, покороче
+        used += cost
+        results.append({'entity': key[0], 'id': key[1], 'title': title, 'text': text, 'score': round(score, 3)})
+        if len(results) >= top_k:
+            break
+    return results
+
+
+# --- Инкрементальное обновление при изменениях через ORM в этом процессе ---
+
+def _pending(session):
+    return session.info.setdefault('search_pending', {'updates': {}, 'deletions': set()})
+
+
+def _register_listeners(entity, model, extract):
+    def _capture(mapper, connection, target):
+        # Текст снимаем при flush: после commit объект уже expired, а SQL выполнять нельзя
+        session = object_session(target)
+        if session is not None:
+            pending = _pending(session)
+            pending['deletions'].discard((entity, target.id))
+            pending['updates'][(entity, target.id)] = extract(target)
+
+    def _capture_delete(mapper, connection, target):
+        session = object_session(target)
+        if session is not None:
+            pending = _pending(session)
+            pending['updates'].pop((entity, target.id), None)
+            pending['deletions'].add((entity, target.id))
+
+    event.listen(model, 'after_insert', _capture)
+    event.listen(model, 'after_update', _capture)
+    event.listen(model, 'after_delete', _capture_delete)
+
+
+for _entity, (_model, _extract) in _SOURCES.items():
+    _register_listeners(_entity, _model, _extract)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop('search_pending', None)
+    # Пока индекс не построен, изменения войдут в него при построении
+    if pending and search_index.built:
+        search_index.apply([(key,) + text for key, text in pending['updates'].items()], pending['deletions'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    session.info.pop('search_pending', None)
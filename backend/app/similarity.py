@@ -0,0 +1,248 @@
+# backend/app/similarity.py
+# Поиск похожих свободных ответов (text_input) - признак списывания.
+#
+# Попарное сравнение ответов 1000 студентов - полмиллиона сравнений на вопрос. Вместо этого:
+#   - при сдаче теста каждый неверный свободный ответ режется на символьные 5-граммы и сжимается
+#     в MinHash-подпись: 64 минимума хэшей (array('I'), 256 байт в answer_signature). Доля совпавших
+#     позиций двух подписей оценивает коэффициент Жаккара наборов 5-грамм;
+#   - отчет (GET /tests/<id>/similarity) раскладывает подписи вопроса по корзинам LSH: 16 полос
+#     по 4 значения. Ответы с похожестью s попадают в общую корзину хотя бы одной полосы
+#     с вероятностью 1 - (1 - s^4)^16 (0.7 -> 0.98, 0.3 -> 0.12). Сравниваются только ответы из общих
+#     корзин, поэтому время отчета растет почти линейно с числом ответов.
+# Верные ответы и ответы короче SIMILARITY_MIN_CHARS не учитываются: одинаковый правильный
+# ответ - не списывание. Подписи считает фоновая задача results.signatures, которую ставит сдача теста
+# (app/jobs.py): сдача не ждет хэширования. Подписи для результатов, сданных до появления таблицы:
+#   flask --app run results similarity-backfill [--test-id N]
+
+from array import array
+from flask import current_app
+from operator import eq
+from sqlalchemy import exists, insert, select
+import hashlib
+import re
+import sys
+
+from app import db
+from app.jobs import JobFailed, job_handler
+from app.models import AnswerSignature, Question, TestUser, User
+
+NUM_PERM = 64
+_BANDS = 16
+_ROWS = NUM_PERM // _BANDS
+_SHINGLE = 5
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def normalize(text):
+    """Нижний регистр, знаки препинания и пробелы - один пробел."""
+    return _NON_WORD_RE.sub(' ', str(text).lower()).strip()
+
+
+def minhash(text):
+    """MinHash-подпись нормализованного текста: array('I') из NUM_PERM значений."""
+    text = normalize(text)
+    shingles = {text[i:i + _SHINGLE] for i in range(max(1, len(text) - _SHINGLE + 1))}
+    # shake_128 дает сразу NUM_PERM независимых 32-битных хэшей 5-граммы одним вызовом;
+    # минимум по позициям считают встроенные map/zip без цикла Python по 64 значениям
+    hashes = [array('I', hashlib.shake_128(shingle.encode()).digest(NUM_PERM * 4)) for shingle in shingles]
+    if sys.byteorder == 'big':
+        for values in hashes:
+            values.byteswap() # Те же значения, что на little-endian: подписи сравнимы между серверами
+    return array('I', map(min, zip(*hashes)))
+
+
+def to_bytes(signature):
+    return signature.tobytes() if sys.byteorder == 'little' else _swapped(signature).tobytes()
+
+
+def from_bytes(data):
+    signature = array('I')
+    signature.frombytes(data)
+    return signature if sys.byteorder == 'little' else _swapped(signature)
+
+
+def _swapped(signature):
+    signature = array('I', signature)
+    signature.byteswap()
+    return signature
+
+
+def estimate(a, b):
+    """Оценка коэффициента Жаккара по двум подписям."""
+    return sum(map(eq, a, b)) / NUM_PERM
+
+
+def free_text_answers(questions, answers, min_chars=None):
+    """{id вопроса: ответ} - неверные ответы на вопросы text_input не короче min_chars символов.
+
+    questions - {id: Question}, answers - {str(id): ответ} как в answers_submitted.
+    """
+    min_chars = current_app.config['SIMILARITY_MIN_CHARS'] if min_chars is None else min_chars
+    selected = {}
+    for q_id_str, answer in (answers or {}).items():
+        question = questions.get(int(q_id_str)) if str(q_id_str).isdigit() else None
+        if question is None or question.question_type != 'text_input' or not isinstance(answer, str):
+            continue
+        if answer.strip().lower() == str(question.correct_answer).strip().lower():
+            continue # Как проверка ответа в submit_test_answers
+        if len(normalize(answer)) >= min_chars:
+            selected[question.id] = answer
+    return selected
+
+
+def add_answer_signatures(test_user, answers):
+    """Сохраняет подписи ответов {id вопроса: текст} результата; коммитит вызывающий код."""
+    if not answers:
+        return
+    if test_user.id is None:
+        db.session.flush()
+    db.session.execute(insert(AnswerSignature), [{
+        'test_user_id': test_user.id,
+        'test_id': test_user.test_id,
+        'question_id': question_id,
+        'user_id': test_user.user_id,
+        'signature': to_bytes(minhash(text)),
+    } for question_id, text in answers.items()])
+
+
+@job_handler('results.signatures')
+def sign_result(test_user_id):
+    """Подписи свободных ответов сданного результата test_user_id (задача из submit_test_answers)."""
+    result = db.session.get(TestUser, test_user_id)
+    if result is None:
+        raise JobFailed(f'Test result {test_user_id} not found') # Удален или уже в архиве - повторять незачем
+    if db.session.execute(select(AnswerSignature.id).where(AnswerSignature.test_user_id == result.id)).first():
+        return {'signatures': 0} # Повтор уже выполненной задачи
+    questions = {q.id: q for q in db.session.execute(
+        select(Question).where(Question.test_id == result.test_id)).scalars()}
+    answers = free_text_answers(questions, result.answers_submitted)
+    add_answer_signatures(result, answers)
+    return {'signatures': len(answers)}
+
+
+def find_clusters(signatures, threshold):
+    """Группы похожих подписей: [[id, ...]], число сравненных пар.
+
+    signatures - [(id, подпись в байтах)] одного вопроса.
+    """
+    # Одинаковые подписи (дословно скопированные ответы) - одна точка, без попарных сравнений
+    by_signature = {}
+    for item_id, data in signatures:
+        by_signature.setdefault(data, []).append(item_id)
+    unique = list(by_signature)
+    arrays = [from_bytes(data) for data in unique]
+    parent = list(range(len(unique)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    compared = 0
+    width = _ROWS * 4
+    for band in range(_BANDS):
+        buckets = {}
+        for index, data in enumerate(unique):
+            buckets.setdefault(data[band * width:(band + 1) * width], []).append(index)
+        for members in buckets.values():
+            # С первым в корзине, а не каждый с каждым: большая корзина не дает квадрата сравнений,
+            # а похожие между собой остальные ответы почти всегда встречаются в других полосах
+            first = members[0]
+            for other in members[1:]:
+                root_first, root_other = find(first), find(other)
+                if root_first == root_other:
+                    continue
+                compared += 1
+                if estimate(arrays[first], arrays[other]) >= threshold:
+                    parent[root_other] = root_first
+
+    groups = {}
+    for index, data in enumerate(unique):
+        groups.setdefault(find(index), []).extend(by_signature[data])
+    return [ids for ids in groups.values() if len(ids) > 1], compared
+
+
+def similarity_report(test_id, threshold=None, question_id=None):
+    """Группы похожих ответов по вопросам теста с ответами и авторами.
+
+    {"threshold", "answers", "compared_pairs", "clusters": [{"question_id", "similarity", "size", "answers"}]}.
+    similarity - наименьшая оценка похожести ответа группы на первый ответ группы.
+    """
+    threshold = current_app.config['SIMILARITY_THRESHOLD'] if threshold is None else threshold
+    query = select(AnswerSignature.question_id, AnswerSignature.test_user_id, AnswerSignature.user_id,
+                   AnswerSignature.signature) \
+        .join(TestUser, TestUser.id == AnswerSignature.test_user_id) \
+        .where(AnswerSignature.test_id == test_id)
+    if question_id is not None:
+        query = query.where(AnswerSignature.question_id == question_id)
+
+    by_question = {}
+    owners = {}
+    total = 0
+    for q_id, result_id, user_id, data in db.session.execute(query):
+        by_question.setdefault(q_id, []).append((result_id, data))
+        owners[(q_id, result_id)] = (user_id, data)
+        total += 1
+
+    found = []
+    compared = 0
+    for q_id, signatures in by_question.items():
+        clusters, pairs = find_clusters(signatures, threshold)
+        compared += pairs
+        for result_ids in clusters:
+            # Несколько сдач одного студента между собой - не списывание
+            if len({owners[(q_id, result_id)][0] for result_id in result_ids}) > 1:
+                found.append((q_id, result_ids))
+
+    # Тексты ответов и имена - только для попавших в отчет результатов
+    result_ids = {result_id for _, ids in found for result_id in ids}
+    details = {}
+    if result_ids:
+        details = {row.id: row for row in db.session.execute(
+            select(TestUser.id, TestUser.answers_submitted, TestUser.taken_at, User.id.label('user_id'), User.username)
+            .join(User, User.id == TestUser.user_id).where(TestUser.id.in_(result_ids)))}
+
+    clusters = []
+    for q_id, ids in found:
+        first = from_bytes(owners[(q_id, ids[0])][1])
+        clusters.append({
+            'question_id': q_id,
+            'similarity': round(min(estimate(first, from_bytes(owners[(q_id, i)][1])) for i in ids[1:]), 2),
+            'size': len(ids),
+            'answers': [{
+                'result_id': i,
+                'user_id': details[i].user_id,
+                'username': details[i].username,
+                'answer': (details[i].answers_submitted or {}).get(str(q_id)),
+                'taken_at': details[i].taken_at.isoformat() if details[i].taken_at else None,
+            } for i in sorted(ids) if i in details],
+        })
+    clusters.sort(key=lambda cluster: (-cluster['size'], -cluster['similarity'], cluster['question_id']))
+    return {'threshold': threshold, 'answers': total, 'compared_pairs': compared, 'clusters': clusters}
+
+
+def backfill_signatures(test_id=None, batch_size=500):
+    """Считает подписи результатов, у которых их нет; возвращает число сохраненных подписей."""
+    questions_by_test = {}
+    saved = 0
+    last_id = 0
+    while True:
+        query = select(TestUser).where(
+            TestUser.id > last_id, ~exists().where(AnswerSignature.test_user_id == TestUser.id)
+        ).order_by(TestUser.id).limit(batch_size)
+        if test_id is not None:
+            query = query.where(TestUser.test_id == test_id)
+        results = db.session.execute(query).scalars().all()
+        if not results:
+            break
+        for result in results:
+            if result.test_id not in questions_by_test:
+                questions_by_test[result.test_id] = {q.id: q for q in db.session.execute(
+                    select(Question).where(Question.test_id == result.test_id)).scalars()}
+            answers = free_text_answers(questions_by_test[result.test_id], result.answers_submitted)
+            add_answer_signatures(result, answers)
+            saved += len(answers)
+        last_id = results[-1].id
+        db.session.commit()
+    return saved
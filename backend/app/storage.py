@@ -0,0 +1,141 @@
+# backend/app/storage.py
+# Хранилище файлов книг с адресацией по содержимому.
+#
+# Файл лежит в BOOK_STORAGE_DIR/<первые 2 символа sha256>/<sha256>: одинаковые PDF, загруженные
+# разными преподавателями, хранятся один раз. Загрузка пишется на диск кусками с подсчетом хэша
+# по ходу чтения - файл целиком в памяти не бывает. Строка stored_file считает ссылки книг (refcount);
+# файлы без ссылок дольше BOOK_FILE_GC_GRACE_SECONDS удаляет `flask --app run books gc`.
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+import hashlib
+import os
+import time
+import uuid
+
+from app import db
+from app.models import StoredFile
+
+_CHUNK_SIZE = 1024 * 1024
+_TMP_DIR = 'tmp' # Подкаталог для недописанных загрузок: та же файловая система, что и у готовых файлов
+
+
+class FileTooLarge(Exception):
+    pass
+
+
+def storage_root():
+    return current_app.config['BOOK_STORAGE_DIR']
+
+
+def file_path(sha256):
+    """Путь к файлу с данным хэшем содержимого."""
+    return os.path.join(storage_root(), sha256[:2], sha256)
+
+
+def _write_stream(stream, max_bytes):
+    """Пишет поток во временный файл кусками; возвращает (путь, sha256, размер)."""
+    tmp_dir = os.path.join(storage_root(), _TMP_DIR)
+    os.makedirs(tmp_dir, exist_ok=True)
+    tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise FileTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
+def save_stream(stream, content_type=None, original_name=None):
+    """Сохраняет загрузку; возвращает (StoredFile, был ли такой файл уже в хранилище).
+
+    Новый файл получает refcount=0: пока его не привяжут к книге, он кандидат на сборку мусора
+    (после BOOK_FILE_GC_GRACE_SECONDS). Вызывающий код коммитит сессию.
+    """
+    tmp_path, sha256, size = _write_stream(stream, current_app.config['BOOK_FILE_MAX_BYTES'])
+    target = file_path(sha256)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    # Атомарно: читатели не увидят недописанный файл. Существующий файл тоже заменяется
+    # (содержимое то же) - на случай, если сборка мусора удаляет его прямо сейчас
+    os.replace(tmp_path, target)
+
+    now = datetime.utcnow()
+    stored = StoredFile.query.filter_by(sha256=sha256).first()
+    if stored is None:
+        stored = StoredFile(sha256=sha256, size=size, content_type=content_type or 'application/octet-stream',
+                            original_name=original_name, released_at=now)
+        try:
+            with db.session.begin_nested():
+                db.session.add(stored)
+            return stored, False
+        except IntegrityError:
+            # Тот же файл параллельно загрузил кто-то еще - используем его строку
+            stored = StoredFile.query.filter_by(sha256=sha256).one()
+    if stored.refcount == 0:
+        stored.released_at = now # Повторная загрузка продлевает срок до сборки мусора
+    return stored, True
+
+
+def acquire_file(file_id):
+    """+1 ссылка на файл; False, если файла нет (например, его уже удалила сборка мусора)."""
+    result = db.session.execute(
+        update(StoredFile).where(StoredFile.id == file_id)
+        .values(refcount=StoredFile.refcount + 1, released_at=None)
+    )
+    return result.rowcount == 1
+
+
+def release_file(file_id):
+    """-1 ссылка на файл; сам файл удаляется позже, сборкой мусора."""
+    if file_id is not None:
+        db.session.execute(
+            update(StoredFile).where(StoredFile.id == file_id, StoredFile.refcount > 0)
+            .values(refcount=StoredFile.refcount - 1, released_at=datetime.utcnow())
+        )
+
+
+def collect_garbage(grace_seconds):
+    """Удаляет файлы без ссылок старше grace_seconds и брошенные загрузки; возвращает число файлов."""
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+    candidates = db.session.execute(
+        db.select(StoredFile.id, StoredFile.sha256)
+        .where(StoredFile.refcount == 0, StoredFile.released_at < cutoff)
+    ).all()
+    removed = 0
+    for file_id, sha256 in candidates:
+        # Повторная проверка refcount в самом DELETE: файл могли привязать к книге после выборки
+        result = db.session.execute(
+            db.delete(StoredFile).where(StoredFile.id == file_id, StoredFile.refcount == 0)
+        )
+        db.session.commit()
+        if result.rowcount != 1:
+            continue
+        if StoredFile.query.filter_by(sha256=sha256).first() is not None:
+            continue # Тот же файл успели загрузить заново
+        try:
+            os.remove(file_path(sha256))
+        except FileNotFoundError:
+            pass
+        removed += 1
+
+    # Временные файлы прерванных загрузок
+    tmp_dir = os.path.join(storage_root(), _TMP_DIR)
+    if os.path.isdir(tmp_dir):
+        tmp_cutoff = time.time() - grace_seconds
+        for entry in os.scandir(tmp_dir):
+            if entry.is_file() and entry.stat().st_mtime < tmp_cutoff:
+                os.remove(entry.path)
+    return removed
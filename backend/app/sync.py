@@ -0,0 +1,111 @@
+# backend/app/sync.py
+# Инкрементальная синхронизация для клиентов: что изменилось и что удалено после метки времени.
+#
+# Изменения находятся по updated_at (индекс в каждой таблице), удаления - по таблице tombstone,
+# которую заполняют обработчики after_delete ниже (удаления через ORM, включая каскадные)
+# и record_tombstones() для массовых DELETE.
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event, insert, update
+
+from app import db
+from app.models import Book, News, Task, Test, Question, Tombstone, User
+from app.scoping import task_visibility, test_visibility
+from app.fast_serializers import (
+    books_serializer, news_list_serializer, tasks_serializer, test_headers_serializer, questions_serializer
+)
+
+# Имя коллекции в ответе /sync -> (модель, сериализатор той же формы, что и в списках)
+SYNC_COLLECTIONS = {
+    'books': (Book, books_serializer),
+    'news': (News, news_list_serializer),
+    'tasks': (Task, tasks_serializer),
+    'tests': (Test, test_headers_serializer),
+    'questions': (Question, questions_serializer),
+}
+
+
+def _register_tombstone_listener(entity, model):
+    @event.listens_for(model, 'after_delete')
+    def _record_tombstone(mapper, connection, target):
+        connection.execute(insert(Tombstone.__table__).values(
+            entity=entity, entity_id=target.id, deleted_at=datetime.utcnow()))
+
+
+for _entity, (_model, _serializer) in SYNC_COLLECTIONS.items():
+    _register_tombstone_listener(_entity, _model)
+
+
+def record_tombstones(entity, ids):
+    """Записи об удалении для массового DELETE (обработчики after_delete для него не вызываются)."""
+    if ids:
+        now = datetime.utcnow()
+        db.session.execute(insert(Tombstone), [{'entity': entity, 'entity_id': i, 'deleted_at': now} for i in ids])
+
+
+def mark_visibility_changed(condition):
+    """Пользователи по условию на User потеряли доступ к части объектов: следующий /sync - полный снимок."""
+    db.session.execute(update(User).where(condition).values(visibility_changed_at=datetime.utcnow()))
+
+
+def _scoped(entity, query, user, role):
+    """Ограничивает выборку тем, что пользователь видит в обычных списках; None - ничего."""
+    if entity == 'tasks':
+        return query.where(task_visibility(user.id, role)) if role in ('admin', 'teacher', 'student') else None
+    if entity == 'tests' and role == 'student':
+        return query.where(test_visibility(user.id, role)) # Тесты своих групп и открытые
+    if entity == 'questions':
+        # Вопросы с ответами - только автору теста и админу; студенты получают их через попытку
+        if role == 'teacher':
+            return query.join(Test, Test.id == Question.test_id).where(Test.created_by_id == user.id)
+        return query if role == 'admin' else None
+    return query
+
+
+def build_sync_payload(user, role, since):
+    """Изменения и удаления после since (None - полный снимок) в видимой пользователю области."""
+    now = datetime.utcnow()
+    retention = timedelta(days=current_app.config['SYNC_TOMBSTONE_RETENTION_DAYS'])
+    # Удаления старше срока хранения уже забыты - клиент должен заменить кэш целиком
+    full = since is None or since < now - retention
+    # Объекты, ставшие невидимыми, _scoped отфильтрует, а записей об удалении для них нет
+    if not full and user.visibility_changed_at and user.visibility_changed_at > since:
+        full = True
+
+    changes = {}
+    deleted = {}
+    for entity, (model, serializer) in SYNC_COLLECTIONS.items():
+        query = _scoped(entity, serializer.select(), user, role)
+        if query is None:
+            continue
+        if not full:
+            query = query.where(model.updated_at > since)
+        changes[entity] = serializer.dump(query.order_by(model.id))
+        deleted[entity] = []
+
+    if not full:
+        rows = db.session.execute(
+            db.select(Tombstone.entity, Tombstone.entity_id)
+            .where(Tombstone.deleted_at > since, Tombstone.entity.in_(list(deleted)))
+            .order_by(Tombstone.id)
+        ).all()
+        for entity, entity_id in rows:
+            deleted[entity].append(entity_id)
+
+    # Метка с запасом: запись, начатая до now, может закоммититься позже - лучше прислать ее повторно
+    overlap = timedelta(seconds=current_app.config['SYNC_WATERMARK_OVERLAP_SECONDS'])
+    return {
+        'watermark': (now - overlap).isoformat(),
+        'full': full,
+        'changes': changes,
+        'deleted': deleted,
+    }
+
+
+def purge_tombstones(days):
+    """Удаляет записи об удалениях старше days дней; возвращает их количество."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    result = db.session.execute(db.delete(Tombstone).where(Tombstone.deleted_at < cutoff))
+    db.session.commit()
+    return result.rowcount
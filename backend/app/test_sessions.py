@@ -0,0 +1,115 @@
+# backend/app/test_sessions.py
+# Сеансы прохождения тестов: общая закэшированная отрисовка теста без ответов
+# и детерминированная перестановка вопросов/вариантов для каждой попытки.
+
+from flask import current_app
+from functools import lru_cache
+import hashlib
+import random
+
+from app import db
+from app.models import Test, Question, TestAttempt
+from app.schemas import TestSchema, QuestionSchema
+
+# Схемы для однократной сборки отрисовки: без вопросов в заголовке и без правильных ответов
+_test_header_schema = TestSchema(exclude=("questions", "groups"))
+_student_questions_schema = QuestionSchema(many=True, exclude=("correct_answer",))
+
+
+@lru_cache(maxsize=256)
+def _build_student_view(test_id, version):
+    """Собирает отрисовку теста для студентов. Кэшируется по (test_id, version) -
+    при изменении теста версия растет, и старая запись просто вытесняется из кэша."""
+    test = db.session.get(Test, test_id)
+    questions = Question.query.filter_by(test_id=test_id).order_by(Question.position, Question.id).all()
+    return {
+        'test': _test_header_schema.dump(test),
+        'questions': _student_questions_schema.dump(questions),
+    }
+
+
+def get_student_view(test):
+    """Отрисовка теста без правильных ответов, общая для всех студентов. Не изменять!"""
+    return _build_student_view(test.id, test.version)
+
+
+def make_seed(user_id, test_id, attempt_number):
+    """Детерминированный seed попытки: одинаков при повторном старте той же попытки."""
+    raw = f"{current_app.config['SECRET_KEY']}:{test_id}:{user_id}:{attempt_number}".encode()
+    return int.from_bytes(hashlib.sha256(raw).digest()[:7], 'big')
+
+
+def start_or_resume_attempt(user_id, test):
+    """Возвращает незавершенную попытку студента или создает новую (без коммита)."""
+    attempt = TestAttempt.query.filter_by(user_id=user_id, test_id=test.id, submitted_at=None) \
+        .order_by(TestAttempt.id.desc()).first()
+    if attempt:
+        return attempt
+    attempt_number = TestAttempt.query.filter_by(user_id=user_id, test_id=test.id).count() + 1
+    attempt = TestAttempt(user_id=user_id, test_id=test.id, seed=make_seed(user_id, test.id, attempt_number))
+    db.session.add(attempt)
+    return attempt
+
+
+def _question_rng(seed, question_id, purpose='options'):
+    # Отдельный генератор на вопрос: добавление/удаление других вопросов не меняет его перестановку
+    return random.Random(f"{seed}:{purpose}:{question_id}")
+
+
+def option_mapping(seed, question):
+    """Для вопроса с вариантами-словарем: {показанный ключ: исходный ключ}.
+    Метки (a, b, c...) остаются на своих местах, перемешиваются тексты вариантов."""
+    options = question.get('options')
+    if not isinstance(options, dict) or question.get('question_type') not in ('single_choice', 'multiple_choice'):
+        return None
+    keys = list(options.keys())
+    shuffled = keys[:]
+    _question_rng(seed, question['id']).shuffle(shuffled)
+    return dict(zip(keys, shuffled))
+
+
+def render_attempt(view, seed):
+    """Применяет перестановку попытки к общей отрисовке теста."""
+    order = sorted(view['questions'], key=lambda q: _question_rng(seed, q['id'], 'order').random())
+    questions = []
+    for question in order:
+        mapping = option_mapping(seed, question)
+        if mapping is not None:
+            question = dict(question, options={shown: question['options'][original]
+                                               for shown, original in mapping.items()})
+        elif isinstance(question.get('options'), list):
+            shuffled = question['options'][:]
+            _question_rng(seed, question['id']).shuffle(shuffled) # Ответ - сам текст варианта, отображение не нужно
+            question = dict(question, options=shuffled)
+        questions.append(question)
+    return {'test': view['test'], 'questions': questions}
+
+
+# Поля, которые в компактной форме не нужны клиенту: тест и порядок и так известны из ответа
+_COMPACT_DROP_FIELDS = ('test_id', 'position')
+
+
+def compact_questions(questions):
+    """Компактная форма вопросов: варианты-словари как массив пар [ключ, текст] в порядке показа."""
+    compact = []
+    for question in questions:
+        item = {key: value for key, value in question.items() if key not in _COMPACT_DROP_FIELDS}
+        if isinstance(item.get('options'), dict):
+            item['options'] = [[key, text] for key, text in item['options'].items()]
+        compact.append(item)
+    return compact
+
+
+def unshuffle_answers(view, seed, answers):
+    """Переводит ответы из показанных ключей вариантов обратно в исходные."""
+    mappings = {str(q['id']): option_mapping(seed, q) for q in view['questions']}
+    restored = {}
+    for q_id_str, answer in answers.items():
+        mapping = mappings.get(q_id_str)
+        if mapping is None:
+            restored[q_id_str] = answer
+        elif isinstance(answer, list):
+            restored[q_id_str] = [mapping.get(str(a), a) for a in answer]
+        else:
+            restored[q_id_str] = mapping.get(str(answer), answer)
+    return restored
@@ -0,0 +1,79 @@
+# backend/benchmarks/http_bench.py
+# Нагрузочный замер собственных маршрутов API (только stdlib).
+#
+# Пример:
+#   python benchmarks/http_bench.py --base-url http://127.0.0.1:5000/api \
+#       --username py_teacher --password teacherpassword --concurrency 16 --requests 2000
+
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ROUTES = ['/health/ready', '/news', '/books', '/tests', '/tasks', '/test_results']
+
+
+def login(base_url, username, password):
+    body = json.dumps({'username': username, 'password': password}).encode()
+    req = urllib.request.Request(base_url + '/login', data=body, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read())['access_token']
+
+
+def timed_get(url, headers):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return time.perf_counter() - start, status
+
+
+def bench_route(base_url, route, headers, concurrency, total):
+    url = base_url + route
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: timed_get(url, headers), range(total)))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(r[0] * 1000 for r in results)
+    errors = sum(1 for r in results if r[1] >= 400)
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        'route': route,
+        'rps': total / elapsed,
+        'p50': quantiles[49],
+        'p95': quantiles[94],
+        'p99': quantiles[98],
+        'errors': errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP benchmark for CollegeApp API routes')
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000/api')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='Запросов на каждый маршрут')
+    parser.add_argument('--routes', nargs='*', default=DEFAULT_ROUTES)
+    args = parser.parse_args()
+
+    headers = {'Authorization': 'Bearer ' + login(args.base_url, args.username, args.password)}
+    # Прогрев: соединения пула, кэши
+    for route in args.routes:
+        timed_get(args.base_url + route, headers)
+
+    print(f"{'route':<18}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for route in args.routes:
+        r = bench_route(args.base_url, route, headers, args.concurrency, args.requests)
+        print(f"{r['route']:<18}{r['rps']:>10.1f}{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+# backend/benchmarks/search_bench.py
+# Поиск контекста для чат-бота (app/search.py): построение индекса, инкрементальное обновление
+# и задержка retrieve_context на синтетических книгах, новостях, заданиях и тестах.
+#
+# Работает на временной SQLite в памяти. Пример:
+#   python benchmarks/search_bench.py --docs 5000 --queries 500
+#   python benchmarks/search_bench.py --max-p95-ms 10   # код выхода 1, если p95 поиска больше порога
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config # noqa: E402
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+
+
+def make_vocabulary(rnd, size):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rnd.choice(letters) for _ in range(rnd.randint(3, 10))) for _ in range(size)]
+
+
+def text(rnd, vocabulary, words):
+    # Частоты слов по закону Ципфа, как в естественном тексте
+    return ' '.join(vocabulary[min(int(rnd.paretovariate(1.1)) - 1, len(vocabulary) - 1)] for _ in range(words))
+
+
+def seed(db, rnd, vocabulary, docs):
+    """Заполняет БД: по docs книг, новостей, заданий и docs // 10 тестов; возвращает id студента."""
+    from sqlalchemy import insert
+    from app.models import Book, News, Role, Task, Test, User, task_assignments
+
+    roles = {name: Role(name=name) for name in ('student', 'teacher', 'admin')}
+    db.session.add_all(roles.values())
+    teacher = User(username='teacher', email='t@example.com', password_hash='x', role=roles['teacher'])
+    student = User(username='student', email='s@example.com', password_hash='x', role=roles['student'])
+    db.session.add_all([teacher, student])
+    db.session.flush()
+
+    base = datetime(2025, 1, 1)
+    db.session.execute(insert(Book), [{'title': text(rnd, vocabulary, 5), 'author': text(rnd, vocabulary, 2),
+                                       'created_by_id': teacher.id} for _ in range(docs)])
+    db.session.execute(insert(News), [{'title': text(rnd, vocabulary, 6), 'content': text(rnd, vocabulary, 150),
+                                       'created_by_id': teacher.id, 'created_at': base} for _ in range(docs)])
+    db.session.execute(insert(Task), [{'title': text(rnd, vocabulary, 5), 'description': text(rnd, vocabulary, 40),
+                                       'created_by_id': teacher.id, 'due_date': base + timedelta(days=i % 90)}
+                                      for i in range(docs)])
+    db.session.execute(insert(Test), [{'title': text(rnd, vocabulary, 4), 'description': text(rnd, vocabulary, 20),
+                                       'created_by_id': teacher.id} for _ in range(docs // 10)])
+    # Студенту назначена каждая десятая задача: остальные отсеиваются проверкой видимости
+    task_ids = db.session.execute(db.select(Task.id)).scalars().all()
+    db.session.execute(insert(task_assignments), [{'task_id': i, 'user_id': student.id} for i in task_ids[::10]])
+    db.session.commit()
+    return student.id
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        'p50': statistics.median(samples),
+        'p95': samples[int(len(samples) * 0.95) - 1],
+        'max': samples[-1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--docs', type=int, default=5000, help='Документов в каждой коллекции')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--max-p95-ms', type=float, default=None, help='Порог p95 retrieve_context, мс')
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from app.models import News
+    from app.search import estimate_tokens, ensure_index, retrieve_context, search_index
+
+    rnd = random.Random(42)
+    vocabulary = make_vocabulary(rnd, args.vocabulary)
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        student_id = seed(db, rnd, vocabulary, args.docs)
+
+        started = time.perf_counter()
+        ensure_index()
+        print(f'build: {len(search_index)} documents in {(time.perf_counter() - started) * 1000:.0f} ms')
+
+        # Инкрементальное обновление: commit новости -> документ в индексе без перестроения
+        timings = []
+        for _ in range(50):
+            news = News(title=text(rnd, vocabulary, 6), content=text(rnd, vocabulary, 150), created_by_id=1)
+            db.session.add(news)
+            started = time.perf_counter()
+            db.session.commit()
+            timings.append((time.perf_counter() - started) * 1000)
+        stats = percentiles(timings)
+        print(f'commit + index update: p50 {stats["p50"]:.2f} ms, p95 {stats["p95"]:.2f} ms')
+
+        # Запросы - смесь частых и редких слов, как в вопросах пользователей
+        queries = [' '.join(rnd.choice(vocabulary[10:1000]) for _ in range(rnd.randint(2, 6)))
+                   for _ in range(args.queries)]
+        results = []
+        for label, run in (
+            ('search (index only)', lambda q: search_index.search(q, limit=15)),
+            ('retrieve_context (student)', lambda q: retrieve_context(q, student_id, 'student')),
+        ):
+            timings = []
+            for query in queries:
+                started = time.perf_counter()
+                found = run(query)
+                timings.append((time.perf_counter() - started) * 1000)
+                results.append(found)
+            stats = percentiles(timings)
+            print(f'{label:28} p50 {stats["p50"]:.2f} ms  p95 {stats["p95"]:.2f} ms  max {stats["max"]:.2f} ms')
+
+        contexts = results[len(queries):]
+        tokens = [sum(estimate_tokens(item['title']) + estimate_tokens(item['text']) for item in found)
+                  for found in contexts]
+        print(f'context: {statistics.mean(len(found) for found in contexts):.1f} snippets, '
+              f'{statistics.mean(tokens):.0f} tokens on average (budget {app.config["CHATBOT_CONTEXT_TOKENS"]})')
+
+    if args.max_p95_ms is not None and stats['p95'] > args.max_p95_ms:
+        print(f'FAIL: p95 {stats["p95"]:.2f} ms > {args.max_p95_ms} ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
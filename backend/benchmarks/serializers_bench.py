@@ -0,0 +1,131 @@
+# backend/benchmarks/serializers_bench.py
+# Сравнение сериализации списков: Marshmallow (ORM + schema.dump + jsonify)
+# против скомпилированных сериализаторов (select() + CompiledSerializer + json_response).
+#
+# Работает на временной SQLite в памяти, заполненной синтетическими данными.
+# Пример:
+#   python benchmarks/serializers_bench.py --rows 2000 --repeat 5
+#   python benchmarks/serializers_bench.py --verify   # код выхода 1, если ответы отличаются хоть на байт
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config # noqa: E402
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+
+
+def seed(db, rows):
+    """Заполняет БД: пользователи, новости, задачи с назначениями, тесты и результаты."""
+    from app.models import Role, User, News, Task, Test, TestUser
+
+    rnd = random.Random(42)
+    roles = {name: Role(name=name) for name in ('student', 'teacher', 'admin')}
+    db.session.add_all(roles.values())
+    teachers = [User(username=f'teacher{i}', email=f't{i}@example.com', password_hash='x', role=roles['teacher'])
+                for i in range(5)]
+    students = [User(username=f'student{i}', email=f's{i}@example.com', password_hash='x', role=roles['student'])
+                for i in range(200)]
+    db.session.add_all(teachers + students)
+    db.session.flush()
+
+    base = datetime(2025, 1, 1, 8, 30, 15, 123456)
+    for i in range(rows):
+        db.session.add(News(title=f'Новость {i}', content='Текст новости с "кавычками" и переносом\n' * 20,
+                            created_at=base + timedelta(minutes=i), created_by_id=rnd.choice(teachers).id))
+    for i in range(rows):
+        task = Task(title=f'Задание {i}', description=None if i % 7 == 0 else 'Описание ' * 10,
+                    created_by_id=rnd.choice(teachers).id, created_at=base + timedelta(hours=i),
+                    due_date=None if i % 3 == 0 else base + timedelta(days=i))
+        task.assigned_to_users.extend(rnd.sample(students, 3))
+        db.session.add(task)
+    tests = [Test(title=f'Тест {i}', description=None if i % 2 else 'Описание теста', created_by_id=teachers[0].id)
+             for i in range(20)]
+    db.session.add_all(tests)
+    db.session.flush()
+    for i in range(rows):
+        db.session.add(TestUser(user_id=rnd.choice(students).id, test_id=rnd.choice(tests).id,
+                                score=rnd.randint(0, 20), max_score=20, taken_at=base + timedelta(seconds=i),
+                                answers_submitted={str(k): rnd.choice(['a', 'b', ['a', 'c'], 'ответ']) for k in range(10)}))
+    db.session.commit()
+
+
+def cases():
+    """(имя, путь через Marshmallow, быстрый путь) - те же запросы, что и в routes.py."""
+    from flask import jsonify
+    from app.models import News, Task, Test, TestUser
+    from app.fast_serializers import (
+        json_response, news_list_serializer, test_headers_serializer, tasks_serializer, test_users_serializer
+    )
+
+    def pair(name, serializer, model, *order_by):
+        # Та же схема, что скомпилирована в сериализатор, но через ORM и Marshmallow
+        return (name,
+                lambda: jsonify(serializer.schema.dump(model.query.order_by(*order_by).all())),
+                lambda: json_response(serializer.dump(serializer.select().order_by(*order_by)))[0])
+
+    return [
+        pair('news', news_list_serializer, News, News.created_at.desc()),
+        pair('tests', test_headers_serializer, Test),
+        pair('tasks', tasks_serializer, Task),
+        pair('test_results', test_users_serializer, TestUser),
+    ]
+
+
+def timed(func, db, repeat):
+    timings = []
+    body = b''
+    for _ in range(repeat):
+        db.session.expunge_all() # Без identity map: каждый прогон честно читает из БД
+        started = time.perf_counter()
+        body = func().get_data()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Marshmallow vs compiled serializers on list endpoints')
+    parser.add_argument('--rows', type=int, default=1000, help='Строк в каждом списке')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--verify', action='store_true',
+                        help='Только проверить побайтовое совпадение ответов (при обоих значениях ensure_ascii)')
+    args = parser.parse_args()
+
+    from app import create_app, db
+    app = create_app(BenchConfig)
+    with app.app_context(), app.test_request_context():
+        db.create_all()
+        seed(db, args.rows)
+
+        if args.verify:
+            failed = False
+            for ensure_ascii in (True, False):
+                app.json.ensure_ascii = ensure_ascii
+                for name, slow, fast in cases():
+                    _, expected = timed(slow, db, 1)
+                    _, actual = timed(fast, db, 1)
+                    ok = expected == actual
+                    failed |= not ok
+                    print(f'{name:<15} ensure_ascii={ensure_ascii!s:<6} {len(expected):>10} bytes  '
+                          f'{"OK" if ok else "MISMATCH"}')
+            sys.exit(1 if failed else 0)
+
+        print(f'{"endpoint":<15}{"marshmallow ms":>16}{"compiled ms":>14}{"speedup":>10}')
+        for name, slow, fast in cases():
+            slow_ms, _ = timed(slow, db, args.repeat)
+            fast_ms, _ = timed(fast, db, args.repeat)
+            print(f'{name:<15}{slow_ms:>16.1f}{fast_ms:>14.1f}{slow_ms / fast_ms:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# backend/benchmarks/similarity_bench.py
+# Поиск похожих свободных ответов (app/similarity.py): подписи MinHash для N сдач, отчет LSH
+# и сколько пар он сравнил против попарного перебора; полнота по заранее подложенным группам списавших.
+#
+# Работает на временной SQLite в памяти. Пример:
+#   python benchmarks/similarity_bench.py --submissions 10000
+#   python benchmarks/similarity_bench.py --max-report-ms 2000   # код выхода 1, если отчет дольше порога
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config # noqa: E402
+
+
+class BenchConfig(Config):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+
+
+def make_vocabulary(rnd, size):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rnd.choice(letters) for _ in range(rnd.randint(3, 10))) for _ in range(size)]
+
+
+def answer(rnd, vocabulary):
+    # Частые слова встречаются чаще редких, но ответ из них одних не состоит
+    return ' '.join(vocabulary[int(len(vocabulary) * rnd.random() ** 2)] for _ in range(rnd.randint(8, 25)))
+
+
+def edit(rnd, text):
+    # Списанный ответ: пара слов заменена или переставлена, регистр и пунктуация изменены
+    words = text.split()
+    for _ in range(rnd.randint(0, 2)):
+        i = rnd.randrange(len(words))
+        words[i] = words[i][::-1] if rnd.random() < 0.5 else words[i] + 's'
+    result = ' '.join(words)
+    return result.capitalize() + '.' if rnd.random() < 0.5 else result
+
+
+def seed(db, rnd, vocabulary, submissions, copy_ratio):
+    """Один тест с вопросом text_input и submissions сдач; возвращает (id теста, [множества списавших])."""
+    from sqlalchemy import insert
+    from app.models import Question, Role, Test, TestUser, User
+
+    roles = {name: Role(name=name) for name in ('student', 'teacher', 'admin')}
+    db.session.add_all(roles.values())
+    teacher = User(username='teacher', email='t@example.com', password_hash='x', role=roles['teacher'])
+    db.session.add(teacher)
+    db.session.flush()
+    test = Test(title='Essay', created_by_id=teacher.id)
+    db.session.add(test)
+    db.session.flush()
+    question = Question(test_id=test.id, content='Explain', question_type='text_input', correct_answer='-')
+    db.session.add(question)
+    db.session.flush()
+
+    db.session.execute(insert(User), [{'username': f's{i}', 'email': f's{i}@example.com', 'password_hash': 'x',
+                                       'role_id': roles['student'].id} for i in range(submissions)])
+    user_ids = db.session.execute(db.select(User.id).where(User.username.like('s%')).order_by(User.id)).scalars().all()
+
+    # Группы по 2-5 студентов с одним исходным ответом; остальные пишут сами
+    texts = {}
+    planted = []
+    pool = list(user_ids)
+    rnd.shuffle(pool)
+    copied = int(submissions * copy_ratio)
+    while copied > 0 and len(pool) >= 5:
+        size = rnd.randint(2, 5)
+        members, pool = pool[:size], pool[size:]
+        source = answer(rnd, vocabulary)
+        for user_id in members:
+            texts[user_id] = edit(rnd, source)
+        planted.append(set(members))
+        copied -= size
+    for user_id in pool:
+        texts[user_id] = answer(rnd, vocabulary)
+
+    db.session.execute(insert(TestUser), [{'user_id': user_id, 'test_id': test.id, 'score': 0, 'max_score': 1,
+                                           'answers_submitted': {str(question.id): texts[user_id]}}
+                                          for user_id in user_ids])
+    db.session.commit()
+    return test.id, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--submissions', type=int, default=10000)
+    parser.add_argument('--copy-ratio', type=float, default=0.05, help='Доля студентов в группах списавших')
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--threshold', type=float, default=None, help='По умолчанию SIMILARITY_THRESHOLD')
+    parser.add_argument('--max-report-ms', type=float, default=None, help='Порог времени отчета, мс')
+    args = parser.parse_args()
+
+    from app import create_app, db
+    from app.models import AnswerSignature
+    from app.similarity import backfill_signatures, estimate, from_bytes, minhash, similarity_report
+
+    rnd = random.Random(42)
+    vocabulary = make_vocabulary(rnd, args.vocabulary)
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        test_id, planted = seed(db, rnd, vocabulary, args.submissions, args.copy_ratio)
+
+        # Тот же путь, что у сдачи теста: отбор свободных ответов, MinHash, запись подписей
+        started = time.perf_counter()
+        saved = backfill_signatures(test_id)
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f'signatures: {saved} in {elapsed:.0f} ms ({elapsed * 1000 / max(saved, 1):.0f} us per answer)')
+        sample = [answer(rnd, vocabulary) for _ in range(1000)]
+        started = time.perf_counter()
+        for text in sample:
+            minhash(text)
+        print(f'minhash alone: {(time.perf_counter() - started) * 1000:.0f} us per answer')
+        signatures = {user_id: from_bytes(data) for user_id, data in db.session.execute(
+            db.select(AnswerSignature.user_id, AnswerSignature.signature))}
+
+        started = time.perf_counter()
+        report = similarity_report(test_id, args.threshold)
+        report_ms = (time.perf_counter() - started) * 1000
+        n = report['answers']
+        print(f'report: {report_ms:.0f} ms, {len(report["clusters"])} clusters, '
+              f'{report["compared_pairs"]} pairs compared vs {n * (n - 1) // 2} pairwise')
+
+    # Полнота: доля подложенных пар, оказавшихся в одной группе; точность: доля пар отчета из подложенных
+    owner = {}
+    for index, cluster in enumerate(report['clusters']):
+        for item in cluster['answers']:
+            owner[item['user_id']] = index
+    planted_pairs = sum(len(group) * (len(group) - 1) // 2 for group in planted)
+    found_pairs = sum(1 for group in planted for a in group for b in group
+                      if a < b and a in owner and owner[a] == owner.get(b))
+    planted_of = {user_id: index for index, group in enumerate(planted) for user_id in group}
+    reported_pairs = [(a['user_id'], b['user_id']) for cluster in report['clusters']
+                      for i, a in enumerate(cluster['answers']) for b in cluster['answers'][i + 1:]]
+    true_pairs = sum(1 for a, b in reported_pairs if a in planted_of and planted_of[a] == planted_of.get(b))
+    print(f'recall {found_pairs / max(planted_pairs, 1):.3f} ({found_pairs}/{planted_pairs} planted pairs), '
+          f'precision {true_pairs / max(len(reported_pairs), 1):.3f}')
+    # Потери самого LSH: подложенные пары с оценкой не ниже порога, которые не попали в одну группу
+    above = [(a, b) for group in planted for a in group for b in group
+             if a < b and estimate(signatures[a], signatures[b]) >= report['threshold']]
+    lost = sum(1 for a, b in above if a not in owner or owner[a] != owner.get(b))
+    print(f'LSH misses: {lost} of {len(above)} planted pairs above threshold {report["threshold"]}')
+
+    if args.max_report_ms is not None and report_ms > args.max_report_ms:
+        print(f'FAIL: report {report_ms:.0f} ms > {args.max_report_ms} ms')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,75 @@
+# backend/benchmarks/startup_time.py
+# Замер холодного старта воркера: `python -X importtime` + create_app().
+#
+# Пример:
+#   python benchmarks/startup_time.py --runs 5 --top 15
+#   python benchmarks/startup_time.py --max-ms 1500   # код выхода 1, если старт медленнее порога
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_CODE = 'from app import create_app; create_app()'
+
+
+def run_once():
+    """Запускает холодный старт в отдельном процессе; возвращает (мс, строки importtime)."""
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_CODE],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr)
+        raise SystemExit(f'Startup failed with exit code {proc.returncode}')
+    return elapsed_ms, proc.stderr.splitlines()
+
+
+def parse_importtime(lines):
+    """Разбирает вывод -X importtime: {корневой пакет: суммарное собственное время импорта, мкс}."""
+    per_package = {}
+    for line in lines:
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue # Заголовок таблицы
+        package = parts[2].strip().split('.')[0]
+        per_package[package] = per_package.get(package, 0) + int(parts[0])
+    return per_package
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start time of a CollegeApp worker')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--top', type=int, default=10, help='Сколько самых тяжелых пакетов показать')
+    parser.add_argument('--max-ms', type=float, default=None, help='Порог медианы старта для CI')
+    args = parser.parse_args()
+
+    timings = []
+    last_lines = []
+    for _ in range(args.runs):
+        elapsed_ms, last_lines = run_once()
+        timings.append(elapsed_ms)
+
+    median_ms = statistics.median(timings)
+    print(f'startup (process + imports + create_app): median {median_ms:.0f} ms, '
+          f'min {min(timings):.0f} ms, max {max(timings):.0f} ms over {args.runs} runs')
+
+    heaviest = sorted(parse_importtime(last_lines).items(), key=lambda item: item[1], reverse=True)
+    print(f'\n{"package":<40}{"import ms":>15}')
+    for name, self_us in heaviest[:args.top]:
+        print(f'{name:<40}{self_us / 1000:>15.1f}')
+
+    if args.max_ms is not None and median_ms > args.max_ms:
+        print(f'\nFAIL: median startup {median_ms:.0f} ms exceeds budget {args.max_ms:.0f} ms')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,28 @@
+# backend/gunicorn.conf.py
+# Конфигурация gunicorn; все значения берутся из Config (переменные окружения WEB_*).
+
+from config import Config
+
+bind = Config.WEB_BIND
+workers = Config.WEB_WORKERS
+# gthread: несколько потоков на воркер, пока один поток ждет MySQL, другие обслуживают запросы
+worker_class = 'gthread'
+threads = Config.WEB_THREADS
+timeout = Config.WEB_TIMEOUT
+graceful_timeout = Config.WEB_TIMEOUT
+keepalive = 5
+# Периодический перезапуск воркеров (с разбросом, чтобы не перезапускались одновременно)
+max_requests = Config.WEB_MAX_REQUESTS
+max_requests_jitter = max(Config.WEB_MAX_REQUESTS // 10, 1)
+# Приложение загружается один раз в мастере, воркеры получают его через fork
+preload_app = True
+# Журнал доступа пишет само приложение (app/logs.py): JSON с request_id и user_id, с выборкой по маршрутам
+accesslog = None
+
+
+def post_fork(server, worker):
+    # Соединения пула, открытые в мастере, не должны использоваться несколькими процессами
+    from app import db
+    from wsgi import app
+    with app.app_context():
+        db.engine.dispose(close=False)
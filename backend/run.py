@@ -1,5 +1,6 @@
+import os
 from app import create_app, db
-from app.models import User, Role
+from app.models import User, Role, Book, Task, News, Test, Question, TestUser
 
 app = create_app()
 
@@ -12,4 +13,5 @@ def make_shell_context():
     }
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Только для разработки! В продакшене: gunicorn -c gunicorn.conf.py wsgi:app
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1')
\ No newline at end of file
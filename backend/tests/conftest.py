@@ -0,0 +1,155 @@
+# backend/tests/conftest.py
+# Общие фикстуры: приложение на SQLite в памяти с небольшим набором данных.
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import Config
+
+
+@event.listens_for(Engine, 'connect')
+def _enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite по умолчанию не проверяет внешние ключи, а MySQL (InnoDB) проверяет
+    if type(dbapi_connection).__module__.startswith('sqlite3'):
+        dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    SQLALCHEMY_BINDS = {}
+    LOG_FORMAT = 'text'
+    JWT_SECRET_KEY = 'test-jwt-secret-key-of-at-least-32-bytes'
+
+
+def seed(db):
+    """Небольшой набор данных, покрывающий крайние случаи сериализации.
+
+    NULL во вложенных объектах и необязательных полях, пустые и непустые списки, кириллица,
+    кавычки и переносы строк, JSON-поля, время с микросекундами и без.
+    """
+    from app.models import (
+        Role, User, Book, StoredFile, News, Task, Test, Question, TestUser, TestUserArchive, Group
+    )
+
+    roles = {name: Role(name=name) for name in ('student', 'teacher', 'admin')}
+    db.session.add_all(roles.values())
+    teacher = User(username='преподаватель', email='teacher@example.com', password_hash='x', role=roles['teacher'])
+    students = [User(username=f'student{i}', email=f's{i}@example.com', password_hash='x', role=roles['student'])
+                for i in range(3)]
+    admin = User(username='admin', email='admin@example.com', password_hash='x', role=roles['admin'])
+    db.session.add_all([teacher] + students + [admin])
+    group = Group(name='Группа "А"', created_by_id=None)
+    db.session.add(group)
+    db.session.flush()
+    group.members.append(students[0])
+
+    base = datetime(2025, 2, 3, 10, 20, 30, 123456)
+    stored = StoredFile(sha256='ab' * 32, size=1024, content_type='application/pdf', original_name='книга.pdf',
+                        refcount=1)
+    db.session.add(stored)
+    db.session.add_all([
+        Book(title='Война и мир', author='Л. Толстой', file_url=None, created_by_id=teacher.id, file=stored,
+             updated_at=base),
+        Book(title='Plain "ASCII"\nbook', author=None, file_url='https://example.com/b.pdf', created_by_id=None,
+             updated_at=base.replace(microsecond=0)),
+    ])
+
+    db.session.add_all([
+        News(title='Новость', content='Текст новости с "кавычками"\nи переносом. ' * 30,
+             created_by_id=teacher.id, created_at=base, updated_at=base),
+        News(title='Short', content='Короткая', created_by_id=teacher.id, created_at=base.replace(microsecond=0),
+             updated_at=base),
+    ])
+
+    tasks = [
+        Task(title='Задание 1', description='Описание\tс табуляцией', created_by_id=teacher.id, created_at=base,
+             due_date=base + timedelta(days=3), updated_at=base),
+        Task(title='Task 2', description=None, created_by_id=teacher.id, created_at=base, due_date=None,
+             updated_at=base),
+    ]
+    db.session.add_all(tasks)
+    db.session.flush()
+    tasks[0].assigned_to_users.extend(students[:2]) # По возрастанию id: порядок связи не задан
+    tasks[0].groups = [group]
+
+    tests = [
+        Test(title='Тест', description='Описание теста', created_by_id=teacher.id, created_at=base,
+             updated_at=base, groups=[group]),
+        Test(title='Open test', description=None, created_by_id=teacher.id, created_at=base, updated_at=base),
+    ]
+    db.session.add_all(tests)
+    db.session.flush()
+    db.session.add_all([
+        Question(test_id=tests[0].id, content='Столица России?', options=['Москва', 'Казань', "O'Hare"],
+                 correct_answer='Москва', question_type='single_choice', position=1, updated_at=base),
+        Question(test_id=tests[0].id, content='Объясните "почему"', options=None, correct_answer='любой',
+                 question_type='text_input', position=None, updated_at=base),
+        Question(test_id=tests[1].id, content='2 + 2', options={'a': 3, 'b': 4, 'вариант': [1, 2.5, None]},
+                 correct_answer='b', updated_at=base),
+    ])
+
+    results = [
+        TestUser(user_id=students[0].id, test_id=tests[0].id, score=2, max_score=2, taken_at=base,
+                 answers_submitted={'1': 'Москва', '2': 'Потому что "так"', '3': ['a', 'b']}),
+        TestUser(user_id=students[1].id, test_id=tests[1].id, score=None, max_score=None,
+                 taken_at=base.replace(microsecond=0), answers_submitted=None),
+    ]
+    db.session.add_all(results)
+    db.session.flush()
+    db.session.add_all([
+        TestUserArchive(id=1000, user_id=students[2].id, test_id=tests[0].id, score=1, max_score=2,
+                        taken_at=base - timedelta(days=200), answers_submitted={'1': 'Казань'}, attempt_id=None,
+                        archived_at=base),
+        TestUserArchive(id=1001, user_id=students[0].id, test_id=tests[1].id, score=0, max_score=1,
+                        taken_at=None, answers_submitted=[], attempt_id=7, archived_at=base),
+    ])
+    db.session.commit()
+
+
+def _clear_process_caches():
+    # Кэши живут в процессе, а id в новой БД каждого теста начинаются заново
+    from app.auth import _token_versions
+    from app.idempotency import response_cache
+    from app.test_sessions import _build_student_view
+
+    _token_versions.clear()
+    response_cache.clear()
+    _build_student_view.cache_clear()
+
+
+@pytest.fixture
+def app():
+    """Приложение с заполненной БД. Контекст не удерживается: каждый запрос клиента - в своей сессии."""
+    from app import create_app, db
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all(bind_key=None) # Только основная БД: реплики из других тестов здесь не настроены
+        seed(db)
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all(bind_key=None)
+    _clear_process_caches()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(app):
+    """auth(username) -> заголовки с access-токеном пользователя из seed."""
+    from app.auth import issue_tokens
+    from app.models import User
+
+    def headers(username):
+        with app.app_context():
+            user = User.query.filter_by(username=username).one()
+            return {'Authorization': f"Bearer {issue_tokens(user, with_refresh=False)['access_token']}"}
+    return headers
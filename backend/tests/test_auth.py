@@ -0,0 +1,21 @@
+# backend/tests/test_auth.py
+
+from app import db
+from app.models import User
+
+
+def test_user_payload_hides_internal_counters(app, client, auth):
+    with app.app_context():
+        user = User.query.filter_by(username='student0').one()
+        user.set_password('secret')
+        db.session.commit()
+
+    login = client.post('/api/login', json={'username': 'student0', 'password': 'secret'})
+    protected = client.get('/api/protected', headers=auth('student0'))
+
+    assert login.status_code == 200 and protected.status_code == 200
+    for payload in (login.get_json(), protected.get_json()['logged_in_as']):
+        assert 'password_hash' not in payload
+        assert 'token_version' not in payload
+        assert 'visibility_changed_at' not in payload
+        assert payload['username'] == 'student0'
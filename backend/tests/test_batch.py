@@ -0,0 +1,83 @@
+# backend/tests/test_batch.py
+
+from app import models
+from app.idempotency import REPLAYED_HEADER
+
+
+def _batch(client, headers, *items):
+    return client.post('/api/batch', json={'requests': list(items)}, headers=headers)
+
+
+def _news_count(app):
+    with app.app_context():
+        return models.News.query.count()
+
+
+def test_batch_runs_reads_in_order_and_keeps_ids(app, client, auth):
+    with app.app_context():
+        test_id = models.Test.query.filter_by(title='Тест').one().id
+
+    response = _batch(client, auth('student0'),
+                      {'id': 'test', 'path': f'/tests/{test_id}'},
+                      {'id': 'missing', 'path': '/tests/999999'},
+                      {'path': '/api/books'})
+    responses = response.get_json()['responses']
+
+    assert response.status_code == 200
+    assert [item.get('id') for item in responses] == ['test', 'missing', None]
+    assert [item['status'] for item in responses] == [200, 404, 200] # 404 не прерывает остальные
+    assert responses[0]['body'] == client.get(f'/api/tests/{test_id}', headers=auth('student0')).get_json()
+    assert len(responses[2]['body']) == 2
+
+
+def test_batch_sub_requests_check_permissions_separately(app, client, auth):
+    responses = _batch(client, auth('student0'),
+                       {'method': 'POST', 'path': '/news', 'body': {'title': 'Новость', 'content': 'Текст'}},
+                       {'path': '/news'}).get_json()['responses']
+
+    assert [item['status'] for item in responses] == [403, 200]
+    assert _news_count(app) == 2
+
+
+def test_batch_reads_its_own_writes(app, client, auth):
+    response = _batch(client, auth('преподаватель'),
+                      {'method': 'POST', 'path': '/news', 'body': {'title': 'Из пакета', 'content': 'Текст'}},
+                      {'path': '/news'})
+    created, listing = response.get_json()['responses']
+
+    assert created['status'] == 201
+    assert created['body']['id'] in [item['id'] for item in listing['body']]
+
+
+def test_batch_item_idempotency_key_replays_response(app, client, auth):
+    item = {'method': 'POST', 'path': '/news', 'body': {'title': 'Один раз', 'content': 'Текст'},
+            'headers': {'idempotency-key': 'batch-news-1', 'X-Ignored': 'x'}}
+
+    first = _batch(client, auth('преподаватель'), item).get_json()['responses'][0]
+    second = _batch(client, auth('преподаватель'), item).get_json()['responses'][0]
+
+    assert first['status'] == second['status'] == 201
+    assert second['body'] == first['body']
+    assert second['headers'].get(REPLAYED_HEADER) == 'true'
+    assert _news_count(app) == 3
+
+
+def test_batch_cannot_contain_batch(client, auth):
+    nested = {'method': 'POST', 'path': '/batch', 'body': {'requests': [{'path': '/books'}]}}
+
+    responses = _batch(client, auth('admin'), nested, {'path': '/books'}).get_json()['responses']
+
+    assert [item['status'] for item in responses] == [400, 200]
+
+
+def test_batch_rejects_invalid_envelope(app, client, auth):
+    headers = auth('admin')
+    limit = app.config['BATCH_MAX_REQUESTS']
+
+    assert client.post('/api/batch', json={'requests': []}, headers=headers).status_code == 400
+    assert client.post('/api/batch', json=[{'path': '/books'}], headers=headers).status_code == 400
+    assert _batch(client, headers, *[{'path': '/books'}] * (limit + 1)).status_code == 400
+    assert _batch(client, headers, {'method': 'PATCH', 'path': '/books'}).status_code == 400
+    assert _batch(client, headers, {'path': 'books'}).status_code == 400
+    assert _batch(client, headers, {'path': '/books', 'headers': ['x']}).status_code == 400
+    assert client.post('/api/batch', json={'requests': [{'path': '/books'}]}).status_code == 401
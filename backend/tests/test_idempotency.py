@@ -0,0 +1,103 @@
+# backend/tests/test_idempotency.py
+
+import pytest
+
+from app import db, models
+from app.idempotency import response_cache
+
+
+@pytest.fixture
+def open_test(app):
+    with app.app_context():
+        test = models.Test.query.filter_by(title='Open test').one()
+        return test.id, test.questions.one().id
+
+
+def _start(client, auth, test_id):
+    return client.post(f'/api/tests/{test_id}/attempts', headers=auth('student2')).get_json()['attempt_id']
+
+
+def _submit(client, auth, test_id, body, key=None):
+    headers = dict(auth('student2'), **({'Idempotency-Key': key} if key else {}))
+    return client.post(f'/api/tests/{test_id}/submit', json=body, headers=headers)
+
+
+def _results(app, test_id):
+    with app.app_context():
+        student = models.User.query.filter_by(username='student2').one()
+        return models.TestUser.query.filter_by(test_id=test_id, user_id=student.id).count()
+
+
+def test_submit_requires_attempt(app, client, auth, open_test):
+    test_id, question_id = open_test
+    body = {'answers': {str(question_id): 'b'}}
+
+    assert _submit(client, auth, test_id, body).status_code == 400
+    assert _submit(client, auth, test_id, body).status_code == 400
+    assert _results(app, test_id) == 0
+
+
+def test_same_attempt_with_different_keys_is_saved_once(app, client, auth, open_test):
+    test_id, question_id = open_test
+    body = {'attempt_id': _start(client, auth, test_id), 'answers': {str(question_id): 'b'}}
+
+    assert _submit(client, auth, test_id, body, key='key-1').status_code == 201
+    assert _submit(client, auth, test_id, body, key='key-2').status_code == 409
+    assert _submit(client, auth, test_id, body).status_code == 409
+    assert _results(app, test_id) == 1
+
+
+def test_concurrent_submit_of_one_attempt_returns_409(app, client, auth, open_test):
+    test_id, question_id = open_test
+    attempt_id = _start(client, auth, test_id)
+    with app.app_context():
+        # Параллельный запрос уже сохранил результат, но эта отправка еще видит попытку несданной
+        attempt = db.session.get(models.TestAttempt, attempt_id)
+        db.session.add(models.TestUser(user_id=attempt.user_id, test_id=test_id, attempt_id=attempt_id, score=0))
+        db.session.commit()
+
+    response = _submit(client, auth, test_id, {'attempt_id': attempt_id, 'answers': {str(question_id): 'b'}})
+
+    assert response.status_code == 409
+    assert _results(app, test_id) == 1
+    with app.app_context():
+        assert db.session.get(models.TestAttempt, attempt_id).submitted_at is None # Откат всей отправки
+
+
+@pytest.mark.parametrize('from_db', [False, True], ids=['lru', 'db'])
+def test_retry_with_same_key_replays_stored_response(app, client, auth, open_test, from_db):
+    test_id, question_id = open_test
+    body = {'attempt_id': _start(client, auth, test_id), 'answers': {str(question_id): 'b'}}
+    first = _submit(client, auth, test_id, body, key='retry-key')
+    if from_db:
+        response_cache.clear() # Повтор пришел на другой воркер
+
+    retry = _submit(client, auth, test_id, body, key='retry-key')
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert retry.get_data() == first.get_data()
+    assert _results(app, test_id) == 1
+
+
+def test_key_reused_with_different_body_is_rejected(app, client, auth, open_test):
+    test_id, question_id = open_test
+    attempt_id = _start(client, auth, test_id)
+
+    assert _submit(client, auth, test_id, {'attempt_id': attempt_id, 'answers': {str(question_id): 'b'}},
+                   key='same-key').status_code == 201
+    assert _submit(client, auth, test_id, {'attempt_id': attempt_id, 'answers': {str(question_id): 'a'}},
+                   key='same-key').status_code == 422
+
+
+def test_create_route_replays_instead_of_creating_twice(app, client, auth):
+    headers = dict(auth('преподаватель'), **{'Idempotency-Key': 'news-1'})
+    body = {'title': 'Объявление', 'content': 'Текст объявления'}
+
+    first = client.post('/api/news', json=body, headers=headers)
+    retry = client.post('/api/news', json=body, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.get_json()['id'] == first.get_json()['id']
+    with app.app_context():
+        assert models.News.query.filter_by(title='Объявление').count() == 1
@@ -0,0 +1,101 @@
+# backend/tests/test_jobs.py
+
+import pytest
+
+from app import db, models
+from app.jobs import claim_next, enqueue, execute_job, job_handler, run_worker
+
+WRONG_ANSWER = 'Потому что так написано в учебнике'
+
+
+@job_handler('tests.flaky')
+def _flaky(fail):
+    if fail:
+        raise RuntimeError('temporary failure')
+    return {'ok': True}
+
+
+def _submit_free_text(app, client, auth):
+    with app.app_context():
+        test = models.Test.query.filter_by(title='Тест').one()
+        question = test.questions.filter_by(question_type='text_input').one()
+        test_id, question_id = test.id, question.id
+    attempt_id = client.post(f'/api/tests/{test_id}/attempts', headers=auth('student0')).get_json()['attempt_id']
+    response = client.post(f'/api/tests/{test_id}/submit', headers=auth('student0'),
+                           json={'attempt_id': attempt_id, 'answers': {str(question_id): WRONG_ANSWER}})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def test_submit_enqueues_signatures_and_worker_runs_them(app, client, auth):
+    result_id = _submit_free_text(app, client, auth)
+
+    with app.app_context():
+        job = models.Job.query.filter_by(kind='results.signatures').one()
+        assert job.status == 'queued' and job.payload == {'test_user_id': result_id}
+        assert models.AnswerSignature.query.count() == 0 # Ответ не ждал хэширования
+
+        assert claim_next('test-worker') == job.id
+        assert execute_job(job.id) is True
+
+        job = db.session.get(models.Job, job.id)
+        assert job.status == 'succeeded' and job.result == {'signatures': 1}
+        assert models.AnswerSignature.query.filter_by(test_user_id=result_id).count() == 1
+
+
+def test_signatures_job_is_safe_to_repeat(app, client, auth):
+    result_id = _submit_free_text(app, client, auth)
+
+    with app.app_context():
+        assert run_worker('test-worker', burst=True) == 1
+        job = enqueue('results.signatures', {'test_user_id': result_id})
+        db.session.commit()
+        job_id = job.id
+        assert run_worker('test-worker', burst=True) == 1 # Воркер сбрасывает сессию после каждой задачи
+        assert db.session.get(models.Job, job_id).result == {'signatures': 0}
+        assert models.AnswerSignature.query.filter_by(test_user_id=result_id).count() == 1
+
+
+def test_inline_mode_runs_jobs_after_the_request(app, client, auth):
+    app.config['JOBS_INLINE'] = True
+
+    result_id = _submit_free_text(app, client, auth)
+
+    with app.app_context():
+        assert models.Job.query.one().status == 'succeeded'
+        assert models.AnswerSignature.query.filter_by(test_user_id=result_id).count() == 1
+
+
+def test_failed_job_is_retried_with_backoff_then_marked_failed(app):
+    with app.app_context():
+        job = enqueue('tests.flaky', {'fail': True})
+        job.max_attempts = 2
+        db.session.commit()
+
+        assert claim_next('test-worker') == job.id
+        assert execute_job(job.id) is False
+        job = db.session.get(models.Job, job.id)
+        assert job.status == 'queued' and job.attempts == 1 and 'temporary failure' in job.last_error
+        assert claim_next('test-worker') is None # Повтор - не раньше run_at
+
+        job.run_at = job.created_at
+        db.session.commit()
+        assert claim_next('test-worker') == job.id
+        assert execute_job(job.id) is False
+        job = db.session.get(models.Job, job.id)
+        assert job.status == 'failed' and job.attempts == 2 and job.finished_at is not None
+
+
+def test_job_failed_is_not_retried(app):
+    with app.app_context():
+        job = enqueue('results.signatures', {'test_user_id': 999999})
+        db.session.commit()
+
+        assert claim_next('test-worker') == job.id
+        assert execute_job(job.id) is False
+        assert db.session.get(models.Job, job.id).status == 'failed'
+
+
+def test_enqueue_rejects_unknown_kind(app):
+    with app.app_context(), pytest.raises(ValueError):
+        enqueue('no.such.job')
@@ -0,0 +1,85 @@
+# backend/tests/test_question_batch.py
+
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def exam(app):
+    """(id теста, [id вопросов по порядку], версия) для теста с двумя вопросами из seed."""
+    with app.app_context():
+        test = models.Test.query.filter_by(title='Тест').one()
+        question_ids = [q.id for q in test.questions]
+        return test.id, question_ids, test.version
+
+
+def _batch(client, auth, test_id, body):
+    return client.post(f'/api/tests/{test_id}/questions:batch', json=body, headers=auth('преподаватель'))
+
+
+def test_batch_applies_creates_updates_deletes_and_order(client, auth, exam):
+    test_id, (first, second), version = exam
+    response = _batch(client, auth, test_id, {
+        'creates': [
+            {'client_id': 1000, 'content': 'Новый вопрос', 'correct_answer': 'да'},
+            {'client_id': 'tmp-2', 'content': 'Выбор', 'correct_answer': ['a', 'b'],
+             'question_type': 'multiple_choice', 'options': {'a': 'A', 'b': 'B'}},
+        ],
+        'updates': [{'id': second, 'content': 'Измененный вопрос'}],
+        'deletes': [first],
+        'order': ['tmp-2', second, 1000],
+    })
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['version'] == version + 1 # Одна версия на весь пакет
+    questions = body['questions']
+    assert [q['content'] for q in questions] == ['Выбор', 'Измененный вопрос', 'Новый вопрос']
+    assert [q['position'] for q in questions] == [1, 2, 3]
+    assert questions[0]['correct_answer'] == '["a", "b"]'
+    assert first not in [q['id'] for q in questions]
+
+
+@pytest.mark.parametrize('body', [
+    ['not', 'an', 'object'],
+    {'deletes': '12'},
+    {'updates': {'id': 1}},
+    {'creates': 'question'},
+    {'order': 5},
+    {'creates': ['question']},
+    {'creates': [{'content': 'Без ответа'}]},
+], ids=['list-body', 'deletes-string', 'updates-object', 'creates-string', 'order-int', 'create-not-object',
+        'create-missing-answer'])
+def test_batch_rejects_malformed_input(app, client, auth, exam, body):
+    test_id, question_ids, version = exam
+
+    response = _batch(client, auth, test_id, body)
+
+    assert response.status_code == 400
+    with app.app_context():
+        test = models.db.session.get(models.Test, test_id)
+        assert [q.id for q in test.questions] == question_ids
+        assert test.version == version
+
+
+@pytest.mark.parametrize('field', ['content', 'correct_answer'])
+def test_batch_rejects_clearing_required_fields(app, client, auth, exam, field):
+    test_id, question_ids, _ = exam
+
+    response = _batch(client, auth, test_id, {'updates': [{'id': question_ids[0], field: None}]})
+
+    assert response.status_code == 400
+    with app.app_context():
+        assert getattr(models.db.session.get(models.Question, question_ids[0]), field)
+
+
+def test_batch_client_id_must_not_shadow_existing_question(client, auth, exam):
+    test_id, question_ids, _ = exam
+
+    response = _batch(client, auth, test_id, {
+        'creates': [{'client_id': question_ids[0], 'content': 'Вопрос', 'correct_answer': 'a'}],
+        'order': [question_ids[0]],
+    })
+
+    assert response.status_code == 400
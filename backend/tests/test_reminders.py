@@ -0,0 +1,34 @@
+# backend/tests/test_reminders.py
+
+from datetime import timedelta
+
+from app import models
+from app.reminders import send_due_reminders
+
+
+def test_reminders_are_sent_once_per_window(app):
+    with app.app_context():
+        task = models.Task.query.filter_by(title='Задание 1').one() # student0 и student1 лично, student0 еще и группой
+        # Время запуска с микросекундами: DATETIME без дробной части в MySQL их отбросит
+        now = task.due_date - timedelta(hours=20, microseconds=654321)
+
+        assert send_due_reminders(now=now) == {'1h': 0, '24h': 2, '72h': 0}
+        assert send_due_reminders(now=now + timedelta(minutes=5)) == {'1h': 0, '24h': 0, '72h': 0}
+
+        logs = {log.id: log.user_id for log in models.ReminderLog.query.filter_by(task_id=task.id)}
+        notifications = models.Notification.query.filter_by(type='task').all()
+        assert sorted(n.user_id for n in notifications) == sorted(logs.values())
+        assert {n.ref_id: n.user_id for n in notifications} == logs
+        assert all(n.link == f'/tasks/{task.id}' for n in notifications)
+
+
+def test_moved_due_date_is_reminded_again(app):
+    with app.app_context():
+        task = models.Task.query.filter_by(title='Задание 1').one()
+        now = task.due_date - timedelta(hours=20)
+        assert send_due_reminders(now=now)['24h'] == 2
+
+        task.due_date += timedelta(hours=2)
+        models.db.session.commit()
+
+        assert send_due_reminders(now=now)['24h'] == 2
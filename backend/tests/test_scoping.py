@@ -0,0 +1,100 @@
+# backend/tests/test_scoping.py
+
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def ids(app):
+    with app.app_context():
+        return {
+            'group': models.Group.query.one().id,
+            'group_test': models.Test.query.filter_by(title='Тест').one().id,
+            'open_test': models.Test.query.filter_by(title='Open test').one().id,
+            'group_task': models.Task.query.filter_by(title='Задание 1').one().id,
+            'student2': models.User.query.filter_by(username='student2').one().id,
+        }
+
+
+def _titles(client, auth, path, username):
+    response = client.get(path, headers=auth(username))
+    assert response.status_code == 200
+    return sorted(item['title'] for item in response.get_json())
+
+
+def test_students_see_tests_of_their_groups_and_open_tests(client, auth, ids):
+    assert _titles(client, auth, '/api/tests', 'student0') == ['Open test', 'Тест']
+    assert _titles(client, auth, '/api/tests', 'student2') == ['Open test']
+    assert client.get(f"/api/tests/{ids['group_test']}", headers=auth('student2')).status_code == 403
+    assert client.post(f"/api/tests/{ids['group_test']}/attempts", headers=auth('student2')).status_code == 403
+
+
+def test_students_see_tasks_assigned_to_them_or_their_groups(client, auth, ids):
+    assert _titles(client, auth, '/api/tasks', 'student0') == ['Задание 1']
+    assert _titles(client, auth, '/api/tasks', 'student1') == ['Задание 1'] # Назначено лично
+    assert _titles(client, auth, '/api/tasks', 'student2') == []
+    assert client.get(f"/api/tasks/{ids['group_task']}", headers=auth('student2')).status_code == 403
+
+
+def test_students_list_only_their_groups(client, auth, ids):
+    assert [g['id'] for g in client.get('/api/groups', headers=auth('student0')).get_json()] == [ids['group']]
+    assert client.get('/api/groups', headers=auth('student2')).get_json() == []
+    assert client.get(f"/api/groups/{ids['group']}", headers=auth('student2')).status_code == 403
+
+
+def test_new_member_receives_group_content_in_sync(client, auth, ids):
+    before = client.get('/api/sync', headers=auth('student2')).get_json()
+
+    added = client.post(f"/api/groups/{ids['group']}/members", json={'user_ids': [ids['student2'], 999999]},
+                        headers=auth('admin'))
+    delta = client.get('/api/sync', query_string={'since': before['watermark']}, headers=auth('student2')).get_json()
+
+    assert added.get_json()['added'] == 1 # Несуществующий пользователь пропущен
+    assert delta['full'] is False
+    assert [t['title'] for t in delta['changes']['tests']] == ['Тест']
+    assert [t['title'] for t in delta['changes']['tasks']] == ['Задание 1']
+    assert _titles(client, auth, '/api/tests', 'student2') == ['Open test', 'Тест']
+
+
+def test_removed_member_gets_full_snapshot_without_group_content(client, auth, ids):
+    client.post(f"/api/groups/{ids['group']}/members", json={'user_ids': [ids['student2']]}, headers=auth('admin'))
+    before = client.get('/api/sync', headers=auth('student2')).get_json()
+    assert 'Тест' in [t['title'] for t in before['changes']['tests']]
+
+    removed = client.delete(f"/api/groups/{ids['group']}/members", json={'user_ids': [ids['student2']]},
+                            headers=auth('admin'))
+    delta = client.get('/api/sync', query_string={'since': before['watermark']}, headers=auth('student2')).get_json()
+
+    assert removed.get_json()['removed'] == 1
+    # Тест не удален - tombstone нет; клиент заменяет кэш полным снимком
+    assert delta['full'] is True
+    assert [t['title'] for t in delta['changes']['tests']] == ['Open test']
+    assert delta['changes']['tasks'] == []
+
+
+def test_restricting_an_open_test_forces_full_sync_for_students(client, auth, ids):
+    before = client.get('/api/sync', headers=auth('student2')).get_json()
+
+    updated = client.put(f"/api/tests/{ids['open_test']}", json={'group_ids': [ids['group']]}, headers=auth('admin'))
+    delta = client.get('/api/sync', query_string={'since': before['watermark']}, headers=auth('student2')).get_json()
+
+    assert updated.status_code == 200
+    assert delta['full'] is True and delta['changes']['tests'] == []
+
+
+def test_role_change_forces_full_sync(client, auth, ids):
+    before = client.get('/api/sync', headers=auth('student2')).get_json()
+
+    assert client.put(f"/api/users/{ids['student2']}/role", json={'role': 'teacher'},
+                      headers=auth('admin')).status_code == 200
+    delta = client.get('/api/sync', query_string={'since': before['watermark']}, headers=auth('student2')).get_json()
+
+    assert delta['full'] is True
+
+
+def test_group_with_tests_cannot_be_deleted(client, auth, ids):
+    response = client.delete(f"/api/groups/{ids['group']}", headers=auth('admin'))
+
+    assert response.status_code == 409
+    assert _titles(client, auth, '/api/tests', 'student2') == ['Open test'] # Тест группы не открылся всем
@@ -0,0 +1,78 @@
+# backend/tests/test_sync.py
+
+from datetime import datetime, timedelta, timezone
+import shutil
+
+from app import create_app, db, models
+from app.auth import issue_tokens
+from conftest import TestConfig, seed
+
+
+def _book_ids(app):
+    with app.app_context():
+        return {book.title: book.id for book in models.Book.query.all()}
+
+
+def test_sync_returns_changes_and_tombstones_after_watermark(app, client, auth):
+    books = _book_ids(app)
+    snapshot = client.get('/api/sync', headers=auth('admin')).get_json()
+    assert snapshot['full'] is True
+    assert {book['id'] for book in snapshot['changes']['books']} == set(books.values())
+
+    kept, removed = books['Война и мир'], books['Plain "ASCII"\nbook']
+    assert client.put(f'/api/books/{kept}', json={'title': 'Анна Каренина'}, headers=auth('admin')).status_code == 200
+    assert client.delete(f'/api/books/{removed}', headers=auth('admin')).status_code == 200
+
+    delta = client.get('/api/sync', query_string={'since': snapshot['watermark']}, headers=auth('admin')).get_json()
+
+    assert delta['full'] is False
+    assert [book['title'] for book in delta['changes']['books']] == ['Анна Каренина']
+    assert delta['deleted']['books'] == [removed]
+    assert delta['changes']['news'] == [] and delta['deleted']['news'] == []
+
+
+def test_sync_accepts_watermark_with_utc_offset(app, client, auth):
+    books = _book_ids(app)
+    client.put(f"/api/books/{books['Война и мир']}", json={'title': 'Анна Каренина'}, headers=auth('admin'))
+    moscow = timezone(timedelta(hours=3))
+
+    def changed_books(since):
+        response = client.get('/api/sync', query_string={'since': since.isoformat()}, headers=auth('admin'))
+        assert response.status_code == 200
+        assert response.get_json()['full'] is False
+        return [book['title'] for book in response.get_json()['changes']['books']]
+
+    now = datetime.now(timezone.utc)
+    assert changed_books((now - timedelta(minutes=1)).astimezone(moscow)) == ['Анна Каренина']
+    assert changed_books((now + timedelta(minutes=1)).astimezone(moscow)) == []
+
+
+def test_sync_reads_from_primary_even_when_replica_lags(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+
+    class ReplicaConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{primary}'
+        SQLALCHEMY_BINDS = {'replica_0': f'sqlite:///{replica}'}
+
+    app = create_app(ReplicaConfig)
+    with app.app_context():
+        db.create_all(bind_key=None)
+        seed(db)
+        admin = models.User.query.filter_by(username='admin').one()
+        headers = {'Authorization': f"Bearer {issue_tokens(admin, with_refresh=False)['access_token']}"}
+        since = datetime.utcnow().isoformat()
+        db.engine.dispose()
+        shutil.copy(primary, replica) # Реплика отстает: следующая запись до нее не дошла
+        db.session.add(models.News(title='Свежая новость', content='Текст', created_by_id=admin.id))
+        db.session.commit()
+
+    client = app.test_client()
+    replica_news = [item['title'] for item in client.get('/api/news', headers=headers).get_json()]
+    assert replica_news and 'Свежая новость' not in replica_news # Обычный GET читает из реплики
+    delta = client.get('/api/sync', query_string={'since': since}, headers=headers).get_json()
+
+    assert [item['title'] for item in delta['changes']['news']] == ['Свежая новость']
+    with app.app_context():
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
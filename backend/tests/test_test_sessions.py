@@ -0,0 +1,25 @@
+# backend/tests/test_test_sessions.py
+
+from app import db, models
+
+
+def _open_test_id(app):
+    with app.app_context():
+        return models.Test.query.filter_by(title='Open test').one().id
+
+
+def test_submit_attempt_then_delete_test(app, client, auth):
+    test_id = _open_test_id(app)
+    started = client.post(f'/api/tests/{test_id}/attempts', headers=auth('student2'))
+    assert started.status_code == 200
+    submitted = client.post(f'/api/tests/{test_id}/submit', headers=auth('student2'),
+                            json={'attempt_id': started.get_json()['attempt_id'], 'answers': {}})
+    assert submitted.status_code == 201
+
+    deleted = client.delete(f'/api/tests/{test_id}', headers=auth('преподаватель'))
+
+    assert deleted.status_code == 200
+    with app.app_context():
+        assert db.session.get(models.Test, test_id) is None
+        assert models.TestAttempt.query.filter_by(test_id=test_id).count() == 0
+        assert models.TestUser.query.filter_by(test_id=test_id).count() == 0
@@ -0,0 +1,8 @@
+# backend/wsgi.py
+# Точка входа для продакшн-сервера:
+#   gunicorn -c gunicorn.conf.py wsgi:app
+# (на Windows: waitress-serve --listen=0.0.0.0:5000 --threads=4 wsgi:app)
+
+from app import create_app
+
+app = create_app()
@@ -2,6 +2,7 @@
 import React, { createContext, useContext, useState, useEffect, ReactNode, useCallback } from 'react'; // Добавлен useCallback
 import { useRouter } from 'next/router';
 import apiClient from '../services/apiClient';
+import { clearSyncState } from '../services/syncStore';
 import { User, AuthResponse } from '../types';
 
 interface AuthContextType {
@@ -35,6 +36,7 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
         } catch (error) {
           console.warn("Failed to fetch current user on initial load, token might be invalid.", error);
           localStorage.removeItem('authToken');
+          localStorage.removeItem('refreshToken');
           setToken(null);
           setUser(null);
           delete apiClient.defaults.headers.common['Authorization'];
@@ -80,8 +82,9 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   const login = async (credentials: { username?: string; password?: string }) => {
     try {
       const response = await apiClient.post<AuthResponse>('/login', credentials);
-      const { access_token, ...userData } = response.data;
+      const { access_token, refresh_token, ...userData } = response.data;
       localStorage.setItem('authToken', access_token);
+      localStorage.setItem('refreshToken', refresh_token);
       setToken(access_token); // Это вызовет обновление token и потенциальный перезапуск fetchCurrentUser, если он используется где-то еще в зависимостях
       setUser(userData as User);
       // apiClient.defaults.headers.common['Authorization'] = `Bearer ${access_token}`; // Интерцептор apiClient сделает это
@@ -116,7 +119,14 @@ export const AuthProvider = ({ children }: { children: ReactNode }) => {
   };
 
   const logout = () => {
+    // Отзываем токены на сервере (ошибку игнорируем - локальный выход важнее)
+    const currentToken = localStorage.getItem('authToken');
+    if (currentToken) {
+      apiClient.post('/logout', null, { headers: { Authorization: `Bearer ${currentToken}` } }).catch(() => {});
+    }
     localStorage.removeItem('authToken');
+    localStorage.removeItem('refreshToken');
+    clearSyncState(); // Кэш списков принадлежит вышедшему пользователю
     setToken(null);
     setUser(null);
     delete apiClient.defaults.headers.common['Authorization'];
@@ -3,6 +3,7 @@ import React, { useEffect, useState } from 'react';
 import { useRouter } from 'next/router';
 import Link from 'next/link';
 import apiClient from '../../services/apiClient';
+import { bookFileHref } from '../../services/bookFiles';
 import { Book } from '../../types';
 import { useAuth } from '../../contexts/AuthContext';
 
@@ -87,10 +88,10 @@ const BookDetailPage = () => {
           {/* Здесь можно добавить больше деталей о книге, если они есть в модели, например, описание */}
           {/* <p className="text-gray-700 mb-6">{book.description || "No description available."}</p> */}
 
-          {book.file_url && (
+          {bookFileHref(book) && (
             <div className="my-6">
               <a
-                href={book.file_url} // Предполагается, что это прямая ссылка
+                href={bookFileHref(book)} // Загруженный файл или внешняя ссылка file_url
                 target="_blank"
                 rel="noopener noreferrer"
                 className="inline-flex items-center px-6 py-3 border border-transparent text-base font-medium rounded-md shadow-sm text-white bg-green-600 hover:bg-green-700 focus:outline-none focus:ring-2 focus:ring-offset-2 focus:ring-green-500 transition-colors"
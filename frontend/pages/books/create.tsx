@@ -3,6 +3,7 @@ import React, { useState } from 'react';
 import { useForm, SubmitHandler } from 'react-hook-form';
 import { useRouter } from 'next/router';
 import apiClient from '../../services/apiClient';
+import { uploadBookFile } from '../../services/bookFiles';
 import { BookPayload } from '../../types';
 import ProtectedRoute from '../../components/ProtectedRoute';
 
@@ -10,10 +11,17 @@ const CreateBookPageContent = () => {
   const { register, handleSubmit, formState: { errors, isSubmitting } } = useForm<BookPayload>();
   const router = useRouter();
   const [submitError, setSubmitError] = useState<string | null>(null);
+  const [file, setFile] = useState<File | null>(null);
+  const [uploadProgress, setUploadProgress] = useState<number | null>(null);
 
   const onSubmit: SubmitHandler<BookPayload> = async (data) => {
     setSubmitError(null);
     try {
+      if (file) {
+        // Сначала файл, затем книга со ссылкой на него (file_id)
+        const stored = await uploadBookFile(file, setUploadProgress);
+        data = { ...data, file_id: stored.id };
+      }
       await apiClient.post('/books', data);
       router.push('/books'); // Перенаправить на список книг после успеха
     } catch (error: any) {
@@ -56,7 +64,18 @@ const CreateBookPageContent = () => {
             placeholder="Relative path or full URL"
             className="mt-1 block w-full px-4 py-2 border border-gray-300 rounded-md shadow-sm focus:outline-none focus:ring-indigo-500 focus:border-indigo-500 sm:text-sm"
           />
-          {/* Для загрузки файлов потребуется <input type="file" /> и другая логика на бэкенде */}
+        </div>
+
+        <div>
+          <label htmlFor="file" className="block text-sm font-medium text-gray-700">Or upload a file (Optional)</label>
+          <input
+            id="file"
+            type="file"
+            accept=".pdf,.epub,.djvu,.doc,.docx"
+            onChange={(e) => setFile(e.target.files?.[0] || null)}
+            className="mt-1 block w-full text-sm text-gray-700"
+          />
+          {uploadProgress !== null && <p className="text-xs text-gray-500 mt-1">Uploading: {uploadProgress}%</p>}
         </div>
 
         {submitError && <p className="text-red-500 text-sm text-center bg-red-50 p-3 rounded-md">{submitError}</p>}
@@ -3,6 +3,7 @@ import React, { useEffect, useState } from 'react';
 import { useForm, SubmitHandler, Controller } from 'react-hook-form';
 import { useRouter } from 'next/router';
 import apiClient from '../../../services/apiClient';
+import { uploadBookFile } from '../../../services/bookFiles';
 import { Book, BookPayload } from '../../../types';
 import ProtectedRoute from '../../../components/ProtectedRoute';
 import Link from 'next/link';
@@ -15,6 +16,9 @@ const EditBookPageContent = () => {
   const [loading, setLoading] = useState(true);
   const [submitError, setSubmitError] = useState<string | null>(null);
   const [pageError, setPageError] = useState<string | null>(null);
+  const [file, setFile] = useState<File | null>(null);
+  const [removeFile, setRemoveFile] = useState(false);
+  const [uploadProgress, setUploadProgress] = useState<number | null>(null);
 
 
   useEffect(() => {
@@ -51,6 +55,12 @@ const EditBookPageContent = () => {
       return;
     }
     try {
+      if (file) {
+        const stored = await uploadBookFile(file, setUploadProgress);
+        data = { ...data, file_id: stored.id }; // Старый файл освободит сервер
+      } else if (removeFile) {
+        data = { ...data, file_id: null };
+      }
       await apiClient.put(`/books/${id}`, data);
       router.push(`/books/${id}`); // Перенаправить на страницу деталей книги после успеха
     } catch (error: any) {
@@ -139,6 +149,26 @@ const EditBookPageContent = () => {
           />
         </div>
 
+        <div>
+          <label htmlFor="file" className="block text-sm font-medium text-gray-700">
+            {book?.file ? `Uploaded file: ${book.file.original_name || book.file.sha256.slice(0, 12)} - replace (Optional)` : 'Upload a file (Optional)'}
+          </label>
+          <input
+            id="file"
+            type="file"
+            accept=".pdf,.epub,.djvu,.doc,.docx"
+            onChange={(e) => setFile(e.target.files?.[0] || null)}
+            className="mt-1 block w-full text-sm text-gray-700"
+          />
+          {book?.file && !file && (
+            <label className="mt-2 inline-flex items-center text-sm text-gray-600">
+              <input type="checkbox" checked={removeFile} onChange={(e) => setRemoveFile(e.target.checked)} className="mr-2" />
+              Remove uploaded file
+            </label>
+          )}
+          {uploadProgress !== null && <p className="text-xs text-gray-500 mt-1">Uploading: {uploadProgress}%</p>}
+        </div>
+
         {submitError && <p className="text-red-500 text-sm text-center bg-red-50 p-3 rounded-md">{submitError}</p>}
 
         <div className="flex items-center justify-end space-x-4 pt-4">
@@ -2,6 +2,8 @@
 import React, { useEffect, useState } from 'react';
 import Link from 'next/link';
 import apiClient from '../../services/apiClient';
+import { getSyncedCollection } from '../../services/syncStore';
+import { bookFileHref } from '../../services/bookFiles';
 import { Book } from '../../types';
 import { useAuth } from '../../contexts/AuthContext'; // Для проверки ролей
 
@@ -15,9 +17,9 @@ const BooksPage = () => {
     setLoading(true);
     setError(null);
     try {
-      // Бэкенд позволяет неавторизованным пользователям просматривать книги
-      const response = await apiClient.get<Book[]>('/books');
-      setBooks(response.data);
+      // Бэкенд позволяет неавторизованным пользователям просматривать книги.
+      // Авторизованные получают список из локального кэша, обновленного через /sync
+      setBooks(await getSyncedCollection<Book>('books', user, '/books'));
     } catch (err: any) {
       setError(err.response?.data?.msg || 'Failed to fetch books.');
       console.error(err);
@@ -27,8 +29,10 @@ const BooksPage = () => {
   };
 
   useEffect(() => {
-    fetchBooks();
-  }, []);
+    if (!authLoading) {
+      fetchBooks();
+    }
+  }, [authLoading, user]);
 
   const handleDeleteBook = async (bookId: number) => {
     if (!window.confirm("Are you sure you want to delete this book?")) return;
@@ -74,9 +78,9 @@ const BooksPage = () => {
                     className="block w-full text-center bg-gray-100 hover:bg-gray-200 text-indigo-700 font-medium py-2 px-4 rounded-md transition duration-150 ease-in-out">
                     View Details
                   </Link>
-                  {book.file_url && (
+                  {bookFileHref(book) && (
                     <a
-                        href={book.file_url} // Предполагаем, что file_url - прямая ссылка или бэкенд ее отдает
+                        href={bookFileHref(book)} // Загруженный файл или внешняя ссылка file_url
                         target="_blank"
                         rel="noopener noreferrer"
                         className="block w-full text-center bg-green-500 hover:bg-green-600 text-white font-medium py-2 px-4 rounded-md transition duration-150 ease-in-out"
@@ -3,6 +3,7 @@ import React, { useState, FormEvent, useRef, useEffect } from 'react';
 import ProtectedRoute from '../components/ProtectedRoute';
 import { ChatMessage } from '../../types'; 
 import apiClient from '../services/apiClient'; 
+import { waitForJob } from '../services/jobs';
 import { useAuth } from '../contexts/AuthContext'; // Для получения информации о пользователе
 
 const ChatbotPageContent = () => {
@@ -49,9 +50,13 @@ const ChatbotPageContent = () => {
     setIsLoading(true);
 
     try {
-      // Реальный запрос к API бэкенда
-      const response = await apiClient.post<{ reply: string }>('/chatbot/ask', { message: userMessageText });
-      const botReplyText = response.data.reply;
+      // Ответ генерирует воркер бэкенда; запрос возвращает id задачи, результат получаем опросом
+      const response = await apiClient.post<{ job_id: number }>('/chatbot/ask', { message: userMessageText }, { params: { async: 1 } });
+      const job = await waitForJob(response.data.job_id);
+      if (job.status !== 'succeeded') {
+        throw new Error(job.last_error || 'Chatbot job failed');
+      }
+      const botReplyText: string = job.result.reply;
 
       const botMessage: ChatMessage = {
         id: Date.now().toString() + '_bot', // Более уникальный ID
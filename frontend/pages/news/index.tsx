@@ -2,12 +2,13 @@
 import React, { useEffect, useState } from 'react';
 import Link from 'next/link';
 import apiClient from '../../services/apiClient';
-import { NewsItem } from '../../types';
+import { getSyncedCollection } from '../../services/syncStore';
+import { NewsSummary } from '../../types';
 import { useAuth } from '../../contexts/AuthContext';
 import { formatDistanceToNow } from 'date-fns'; // Для форматирования времени " назад"
 
 const NewsListPage = () => {
-  const [newsItems, setNewsItems] = useState<NewsItem[]>([]);
+  const [newsItems, setNewsItems] = useState<NewsSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const { user, isAuthenticated, isLoading: authLoading } = useAuth();
@@ -17,8 +18,9 @@ const NewsListPage = () => {
       setLoading(true);
       setError(null);
       try {
-        const response = await apiClient.get<NewsItem[]>('/news');
-        setNewsItems(response.data);
+        // Свежие новости первыми, как и в GET /news
+        setNewsItems(await getSyncedCollection<NewsSummary>('news', user, '/news',
+          (a, b) => b.created_at.localeCompare(a.created_at)));
       } catch (err: any) {
         setError(err.response?.data?.msg || 'Failed to fetch news.');
         console.error(err);
@@ -26,8 +28,10 @@ const NewsListPage = () => {
         setLoading(false);
       }
     };
-    fetchNews();
-  }, []);
+    if (!authLoading) {
+      fetchNews();
+    }
+  }, [authLoading, user]);
 
   const handleDeleteNews = async (newsId: number) => {
     if (!window.confirm("Are you sure you want to delete this news item?")) return;
@@ -82,7 +86,7 @@ const NewsListPage = () => {
                 </p>
               </header>
               <div className="prose prose-sm max-w-none text-gray-700 mb-4">
-                <p>{item.content.substring(0, 300)}{item.content.length > 300 ? '...' : ''}</p>
+                <p>{item.excerpt}</p>
               </div>
               <footer className="flex justify-between items-center">
                 <Link href={`/news/${item.id}`}
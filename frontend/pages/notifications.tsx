@@ -38,12 +38,15 @@ const NotificationsPageContent = () => {
     fetchNotifications();
   }, []);
 
-  const markAsRead = (id: number | string) => {
-     // TODO: Реализовать запрос к API для пометки как прочитанное
-     console.log(`Marking notification ${id} as read (API call needed)`);
+  const markAsRead = async (id: number | string) => {
      setNotifications(prev => 
          prev.map(n => n.id === id ? {...n, read: true} : n)
      );
+     try {
+       await apiClient.post('/notifications/read', { ids: [id] });
+     } catch (err) {
+       console.error(err); // Не критично: при следующей загрузке уведомление снова будет непрочитанным
+     }
   };
 
   if (isLoading) {
@@ -2,6 +2,7 @@
 import React, { useEffect, useState } from 'react';
 import Link from 'next/link';
 import apiClient from '../../services/apiClient';
+import { getSyncedCollection } from '../../services/syncStore';
 import { Task } from '../../types';
 import { useAuth } from '../../contexts/AuthContext';
 import ProtectedRoute from '../../components/ProtectedRoute';
@@ -16,8 +17,7 @@ const TasksPageContent = () => {
     setLoading(true);
     setError(null);
     try {
-      const response = await apiClient.get<Task[]>('/tasks');
-      setTasks(response.data);
+      setTasks(await getSyncedCollection<Task>('tasks', user, '/tasks'));
     } catch (err: any) {
       setError(err.response?.data?.msg || 'Failed to fetch tasks.');
       console.error(err);
@@ -1,10 +1,10 @@
 // frontend/pages/tests/edit/[id].tsx
-import React, { useEffect, useState, useCallback } from 'react';
+import React, { useEffect, useState, useCallback, useRef } from 'react';
 import { useRouter } from 'next/router';
 import Link from 'next/link';
 import { useForm, SubmitHandler, Controller } from 'react-hook-form';
-import apiClient from '../../../services/apiClient';
-import { Test, TestPayload, Question, QuestionPayload } from '../../../types';
+import apiClient, { batchRequests, unwrapBatchItem } from '../../../services/apiClient';
+import { Test, TestPayload, Question, QuestionPayload, QuestionBatchPayload, QuestionBatchResponse } from '../../../types';
 import ProtectedRoute from '../../../components/ProtectedRoute';
 import { useAuth } from '../../../contexts/AuthContext';
 
@@ -13,13 +13,26 @@ interface QuestionFormFields extends QuestionPayload {
   id?: number; // Для существующих вопросов
 }
 
+// Вопрос в редакторе: изменения копятся локально и сохраняются одним запросом (/questions:batch)
+interface DraftQuestion extends QuestionPayload {
+  id?: number; // Нет у еще не сохраненных вопросов
+  clientId: string; // Ключ для React и для порядка новых вопросов в пакете
+  dirty?: boolean; // Изменен, но не сохранен
+}
+
+const toDraft = (q: Question): DraftQuestion => ({ ...q, clientId: `q-${q.id}` });
+
 const EditTestPageContent = () => {
   const router = useRouter();
   const { id: testId } = router.query;
   const { user, isLoading: authLoading } = useAuth();
 
   const [testData, setTestData] = useState<Test | null>(null);
-  const [questions, setQuestions] = useState<Question[]>([]);
+  const [questions, setQuestions] = useState<DraftQuestion[]>([]);
+  const [deletedIds, setDeletedIds] = useState<number[]>([]);
+  const [orderChanged, setOrderChanged] = useState(false);
+  const [isSavingQuestions, setIsSavingQuestions] = useState(false);
+  const newQuestionCounter = useRef(0);
   const [loading, setLoading] = useState(true);
   const [pageError, setPageError] = useState<string | null>(null);
   
@@ -28,7 +41,7 @@ const EditTestPageContent = () => {
 
 
   const [isQuestionModalOpen, setIsQuestionModalOpen] = useState(false);
-  const [editingQuestion, setEditingQuestion] = useState<Question | null>(null);
+  const [editingQuestion, setEditingQuestion] = useState<DraftQuestion | null>(null);
 
   // Форма для редактирования информации о тесте
   const { 
@@ -62,18 +75,24 @@ const EditTestPageContent = () => {
       setLoading(true);
       setPageError(null);
       try {
-        const testRes = await apiClient.get<Test>(`/tests/${testId}`);
-        if (user.role.name !== 'admin' && testRes.data.created_by.id !== user.id) {
+        // Тест и вопросы - одним запросом к /batch вместо двух последовательных
+        const [testItem, questionsItem] = await batchRequests([
+          { path: `/tests/${testId}` },
+          { path: `/tests/${testId}/questions` },
+        ]);
+        const test = unwrapBatchItem<Test>(testItem);
+        if (user.role.name !== 'admin' && test.created_by.id !== user.id) {
           setPageError("You don't have permission to edit this test.");
           setLoading(false);
           return;
         }
-        setTestData(testRes.data);
-        setTestValue('title', testRes.data.title);
-        setTestValue('description', testRes.data.description || '');
+        setTestData(test);
+        setTestValue('title', test.title);
+        setTestValue('description', test.description || '');
 
-        const questionsRes = await apiClient.get<Question[]>(`/tests/${testId}/questions`);
-        setQuestions(questionsRes.data);
+        setQuestions(unwrapBatchItem<Question[]>(questionsItem).map(toDraft));
+        setDeletedIds([]);
+        setOrderChanged(false);
 
       } catch (err: any) {
         if (err.response?.status === 404) setPageError('Test not found.');
@@ -110,7 +129,7 @@ const EditTestPageContent = () => {
     }
   };
 
-  const openQuestionModal = (question: Question | null = null) => {
+  const openQuestionModal = (question: DraftQuestion | null = null) => {
     setQuestionModalError(null); // Сброс ошибки при открытии модалки
     setEditingQuestion(question);
     if (question) {
@@ -181,34 +200,67 @@ const EditTestPageContent = () => {
     }
 
 
-    try {
-      if (editingQuestion && editingQuestion.id) {
-        await apiClient.put(`/tests/${testId}/questions/${editingQuestion.id}`, payload);
-      } else {
-        await apiClient.post(`/tests/${testId}/questions`, payload);
-      }
-      setIsQuestionModalOpen(false);
-      fetchTestAndQuestions(); 
-      alert(`Question ${editingQuestion ? 'updated' : 'added'} successfully!`);
-    } catch (error: any) {
-      console.error("Error saving question:", error);
-      setQuestionModalError(error.response?.data?.msg || `Failed to ${editingQuestion ? 'update' : 'add'} question.`);
+    // Изменение остается локальным до нажатия "Save All Questions"
+    if (editingQuestion) {
+      setQuestions(prev => prev.map(q => q.clientId === editingQuestion.clientId ? { ...q, ...payload, dirty: true } : q));
+    } else {
+      newQuestionCounter.current += 1;
+      setQuestions(prev => [...prev, { ...payload, clientId: `new-${newQuestionCounter.current}`, dirty: true }]);
     }
+    setIsQuestionModalOpen(false);
   };
 
-  const deleteQuestion = async (questionId: number) => {
+  const deleteQuestion = (question: DraftQuestion) => {
     if (window.confirm("Are you sure you want to delete this question?")) {
-      try {
-        await apiClient.delete(`/tests/${testId}/questions/${questionId}`);
-        fetchTestAndQuestions();
-        alert("Question deleted successfully!");
-      } catch (error: any) {
-        console.error("Error deleting question:", error);
-        alert(error.response?.data?.msg || "Failed to delete question.");
+      setQuestions(prev => prev.filter(q => q.clientId !== question.clientId));
+      if (question.id) {
+        setDeletedIds(prev => [...prev, question.id as number]);
       }
     }
   };
 
+  const moveQuestion = (index: number, delta: number) => {
+    const target = index + delta;
+    if (target < 0 || target >= questions.length) return;
+    setQuestions(prev => {
+      const next = [...prev];
+      [next[index], next[target]] = [next[target], next[index]];
+      return next;
+    });
+    setOrderChanged(true);
+  };
+
+  const hasUnsavedChanges = deletedIds.length > 0 || orderChanged || questions.some(q => q.dirty);
+
+  // Все накопленные изменения вопросов - одним запросом в одной транзакции
+  const saveAllQuestions = async () => {
+    const toPayload = (q: DraftQuestion): QuestionPayload => ({
+      content: q.content,
+      options: q.options,
+      correct_answer: q.correct_answer,
+      question_type: q.question_type,
+    });
+    const batch: QuestionBatchPayload = {
+      creates: questions.filter(q => !q.id).map(q => ({ client_id: q.clientId, ...toPayload(q) })),
+      updates: questions.filter(q => q.id && q.dirty).map(q => ({ id: q.id as number, ...toPayload(q) })),
+      deletes: deletedIds,
+      order: questions.map(q => q.id ?? q.clientId),
+    };
+    setIsSavingQuestions(true);
+    try {
+      const res = await apiClient.post<QuestionBatchResponse>(`/tests/${testId}/questions:batch`, batch);
+      setQuestions(res.data.questions.map(toDraft));
+      setDeletedIds([]);
+      setOrderChanged(false);
+      alert("Questions saved successfully!");
+    } catch (error: any) {
+      console.error("Error saving questions:", error);
+      alert(error.response?.data?.msg || "Failed to save questions.");
+    } finally {
+      setIsSavingQuestions(false);
+    }
+  };
+
 
   if (authLoading || loading) {
     return <div className="text-center py-10 animate-pulse">Loading test editor...</div>;
@@ -265,26 +317,41 @@ const EditTestPageContent = () => {
       <div className="bg-white p-6 rounded-lg shadow-md">
         <div className="flex justify-between items-center mb-4">
           <h2 className="text-2xl font-semibold text-gray-700">Manage Questions</h2>
-          <button 
-            onClick={() => openQuestionModal(null)} 
-            className="px-4 py-2 bg-green-500 text-white rounded-md hover:bg-green-600"
-          >
-            Add New Question
-          </button>
+          <div className="space-x-2">
+            <button 
+              onClick={() => openQuestionModal(null)} 
+              className="px-4 py-2 bg-green-500 text-white rounded-md hover:bg-green-600"
+            >
+              Add New Question
+            </button>
+            <button 
+              onClick={saveAllQuestions} 
+              disabled={!hasUnsavedChanges || isSavingQuestions} 
+              className="px-4 py-2 bg-indigo-600 text-white rounded-md hover:bg-indigo-700 disabled:opacity-50"
+            >
+              {isSavingQuestions ? "Saving Questions..." : "Save All Questions"}
+            </button>
+          </div>
         </div>
+        {hasUnsavedChanges && (
+          <p className="text-sm text-yellow-700 bg-yellow-50 p-2 rounded mb-3">You have unsaved question changes.</p>
+        )}
         {questions.length === 0 ? (
           <p className="text-gray-500">No questions have been added to this test yet.</p>
         ) : (
           <ul className="space-y-3">
             {questions.map((q, index) => (
-              <li key={q.id} className="p-3 border rounded-md flex justify-between items-center hover:bg-gray-50 transition-colors">
+              <li key={q.clientId} className="p-3 border rounded-md flex justify-between items-center hover:bg-gray-50 transition-colors">
                 <div className="flex-grow">
                     <span className="font-medium text-gray-800">{index + 1}. {q.content.substring(0, 100)}{q.content.length > 100 && '...'}</span>
                     <span className="text-xs text-gray-500 ml-2">({q.question_type})</span>
+                    {q.dirty && <span className="text-xs text-yellow-600 ml-2">{q.id ? 'edited' : 'new'}</span>}
                 </div>
                 <div className="space-x-2 flex-shrink-0 ml-4">
+                  <button onClick={() => moveQuestion(index, -1)} disabled={index === 0} className="text-sm text-gray-600 hover:text-gray-800 disabled:opacity-30">↑</button>
+                  <button onClick={() => moveQuestion(index, 1)} disabled={index === questions.length - 1} className="text-sm text-gray-600 hover:text-gray-800 disabled:opacity-30">↓</button>
                   <button onClick={() => openQuestionModal(q)} className="text-sm text-blue-600 hover:text-blue-800 font-medium">Edit</button>
-                  <button onClick={() => deleteQuestion(q.id)} className="text-sm text-red-600 hover:text-red-800 font-medium">Delete</button>
+                  <button onClick={() => deleteQuestion(q)} className="text-sm text-red-600 hover:text-red-800 font-medium">Delete</button>
                 </div>
               </li>
             ))}
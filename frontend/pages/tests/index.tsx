@@ -2,13 +2,14 @@
 import React, { useEffect, useState } from 'react';
 import Link from 'next/link';
 import apiClient from '../../services/apiClient';
-import { Test } from '../../types';
+import { getSyncedCollection } from '../../services/syncStore';
+import { TestSummary } from '../../types';
 import { useAuth } from '../../contexts/AuthContext';
 import ProtectedRoute from '../../components/ProtectedRoute'; // Все должны быть авторизованы для доступа к тестам
 import { formatDistanceToNow } from 'date-fns';
 
 const TestsPageContent = () => {
-  const [tests, setTests] = useState<Test[]>([]);
+  const [tests, setTests] = useState<TestSummary[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const { user, isLoading: authLoading } = useAuth(); // user здесь нужен для определения роли
@@ -18,8 +19,7 @@ const TestsPageContent = () => {
       setLoading(true);
       setError(null);
       try {
-        const response = await apiClient.get<Test[]>('/tests');
-        setTests(response.data);
+        setTests(await getSyncedCollection<TestSummary>('tests', user, '/tests'));
       } catch (err: any) {
         setError(err.response?.data?.msg || 'Failed to fetch tests.');
         console.error(err);
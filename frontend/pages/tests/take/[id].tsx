@@ -1,27 +1,35 @@
 // pages/tests/take/[id].tsx
-import React, { useEffect, useState, useCallback } from 'react';
+import React, { useEffect, useState, useCallback, useRef } from 'react';
 import { useRouter } from 'next/router';
 import Link from 'next/link';
 import { useForm, Controller, SubmitHandler } from 'react-hook-form';
-import apiClient from '../../../services/apiClient';
-import { Test, Question, TestSubmissionPayload, TestUser } from '../../../types';
+import apiClient, { IDEMPOTENCY_HEADER, newIdempotencyKey } from '../../../services/apiClient';
+import { StudentQuestion, TestAttemptResponse, TestSubmissionPayload, TestUser } from '../../../types';
 import ProtectedRoute from '../../../components/ProtectedRoute';
 import { useAuth } from '../../../contexts/AuthContext';
 
 // Тип для значений формы ответов
 type TestAnswersForm = Record<string, string | string[]>; // { "question_id_str": "answer" }
 
+// Варианты в компактной форме: пары [ключ, текст] или просто тексты (тогда ответ - сам текст)
+const optionEntries = (options: StudentQuestion['options']): [string, string][] =>
+  (options || []).map(option => (Array.isArray(option) ? option : [option, option]));
+
 const TakeTestPageContent = () => {
   const router = useRouter();
   const { id: testId } = router.query;
   const { user, isLoading: authLoading } = useAuth();
 
-  const [test, setTest] = useState<Test | null>(null);
-  const [questions, setQuestions] = useState<Question[]>([]);
+  const [test, setTest] = useState<TestAttemptResponse['test'] | null>(null);
+  const [questions, setQuestions] = useState<StudentQuestion[]>([]);
+  const [attemptId, setAttemptId] = useState<number | null>(null);
   const [loading, setLoading] = useState(true);
   const [pageError, setPageError] = useState<string | null>(null);
   const [submissionError, setSubmissionError] = useState<string | null>(null);
   const [isSubmittingTest, setIsSubmittingTest] = useState(false);
+  // Ключ отправки: повтор тех же ответов (обрыв сети, повторное нажатие) идет с тем же ключом,
+  // и бэкенд возвращает уже сохраненный результат вместо второй сдачи
+  const submissionKey = useRef<{ body: string; key: string } | null>(null);
 
   const { control, handleSubmit, setValue, getValues, formState: { errors } } = useForm<TestAnswersForm>({});
 
@@ -31,12 +39,11 @@ const TakeTestPageContent = () => {
         setLoading(true);
         setPageError(null);
         try {
-          // Эндпоинт /api/tests/:id/questions для студента должен отдавать вопросы с опциями, но без correct_answer
-          const testInfoRes = await apiClient.get<Test>(`/tests/${testId}`);
-          setTest(testInfoRes.data);
-          // Загружаем вопросы отдельно, если они не приходят с информацией о тесте или нужны свежие
-          const questionsRes = await apiClient.get<Question[]>(`/tests/${testId}/questions`);
-          setQuestions(questionsRes.data); // Бэкенд должен отфильтровать correct_answer для студента
+          // Один запрос: начать/продолжить попытку - тест и вопросы без correct_answer в компактной форме
+          const attemptRes = await apiClient.post<TestAttemptResponse>(`/tests/${testId}/attempts?compact=1`);
+          setTest(attemptRes.data.test);
+          setQuestions(attemptRes.data.questions);
+          setAttemptId(attemptRes.data.attempt_id);
         } catch (err: any) {
           if (err.response?.status === 404) setPageError('Test not found.');
           else setPageError(err.response?.data?.msg || 'Failed to load test.');
@@ -52,9 +59,13 @@ const TakeTestPageContent = () => {
   }, [testId, user]);
 
   const onSubmitAnswers: SubmitHandler<TestAnswersForm> = async (data) => {
+    if (attemptId === null) {
+        setSubmissionError("The test is not loaded yet.");
+        return;
+    }
     setIsSubmittingTest(true);
     setSubmissionError(null);
-    const payload: TestSubmissionPayload = { answers: {} };
+    const payload: TestSubmissionPayload = { answers: {}, attempt_id: attemptId };
 
     questions.forEach(q => {
         const answer = data[`q_${q.id}`];
@@ -69,8 +80,24 @@ const TakeTestPageContent = () => {
         return;
     }
     
+    const body = JSON.stringify(payload);
+    if (submissionKey.current?.body !== body) {
+      submissionKey.current = { body, key: newIdempotencyKey() }; // Ответы изменились - это новая отправка
+    }
+    const headers = { [IDEMPOTENCY_HEADER]: submissionKey.current.key };
+
     try {
-      const result = await apiClient.post<TestUser>(`/tests/${testId}/submit`, payload);
+      let result;
+      for (let attempt = 0; ; attempt++) {
+        try {
+          result = await apiClient.post<TestUser>(`/tests/${testId}/submit`, payload, { headers });
+          break;
+        } catch (error: any) {
+          // Ответа нет (сеть) - ответы могли дойти: повторяем с тем же ключом, дубликата не будет
+          if (error.response || attempt >= 2) throw error;
+          await new Promise((resolve) => setTimeout(resolve, 1000 * (attempt + 1)));
+        }
+      }
       alert(`Test submitted! Your score: ${result.data.score}/${result.data.max_score}`);
       // TODO: Редирект на страницу результатов или профиль
       router.push(`/profile?testCompleted=${testId}`); // Пример
@@ -104,7 +131,7 @@ const TakeTestPageContent = () => {
                 rules={{ required: 'Please select an answer' }}
                 render={({ field }) => (
                   <div className="space-y-2">
-                    {Object.entries(question.options!).map(([key, value]) => (
+                    {optionEntries(question.options).map(([key, value]) => (
                       <label key={key} className="flex items-center p-3 border rounded-md hover:bg-gray-50 cursor-pointer">
                         <input type="radio" {...field} value={key} className="form-radio h-5 w-5 text-indigo-600" />
                         <span className="ml-3 text-gray-700">{value}</span>
@@ -117,7 +144,7 @@ const TakeTestPageContent = () => {
 
             {question.question_type === 'multiple_choice' && question.options && (
                  <div>
-                    {Object.entries(question.options).map(([key, optionValue]) => (
+                    {optionEntries(question.options).map(([key, optionValue]) => (
                         <Controller
                             key={key}
                             name={`q_${question.id}`} // Для RHF массив будет формироваться автоматически
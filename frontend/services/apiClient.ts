@@ -1,5 +1,6 @@
 // services/apiClient.ts
 import axios from 'axios';
+import { BatchRequestItem, BatchResponseItem } from '../types';
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://127.0.0.1:5000/api";
 
@@ -10,15 +11,24 @@ const apiClient = axios.create({
   },
 });
 
+// Метка, выдаваемая бэкендом после записи (см. backend/app/db_routing.py)
+const READ_PRIMARY_HEADER = 'X-Read-Primary-Until';
+const READ_PRIMARY_KEY = 'readPrimaryUntil';
+
 // Interceptor для добавления JWT токена в заголовки запросов
 apiClient.interceptors.request.use(
   (config) => {
     // Убедимся, что код выполняется только на клиенте
     if (typeof window !== 'undefined') {
       const token = localStorage.getItem('authToken');
-      if (token) {
+      if (token && !config.headers['Authorization']) { // /refresh передает свой токен явно
         config.headers['Authorization'] = `Bearer ${token}`;
       }
+      // Read-your-writes: сразу после изменения данных читаем из основной БД, а не из реплики
+      const primaryUntil = sessionStorage.getItem(READ_PRIMARY_KEY);
+      if (primaryUntil && Number(primaryUntil) > Date.now() / 1000) {
+        config.headers[READ_PRIMARY_HEADER] = primaryUntil;
+      }
     }
     return config;
   },
@@ -27,4 +37,85 @@ apiClient.interceptors.request.use(
   }
 );
 
+// Interceptor для обновления истекшего access токена по refresh токену (без повторного логина)
+let refreshPromise: Promise<string> | null = null;
+
+apiClient.interceptors.response.use(
+  (response) => {
+    const primaryUntil = response.headers[READ_PRIMARY_HEADER.toLowerCase()];
+    if (primaryUntil && typeof window !== 'undefined') {
+      sessionStorage.setItem(READ_PRIMARY_KEY, primaryUntil);
+    }
+    return response;
+  },
+  async (error) => {
+    const originalRequest = error.config;
+    if (
+      typeof window === 'undefined' ||
+      error.response?.status !== 401 ||
+      !originalRequest ||
+      originalRequest._retry ||
+      originalRequest.url === '/refresh'
+    ) {
+      return Promise.reject(error);
+    }
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (!refreshToken) {
+      return Promise.reject(error);
+    }
+    originalRequest._retry = true;
+    try {
+      // Один запрос на обновление для всех параллельно упавших запросов
+      if (!refreshPromise) {
+        refreshPromise = apiClient
+          .post<{ access_token: string }>('/refresh', null, {
+            headers: { Authorization: `Bearer ${refreshToken}` },
+            _retry: true,
+          } as any)
+          .then((res) => {
+            localStorage.setItem('authToken', res.data.access_token);
+            return res.data.access_token;
+          })
+          .finally(() => {
+            refreshPromise = null;
+          });
+      }
+      const newToken = await refreshPromise;
+      originalRequest.headers['Authorization'] = `Bearer ${newToken}`;
+      return apiClient(originalRequest);
+    } catch (refreshError) {
+      localStorage.removeItem('authToken');
+      localStorage.removeItem('refreshToken');
+      return Promise.reject(error);
+    }
+  }
+);
+
+// Ключ для заголовка Idempotency-Key (см. backend/app/idempotency.py): повтор запроса с тем же ключом
+// получает сохраненный ответ первого выполнения, а не создает второй объект
+export const IDEMPOTENCY_HEADER = 'Idempotency-Key';
+
+export function newIdempotencyKey(): string {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  // crypto.randomUUID есть только в защищенном контексте (https, localhost)
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+// Несколько запросов одним HTTP-запросом (см. backend/app/batch.py): подзапросы выполняются
+// по порядку, у каждого свой статус
+export async function batchRequests(requests: BatchRequestItem[]): Promise<BatchResponseItem[]> {
+  const res = await apiClient.post<{ responses: BatchResponseItem[] }>('/batch', { requests });
+  return res.data.responses;
+}
+
+// Тело ответа подзапроса; при ошибке - исключение в форме ошибки axios (error.response.status / .data)
+export function unwrapBatchItem<T>(item: BatchResponseItem<T>): T {
+  if (item.status >= 400) {
+    throw { response: { status: item.status, data: item.body } };
+  }
+  return item.body;
+}
+
 export default apiClient;
\ No newline at end of file
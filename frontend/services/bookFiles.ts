@@ -0,0 +1,24 @@
+// services/bookFiles.ts
+// Загрузка и скачивание файлов книг (backend/app/storage.py).
+import apiClient from './apiClient';
+import { Book, StoredFile } from '../types';
+
+// Файл отправляется сырым телом запроса: сервер пишет его на диск по мере получения, без разбора multipart
+export const uploadBookFile = async (file: File, onProgress?: (percent: number) => void): Promise<StoredFile> => {
+  const response = await apiClient.post<StoredFile>('/books/files', file, {
+    params: { filename: file.name },
+    headers: { 'Content-Type': file.type || 'application/octet-stream' },
+    onUploadProgress: (event) => {
+      if (onProgress && event.total) onProgress(Math.round((event.loaded / event.total) * 100));
+    },
+  });
+  return response.data;
+};
+
+// Ссылка на файл книги: загруженный файл (с ?v=<sha256> - кэшируется браузером навсегда) или внешний file_url
+export const bookFileHref = (book: Book): string | undefined => {
+  if (book.file) {
+    return `${apiClient.defaults.baseURL}/books/${book.id}/file?v=${book.file.sha256}`;
+  }
+  return book.file_url || undefined;
+};
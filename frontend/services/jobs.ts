@@ -0,0 +1,20 @@
+// services/jobs.ts
+// Ожидание результата фоновой задачи бэкенда (backend/app/jobs.py) опросом GET /jobs/{id}.
+import apiClient from './apiClient';
+import { Job } from '../types';
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms));
+
+export const waitForJob = async (jobId: number, timeoutMs = 60000): Promise<Job> => {
+  const deadline = Date.now() + timeoutMs;
+  let delay = 500;
+  while (Date.now() < deadline) {
+    const response = await apiClient.get<Job>(`/jobs/${jobId}`);
+    if (response.data.status === 'succeeded' || response.data.status === 'failed') {
+      return response.data;
+    }
+    await sleep(delay);
+    delay = Math.min(delay * 1.5, 3000); // Реже опрашиваем долгие задачи
+  }
+  throw new Error('Timed out waiting for the background job.');
+};
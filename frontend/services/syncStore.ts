@@ -0,0 +1,93 @@
+// services/syncStore.ts
+// Локальный кэш коллекций (книги, новости, задания, тесты) с инкрементальным обновлением:
+// вместо полной загрузки списка при каждом переходе запрашиваются только изменения (GET /sync?since=).
+import apiClient from './apiClient';
+import { User } from '../types';
+
+export type SyncCollection = 'books' | 'news' | 'tasks' | 'tests' | 'questions';
+
+interface SyncResponse {
+  watermark: string;
+  full: boolean; // true - ответ содержит коллекции целиком, старый кэш нужно заменить
+  changes: Partial<Record<SyncCollection, { id: number }[]>>;
+  deleted: Partial<Record<SyncCollection, number[]>>;
+}
+
+interface SyncState {
+  scope: string; // Пользователь и роль: от них зависит видимая область данных
+  watermark: string | null;
+  collections: Partial<Record<SyncCollection, Record<number, any>>>;
+}
+
+const STORAGE_KEY = 'syncState';
+let syncPromise: Promise<SyncState> | null = null;
+
+const loadState = (scope: string): SyncState => {
+  try {
+    const raw = localStorage.getItem(STORAGE_KEY);
+    if (raw) {
+      const state: SyncState = JSON.parse(raw);
+      if (state.scope === scope) return state;
+    }
+  } catch (e) {
+    // Поврежденный кэш - начинаем заново
+  }
+  return { scope, watermark: null, collections: {} };
+};
+
+const applyResponse = (state: SyncState, data: SyncResponse) => {
+  if (data.full) {
+    state.collections = {};
+  }
+  (Object.keys(data.changes) as SyncCollection[]).forEach(name => {
+    const collection = state.collections[name] || (state.collections[name] = {});
+    data.changes[name]!.forEach(item => { collection[item.id] = item; });
+  });
+  (Object.keys(data.deleted) as SyncCollection[]).forEach(name => {
+    const collection = state.collections[name];
+    if (collection) {
+      data.deleted[name]!.forEach(id => { delete collection[id]; });
+    }
+  });
+  state.watermark = data.watermark;
+};
+
+// Один запрос /sync на все одновременно открытые списки
+export const syncCollections = (user: User): Promise<SyncState> => {
+  if (!syncPromise) {
+    syncPromise = (async () => {
+      const state = loadState(`${user.id}:${user.role.name}`);
+      const params = state.watermark ? { since: state.watermark } : {};
+      const response = await apiClient.get<SyncResponse>('/sync', { params });
+      applyResponse(state, response.data);
+      try {
+        localStorage.setItem(STORAGE_KEY, JSON.stringify(state));
+      } catch (e) {
+        // Переполнена квота localStorage - работаем без сохранения между сессиями
+      }
+      return state;
+    })().finally(() => {
+      syncPromise = null;
+    });
+  }
+  return syncPromise;
+};
+
+export const clearSyncState = () => {
+  localStorage.removeItem(STORAGE_KEY);
+};
+
+// Коллекция из локального кэша после синхронизации; без пользователя - обычный запрос списка
+export const getSyncedCollection = async <T extends { id: number }>(
+  name: SyncCollection,
+  user: User | null,
+  fallbackUrl: string,
+  compare: (a: T, b: T) => number = (a, b) => a.id - b.id,
+): Promise<T[]> => {
+  if (!user) {
+    const response = await apiClient.get<T[]>(fallbackUrl);
+    return response.data;
+  }
+  const state = await syncCollections(user);
+  return (Object.values(state.collections[name] || {}) as T[]).sort(compare);
+};
@@ -16,6 +16,15 @@ export interface User extends UserMinimal {
 
 export interface AuthResponse extends User {
   access_token: string;
+  refresh_token: string;
+}
+
+export interface StoredFile {
+  id: number;
+  sha256: string;
+  size: number;
+  content_type: string;
+  original_name?: string;
 }
 
 export interface Book {
@@ -23,6 +32,9 @@ export interface Book {
   title: string;
   author?: string;
   file_url?: string;
+  file_id?: number | null;
+  file?: StoredFile | null; // Загруженный файл, скачивание - GET /books/{id}/file
+  updated_at?: string; // Последнее изменение (используется /sync)
   // Если на бэке добавили created_by для Book
   // created_by?: UserMinimal; 
 }
@@ -31,6 +43,17 @@ export interface BookPayload {
   title: string;
   author?: string;
   file_url?: string;
+  file_id?: number | null; // id из POST /books/files; null - убрать файл у книги
+}
+
+// --- Учебные группы ---
+export interface Group {
+  id: number;
+  name: string;
+  description?: string;
+  created_by_id?: number | null;
+  created_at?: string;
+  members?: UserMinimal[]; // Только в GET /groups/{id}
 }
 
 // --- Задания (Tasks) ---
@@ -40,8 +63,10 @@ export interface Task {
   description?: string;
   created_at: string;
   due_date?: string;
+  updated_at?: string; // Последнее изменение (используется /sync)
   creator: UserMinimal;
   assigned_to_users?: UserMinimal[];
+  groups?: Group[]; // Группы, которым назначено задание
 }
 
 export interface TaskPayload {
@@ -49,6 +74,7 @@ export interface TaskPayload {
   description?: string;
   due_date?: string; // YYYY-MM-DDTHH:mm:ss or null
   // assigned_user_ids?: number[]; // Если будете назначать при создании/редактировании
+  group_ids?: number[]; // Назначить задание группам
 }
 
 // --- Новости (News) ---
@@ -65,6 +91,17 @@ export interface NewsItem {
   author: UserMinimal;
 }
 
+// Краткая форма новости для списка (GET /news): без полного текста
+export interface NewsSummary {
+  id: number;
+  title: string;
+  excerpt: string | null; // Начало текста (до 300 символов)
+  created_at: string;
+  updated_at?: string;
+  created_by_id: number;
+  author: UserMinimal;
+}
+
 export interface NewsItemPayload {
   title: string;
   content: string;
@@ -87,6 +124,7 @@ export interface Question {
   options?: Record<string, string> | null; // Пример: {"a": "Option A", "b": "Option B"}
   correct_answer: string | string[]; // "c" или ["a", "d"]. Для text_input это просто строка.
   question_type: 'single_choice' | 'multiple_choice' | 'text_input';
+  position?: number | null; // Порядок вопроса в тесте
 }
 
 export interface QuestionPayload { // Для создания/обновления вопроса
@@ -96,21 +134,40 @@ export interface QuestionPayload { // Для создания/обновлени
   question_type?: 'single_choice' | 'multiple_choice' | 'text_input';
 }
 
+// Пакетное сохранение вопросов редактором (POST /tests/<id>/questions:batch)
+export interface QuestionBatchPayload {
+  creates: (QuestionPayload & { client_id: string })[];
+  updates: (Partial<QuestionPayload> & { id: number })[];
+  deletes: number[];
+  order: (number | string)[]; // id существующих вопросов или client_id новых
+}
+
+export interface QuestionBatchResponse {
+  version: number;
+  questions: Question[];
+}
+
 export interface Test {
   id: number;
   title: string;
   description?: string;
   created_at: string; // ISO Date string
+  updated_at?: string; // Последнее изменение (используется /sync)
   // В вашей модели Test есть backref='creator' от User.tests_created.
   // В схеме TestSchema: creator = ma.Nested(UserSchemaMinimal, data_key="created_by")
   // Это значит, что в JSON будет поле "created_by".
   created_by: UserMinimal; // Используем created_by как ключ в JSON
   questions: Question[]; // Массив вопросов
+  groups?: Group[]; // Пустой список - тест открыт всем студентам
 }
 
+// Заголовок теста для списка (GET /tests): без вопросов
+export type TestSummary = Omit<Test, 'questions'>;
+
 export interface TestPayload { // Для создания/обновления теста (без вопросов)
   title: string;
   description?: string;
+  group_ids?: number[]; // Ограничить тест группами; [] - открыть всем
 }
 
 export interface TestUser { // Результаты теста
@@ -127,10 +184,94 @@ export interface TestUser { // Результаты теста
      title: string;
      description?: string;
   };
+  leaderboard?: TestStanding | null; // Только в ответе POST /tests/{id}/submit
+}
+
+// Место студента по тесту (по лучшему результату)
+export interface TestStanding {
+  rank: number;
+  score: number;
+  percentile: number; // Доля участников (%), набравших не больше
+  participants: number;
+}
+
+export interface LeaderboardEntry {
+  rank: number;
+  user_id: number;
+  username: string;
+  score: number;
+  achieved_at: string;
+}
+
+export interface Leaderboard { // GET /tests/{id}/leaderboard?limit=&offset=
+  participants: number;
+  limit: number;
+  offset: number;
+  entries: LeaderboardEntry[];
+  me: TestStanding | null; // Для студента - его место
+}
+
+// POST /batch: несколько запросов API одним HTTP-запросом
+export interface BatchRequestItem {
+  id?: string;
+  method?: 'GET' | 'POST' | 'PUT' | 'DELETE'; // По умолчанию GET
+  path: string; // Как у apiClient: '/tests/5'
+  body?: unknown;
+  headers?: Record<string, string>; // Только Idempotency-Key
+}
+
+export interface BatchResponseItem<T = any> {
+  id?: string;
+  status: number;
+  headers: Record<string, string>;
+  body: T;
+}
+
+export interface SimilarAnswer {
+  result_id: number;
+  user_id: number;
+  username: string;
+  answer: string | null;
+  taken_at: string | null;
+}
+
+export interface SimilarityCluster {
+  question_id: number;
+  similarity: number; // Наименьшая оценка похожести на первый ответ группы, 0..1
+  size: number;
+  answers: SimilarAnswer[];
+}
+
+export interface SimilarityReport { // GET /tests/{id}/similarity?threshold=&question_id=
+  test_id: number;
+  threshold: number;
+  answers: number; // Учтенных свободных ответов
+  compared_pairs: number;
+  clusters: SimilarityCluster[];
+}
+
+// Вопрос для студента (POST /tests/<id>/attempts?compact=1): без correct_answer и test_id
+export interface StudentQuestion {
+  id: number;
+  content: string;
+  options?: [string, string][] | string[] | null; // [["a", "Option A"], ...] в порядке показа
+  question_type: 'single_choice' | 'multiple_choice' | 'text_input';
+}
+
+export interface TestAttemptResponse {
+  attempt_id: number;
+  started_at: string;
+  test: {
+    id: number;
+    title: string;
+    description?: string;
+  };
+  questions: StudentQuestion[];
 }
 
 export interface TestSubmissionPayload { // Для отправки ответов студентом
   answers: Record<string, string | string[]>; // {"question_id_str": "answer_value" or ["val1", "val2"]}
+  attempt_id: number; // Попытка, в которой были показаны вопросы (варианты перемешаны); обязательна
 }
 
 // --- Для чат-бота ---
@@ -142,6 +283,19 @@ export interface ChatMessage {
 }
 
 // --- Для уведомлений ---
+// --- Фоновые задачи (GET /jobs/{id}) ---
+export interface Job {
+  id: number;
+  kind: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  attempts: number;
+  max_attempts: number;
+  result?: any;
+  last_error?: string | null;
+  created_at: string;
+  finished_at?: string | null;
+}
+
 export interface Notification {
   id: number | string;
   message: string;